@@ -0,0 +1,287 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Times the generation of consolidated models by the pyang plugin from synthetic sets
+of YANG modules.
+
+Each scenario builds the model of the same modules in one format, with the same
+function the plugin uses, in a process of its own so that its peak memory can be
+measured. The build time, the growth of the peak memory of the process during the
+build and the size of the serialized model are written as JSON, and compared with
+a baseline if one is given::
+
+    python benchmarks/plugin_run.py --preset medium -o baseline.json
+    python benchmarks/plugin_run.py --preset medium --baseline baseline.json
+
+The run fails if any of them exceeds its value in the baseline by more than the
+threshold.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import multiprocessing
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import pyang
+from lxml import etree
+
+import yinsolidated
+from yinsolidated.plugin import plugin
+
+import synthetic_yang
+
+
+FORMAT_NAME = "yinsolidated-plugin-benchmarks"
+
+FORMAT_VERSION = 1
+
+# Maps the name of each scenario to the format and options of the model it builds
+SCENARIOS = {
+    "xml": ("xml", {}),
+    "json": ("json", {}),
+    "xml-typedef-table": ("xml", {"typedef_table": True}),
+    "json-typedef-table": ("json", {"typedef_table": True}),
+    "json-node-ids": ("json", {"node_ids": True}),
+}
+
+# The measurements that are compared with the baseline
+METRICS = ["seconds", "peak-memory-bytes", "output-bytes"]
+
+DEFAULT_THRESHOLD = 0.2
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks with the command line arguments, or *argv*, and returns 1
+    if they regressed from the baseline
+    """
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument(
+        "--preset",
+        choices=sorted(synthetic_yang.PRESETS),
+        default="small",
+        help="the shape of the module set (default: small)",
+    )
+    for field in synthetic_yang.ModuleSetParameters._fields:
+        arg_parser.add_argument(
+            "--" + field.replace("_", "-"),
+            type=int,
+            help="overrides the {} of the preset".format(field.replace("_", " ")),
+        )
+    arg_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="the number of times each model is built (default: 3)",
+    )
+    arg_parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="the scenarios to run (default: all of them)",
+    )
+    arg_parser.add_argument("-o", "--output", help="the file to write results to")
+    arg_parser.add_argument(
+        "--baseline", help="the results of an earlier run to compare with"
+    )
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=(
+            "the largest allowed increase over the baseline, as a fraction of it "
+            "(default: {})".format(DEFAULT_THRESHOLD)
+        ),
+    )
+    args = arg_parser.parse_args(argv)
+
+    parameters = synthetic_yang.PRESETS[args.preset]._replace(
+        **dict(
+            (field, getattr(args, field))
+            for field in synthetic_yang.ModuleSetParameters._fields
+            if getattr(args, field) is not None
+        )
+    )
+
+    results = run(parameters, args.scenario or sorted(SCENARIOS), args.repeat)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+    print_results(results)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = find_regressions(baseline, results, args.threshold)
+        for regression in regressions:
+            print("regression: " + regression)
+        if regressions:
+            return 1
+
+    return 0
+
+
+def run(parameters, scenarios, repeat):
+    """
+    Writes the modules with *parameters*, runs each of the *scenarios* with them
+    and returns the results
+    """
+    directory = tempfile.mkdtemp(prefix="yinsolidated-benchmarks-")
+    try:
+        paths = synthetic_yang.write_modules(parameters, directory)
+        measurements = {}
+        for scenario in scenarios:
+            # A new process for each scenario starts with a low peak memory
+            pool = multiprocessing.Pool(1)
+            try:
+                measurements[scenario] = pool.apply(
+                    _run_scenario, (directory, paths, scenario, repeat)
+                )
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "pyang": pyang.__version__,
+        "yinsolidated": yinsolidated.__version__,
+        "parameters": dict(parameters._asdict()),
+        "scenarios": measurements,
+    }
+
+
+def _run_scenario(directory, paths, scenario, repeat):
+    fmt, kwargs = SCENARIOS[scenario]
+    modules = _load_modules(directory, paths)
+
+    # pylint: disable=protected-access
+    times = []
+    peak_memory = None
+    for _ in range(repeat):
+        start_memory = plugin._get_peak_memory()
+        start = timeit.default_timer()
+        model = plugin._build_consolidated_model(modules, fmt, **kwargs)
+        times.append(timeit.default_timer() - start)
+
+        if peak_memory is None and start_memory is not None:
+            peak_memory = plugin._get_peak_memory() - start_memory
+
+    times.sort()
+    return {
+        "seconds": times[0],
+        "median-seconds": times[len(times) // 2],
+        "repeat": repeat,
+        "peak-memory-bytes": peak_memory,
+        "output-bytes": _get_output_size(model, fmt),
+    }
+
+
+def _load_modules(directory, paths):
+    ctx = pyang.Context(pyang.FileRepository(directory))
+    modules = []
+    for path in paths:
+        with open(path) as module_file:
+            modules.append(ctx.add_module(path, module_file.read()))
+    ctx.validate()
+    return modules
+
+
+def _get_output_size(model, fmt):
+    # The size of the model as the plugin writes it by default
+    if fmt == "xml":
+        return len(etree.tostring(model, xml_declaration=True, pretty_print=True))
+    return len(json.dumps(model, indent=2).encode("utf-8"))
+
+
+def find_regressions(baseline, results, threshold):
+    """
+    Returns a description of each measurement in *results* that exceeds the same
+    measurement in *baseline* by more than the fraction *threshold* of it
+    """
+    if baseline.get("parameters") != results["parameters"]:
+        return ["the baseline was measured with different modules"]
+
+    regressions = []
+    for scenario, measurements in sorted(results["scenarios"].items()):
+        baseline_measurements = baseline["scenarios"].get(scenario)
+        if baseline_measurements is None:
+            continue
+
+        for metric in METRICS:
+            value = measurements.get(metric)
+            baseline_value = baseline_measurements.get(metric)
+            if not value or not baseline_value:
+                continue
+
+            if value > baseline_value * (1 + threshold):
+                regressions.append(
+                    "{} {} is {} ({:+.0%} from {})".format(
+                        scenario,
+                        metric,
+                        _format_value(value),
+                        float(value) / baseline_value - 1,
+                        _format_value(baseline_value),
+                    )
+                )
+
+    return regressions
+
+
+def print_results(results):
+    """Prints the measurements of each scenario in *results*"""
+    print(
+        "commit {} ({})".format(
+            results.get("commit") or "unknown",
+            ", ".join(
+                "{}={}".format(field, value)
+                for field, value in sorted(results["parameters"].items())
+            ),
+        )
+    )
+    print(
+        "{:<20} {:>12} {:>18} {:>14}".format(
+            "scenario", "time (ms)", "peak memory (KiB)", "output (KiB)"
+        )
+    )
+    for scenario, measurements in sorted(results["scenarios"].items()):
+        peak_memory = measurements["peak-memory-bytes"]
+        print(
+            "{:<20} {:>12.1f} {:>18} {:>14.1f}".format(
+                scenario,
+                measurements["seconds"] * 1000,
+                "-" if peak_memory is None else peak_memory // 1024,
+                measurements["output-bytes"] / 1024.0,
+            )
+        )
+
+
+def _format_value(value):
+    return "{:.3f}".format(value) if isinstance(value, float) else str(value)
+
+
+def _get_commit():
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.STDOUT
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode("utf-8").strip()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
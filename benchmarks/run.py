@@ -0,0 +1,323 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Times the parsers on synthetic YINsolidated models.
+
+Each scenario is run on both the XML and the JSON model of the same shape, and the
+fastest and median times of several repetitions are written as JSON, so that the
+results of different commits can be compared::
+
+    python benchmarks/run.py --preset medium -o before.json
+    python benchmarks/run.py --preset medium -o after.json --compare before.json
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import collections
+import json
+import platform
+import subprocess
+import sys
+import timeit
+
+from lxml import etree
+
+import yinsolidated
+from yinsolidated import _common
+
+import synthetic_model
+
+
+FORMAT_NAME = "yinsolidated-benchmarks"
+
+FORMAT_VERSION = 1
+
+
+def main(argv=None):
+    """Runs the benchmarks with the command line arguments, or *argv*"""
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument(
+        "--preset",
+        choices=sorted(synthetic_model.PRESETS),
+        default="small",
+        help="the shape of the model (default: small)",
+    )
+    for field in synthetic_model.ModelParameters._fields:
+        arg_parser.add_argument(
+            "--" + field.replace("_", "-"),
+            type=int,
+            help="overrides the {} of the preset".format(field.replace("_", " ")),
+        )
+    arg_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="the number of times each scenario is run (default: 5)",
+    )
+    arg_parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="the scenarios to run (default: all of them)",
+    )
+    arg_parser.add_argument("-o", "--output", help="the file to write results to")
+    arg_parser.add_argument(
+        "--compare", help="the results of an earlier run to compare with"
+    )
+    args = arg_parser.parse_args(argv)
+
+    parameters = synthetic_model.PRESETS[args.preset]._replace(
+        **dict(
+            (field, getattr(args, field))
+            for field in synthetic_model.ModelParameters._fields
+            if getattr(args, field) is not None
+        )
+    )
+
+    results = run(parameters, args.scenario or sorted(SCENARIOS), args.repeat)
+    results_text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(results_text + "\n")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print_comparison(json.load(baseline_file), results)
+    else:
+        print_results(results)
+
+    return 0
+
+
+def run(parameters, scenarios, repeat):
+    """
+    Generates the model with *parameters*, runs each of the *scenarios* *repeat*
+    times on each format and returns the results
+    """
+    xml_text, json_text = synthetic_model.generate(parameters)
+    models = collections.OrderedDict(
+        [
+            ("xml", (lambda: yinsolidated.fromstring(xml_text), _XmlWalker)),
+            ("json", (lambda: yinsolidated.parse_json(json_text), _JsonWalker)),
+        ]
+    )
+
+    timings = {}
+    for fmt, (parse, walker) in models.items():
+        for scenario in scenarios:
+            timings.setdefault(scenario, {})[fmt] = _time_scenario(
+                SCENARIOS[scenario], parse, walker, repeat
+            )
+
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "yinsolidated": yinsolidated.__version__,
+        "parameters": dict(parameters._asdict()),
+        "model": {
+            "xml-bytes": len(xml_text),
+            "json-bytes": len(json_text.encode("utf-8")),
+            "elements": sum(1 for _ in etree.fromstring(xml_text).iter()),
+        },
+        "scenarios": timings,
+    }
+
+
+def _time_scenario(scenario, parse, walker, repeat):
+    # Every repetition runs on a newly parsed model, so that no lookup tables built
+    # on demand by an earlier one are reused
+    times = []
+    for _ in range(repeat):
+        if scenario is _parse:
+            start = timeit.default_timer()
+            parse()
+        else:
+            module_elem = parse()
+            start = timeit.default_timer()
+            scenario(module_elem, walker)
+        times.append(timeit.default_timer() - start)
+
+    times.sort()
+    return {"min": times[0], "median": times[len(times) // 2], "repeat": repeat}
+
+
+def _parse(module_elem, walker):
+    # pylint: disable=unused-argument
+    pass
+
+
+def _traverse(module_elem, walker):
+    for _ in walker.iter_elements(module_elem):
+        pass
+
+
+def _access_properties(module_elem, walker):
+    # pylint: disable=unused-argument
+    for element in _iter_data_definitions(module_elem):
+        _ = (
+            element.namespace,
+            element.prefix,
+            element.module_name,
+            element.description,
+            element.schema_path,
+            element.is_config,
+        )
+        if element.keyword == "leaf":
+            type_elem = element.type
+            _ = (
+                element.is_mandatory,
+                element.default,
+                type_elem.base_type,
+                type_elem.length,
+            )
+
+
+def _expand_identities(module_elem, walker):
+    # pylint: disable=unused-argument
+    for element in _iter_data_definitions(module_elem):
+        if element.keyword == "leaf" and element.type.name == "identityref":
+            element.type.get_identities()
+
+
+def _look_up_paths(module_elem, walker):
+    for element in _iter_data_definitions(module_elem):
+        if element.keyword != "leaf":
+            continue
+
+        target = element.type.leafref_target
+        if target is not None:
+            walker.find_by_path(module_elem, target.schema_path)
+
+
+def _iter_data_definitions(module_elem):
+    # Every data definition of the model, in document order
+    stack = [module_elem]
+    while stack:
+        element = stack.pop()
+        if element is not module_elem:
+            yield element
+        stack.extend(reversed(list(element.iterate_data_definitions())))
+
+
+SCENARIOS = {
+    "parse": _parse,
+    "traverse": _traverse,
+    "properties": _access_properties,
+    "identities": _expand_identities,
+    "paths": _look_up_paths,
+}
+
+
+class _XmlWalker(object):
+
+    """Walks models returned by :func:`yinsolidated.parse`"""
+
+    @staticmethod
+    def iter_elements(module_elem):
+        """Iterates over every element of the model"""
+        return module_elem.iter()
+
+    @staticmethod
+    def find_by_path(module_elem, schema_path):
+        """Returns the data node at *schema_path* by following the names in it"""
+        element = module_elem
+        for component in schema_path.strip("/").split("/"):
+            name = component.partition(":")[2]
+            element = element.find(
+                "yin:*[@name='{}']".format(name), namespaces={"yin": _common.YIN_NS}
+            )
+        return element
+
+
+class _JsonWalker(object):
+
+    """Walks models returned by :func:`yinsolidated.parse_json`"""
+
+    @staticmethod
+    def iter_elements(module_elem):
+        """Iterates over every element of the model"""
+        stack = [module_elem]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(reversed(element.children))
+
+    @staticmethod
+    def find_by_path(module_elem, schema_path):
+        """Returns the data node at *schema_path* by following the names in it"""
+        element = module_elem
+        for component in schema_path.strip("/").split("/"):
+            name = component.partition(":")[2]
+            element = next(
+                child for child in element.children if child.get("name") == name
+            )
+        return element
+
+
+def print_results(results):
+    """Prints the times of each scenario in *results*"""
+    print(_describe_model(results))
+    print("{:<12} {:>12} {:>12}".format("scenario", "xml (ms)", "json (ms)"))
+    for scenario, timings in sorted(results["scenarios"].items()):
+        print(
+            "{:<12} {:>12.2f} {:>12.2f}".format(
+                scenario, timings["xml"]["min"] * 1000, timings["json"]["min"] * 1000
+            )
+        )
+
+
+def print_comparison(baseline, results):
+    """Prints the times of each scenario in *results* relative to *baseline*"""
+    print("baseline: " + _describe_model(baseline))
+    print("current:  " + _describe_model(results))
+    if baseline["parameters"] != results["parameters"]:
+        print("warning: the models have different shapes")
+    print(
+        "{:<12} {:<5} {:>14} {:>14} {:>8}".format(
+            "scenario", "fmt", "baseline (ms)", "current (ms)", "ratio"
+        )
+    )
+    for scenario, timings in sorted(results["scenarios"].items()):
+        for fmt, timing in sorted(timings.items()):
+            try:
+                baseline_time = baseline["scenarios"][scenario][fmt]["min"]
+            except KeyError:
+                continue
+
+            print(
+                "{:<12} {:<5} {:>14.2f} {:>14.2f} {:>8.2f}".format(
+                    scenario,
+                    fmt,
+                    baseline_time * 1000,
+                    timing["min"] * 1000,
+                    timing["min"] / baseline_time if baseline_time else float("inf"),
+                )
+            )
+
+
+def _describe_model(results):
+    return "commit {} with {} elements ({})".format(
+        results.get("commit") or "unknown",
+        results["model"]["elements"],
+        ", ".join(
+            "{}={}".format(field, value)
+            for field, value in sorted(results["parameters"].items())
+        ),
+    )
+
+
+def _get_commit():
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.STDOUT
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode("utf-8").strip()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
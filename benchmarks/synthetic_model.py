@@ -0,0 +1,241 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Generates synthetic YINsolidated models of a given shape for benchmarking.
+
+The models are built directly in the consolidated format, without pyang, so that
+models far larger than any real set of YANG modules can be generated quickly. The
+same parameters always generate the same model.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import io
+
+from lxml import etree
+
+from yinsolidated import _common, convert
+
+
+NAMESPACE = "urn:synthetic"
+
+PREFIX = "syn"
+
+AUGMENT_NAMESPACE = "urn:synthetic-augment"
+
+AUGMENT_PREFIX = "aug"
+
+ModelParameters = collections.namedtuple(
+    "ModelParameters",
+    [
+        # The number of nested levels of containers below the module
+        "depth",
+        # The number of containers in each container above the deepest level, and of
+        # leaves in each container at the deepest level, in each list and in each
+        # augment
+        "fanout",
+        # The number of lists at the top level, each with a leafref to its key
+        "lists",
+        # The number of identities, derived from each other as a binary tree. Each
+        # container above the deepest level has a leaf referring to the root one.
+        "identities",
+        # The number of typedefs inlined into one another in the type of the leaf of
+        # each container above the deepest level
+        "typedef_inlining",
+        # The number of containers added to the top-level containers by an
+        # augmenting module
+        "augments",
+    ],
+)
+
+PRESETS = {
+    "small": ModelParameters(
+        depth=3, fanout=4, lists=4, identities=15, typedef_inlining=2, augments=4
+    ),
+    "medium": ModelParameters(
+        depth=4, fanout=6, lists=16, identities=63, typedef_inlining=3, augments=16
+    ),
+    "large": ModelParameters(
+        depth=5, fanout=6, lists=64, identities=255, typedef_inlining=4, augments=64
+    ),
+}
+
+_NSMAP = {"yin": _common.YIN_NS, PREFIX: NAMESPACE}
+
+_AUGMENT_NSMAP = {AUGMENT_PREFIX: AUGMENT_NAMESPACE, "s": NAMESPACE}
+
+
+def generate_xml(parameters):
+    """Returns the module element of the XML model of the given shape"""
+    module_elem = _yin_element(
+        None,
+        "module",
+        name="synthetic",
+        nsmap=_NSMAP,
+        **{"module-prefix": PREFIX, "module-name": "synthetic"}
+    )
+    _yin_element(module_elem, "yang-version", value="1")
+    _yin_element(module_elem, "namespace", uri=NAMESPACE)
+    _yin_element(module_elem, "prefix", value=PREFIX)
+    _add_description(module_elem, "A synthetic module")
+
+    for index in range(parameters.identities):
+        identity_elem = _yin_element(
+            module_elem,
+            "identity",
+            name="identity-{}".format(index),
+            **{"module-prefix": PREFIX, "module-name": "synthetic"}
+        )
+        if index:
+            _yin_element(
+                identity_elem, "base", name="identity-{}".format((index - 1) // 2)
+            )
+
+    # Each entry is (parent_elem, name, schema path of the parent, level)
+    stack = [
+        (module_elem, "container-{}".format(index), "", 1)
+        for index in reversed(range(parameters.fanout))
+    ]
+    while stack:
+        parent_elem, name, parent_path, level = stack.pop()
+        path = "{}/{}:{}".format(parent_path, PREFIX, name)
+        container_elem = _data_node(parent_elem, "container", name, path)
+        _add_description(container_elem, "Container {}".format(path))
+
+        if level < parameters.depth:
+            _add_typed_leaf(container_elem, path, parameters.typedef_inlining)
+            if parameters.identities:
+                _add_identityref_leaf(container_elem, path)
+            stack.extend(
+                (container_elem, "container-{}".format(index), path, level + 1)
+                for index in reversed(range(parameters.fanout))
+            )
+        else:
+            _add_leaves(container_elem, path, parameters.fanout)
+
+    for index in range(parameters.lists):
+        _add_list(module_elem, index, parameters.fanout)
+
+    for index in range(parameters.augments):
+        target_name = "container-{}".format(index % max(parameters.fanout, 1))
+        target_elem = module_elem.find(
+            "yin:container[@name='{}']".format(target_name), namespaces=_NSMAP
+        )
+        if target_elem is not None:
+            _add_augment(target_elem, index, parameters.fanout)
+
+    return module_elem
+
+
+def generate(parameters):
+    """Returns the XML and JSON models of the given shape, as bytes and text"""
+    module_elem = generate_xml(parameters)
+    xml_text = etree.tostring(module_elem, xml_declaration=True, pretty_print=True)
+
+    json_file = io.StringIO()
+    convert.xml_to_json(io.BytesIO(xml_text), json_file)
+    return xml_text, json_file.getvalue()
+
+
+def _yin_element(parent_elem, keyword, nsmap=None, **attributes):
+    tag = etree.QName(_common.YIN_NS, keyword)
+    if parent_elem is None:
+        return etree.Element(tag, attributes, nsmap=nsmap)
+    return etree.SubElement(parent_elem, tag, attributes, nsmap=nsmap)
+
+
+def _data_node(parent_elem, keyword, name, path, nsmap=None, **attributes):
+    attributes[_common.SCHEMA_PATH_ATTRIBUTE] = path
+    attributes[_common.NODE_ID_ATTRIBUTE] = str(_common.get_node_id(path))
+    return _yin_element(parent_elem, keyword, name=name, nsmap=nsmap, **attributes)
+
+
+def _add_description(parent_elem, text):
+    description_elem = _yin_element(parent_elem, "description")
+    _yin_element(description_elem, "text").text = text
+
+
+def _add_typed_leaf(container_elem, path, typedef_inlining):
+    leaf_elem = _data_node(
+        container_elem, "leaf", "value", "{}/{}:value".format(path, PREFIX)
+    )
+    _yin_element(leaf_elem, "default", value="default")
+
+    type_elem = leaf_elem
+    for index in range(typedef_inlining):
+        typedef_name = "typedef-{}".format(index)
+        type_elem = _yin_element(type_elem, "type", name=typedef_name)
+        typedef_elem = _yin_element(type_elem, "typedef", name=typedef_name)
+        _add_description(typedef_elem, "Typedef {}".format(index))
+        type_elem = typedef_elem
+
+    string_elem = _yin_element(type_elem, "type", name="string")
+    _yin_element(string_elem, "length", value="1..{}".format(typedef_inlining + 8))
+
+
+def _add_identityref_leaf(container_elem, path):
+    leaf_elem = _data_node(
+        container_elem, "leaf", "identity", "{}/{}:identity".format(path, PREFIX)
+    )
+    type_elem = _yin_element(leaf_elem, "type", name="identityref")
+    _yin_element(type_elem, "base", name="identity-0")
+
+
+def _add_leaves(parent_elem, path, count):
+    for index in range(count):
+        name = "leaf-{}".format(index)
+        leaf_elem = _data_node(
+            parent_elem, "leaf", name, "{}/{}:{}".format(path, PREFIX, name)
+        )
+        _yin_element(leaf_elem, "type", name="int32")
+        if index % 2:
+            _yin_element(leaf_elem, "config", value="false")
+
+
+def _add_list(module_elem, index, fanout):
+    path = "/{}:list-{}".format(PREFIX, index)
+    list_elem = _data_node(module_elem, "list", "list-{}".format(index), path)
+    _yin_element(list_elem, "key", value="name")
+
+    key_path = "{}/{}:name".format(path, PREFIX)
+    key_elem = _data_node(list_elem, "leaf", "name", key_path)
+    _yin_element(key_elem, "type", name="string")
+
+    leafref_elem = _data_node(
+        list_elem, "leaf", "name-ref", "{}/{}:name-ref".format(path, PREFIX)
+    )
+    type_elem = _yin_element(
+        leafref_elem,
+        "type",
+        name="leafref",
+        **{_common.TARGET_ID_ATTRIBUTE: str(_common.get_node_id(key_path))}
+    )
+    _yin_element(type_elem, "path", value="../name")
+    _yin_element(type_elem, "type", name="string")
+
+    _add_leaves(list_elem, path, fanout)
+
+
+def _add_augment(target_elem, index, fanout):
+    name = "augment-{}".format(index)
+    path = "{}/{}:{}".format(
+        target_elem.get(_common.SCHEMA_PATH_ATTRIBUTE), AUGMENT_PREFIX, name
+    )
+    augment_elem = _data_node(
+        target_elem,
+        "container",
+        name,
+        path,
+        nsmap=_AUGMENT_NSMAP,
+        **{"module-prefix": AUGMENT_PREFIX, "module-name": "synthetic-augment"}
+    )
+    for leaf_index in range(fanout):
+        leaf_name = "leaf-{}".format(leaf_index)
+        leaf_elem = _data_node(
+            augment_elem,
+            "leaf",
+            leaf_name,
+            "{}/{}:{}".format(path, AUGMENT_PREFIX, leaf_name),
+        )
+        _yin_element(leaf_elem, "type", name="string")
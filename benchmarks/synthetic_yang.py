@@ -0,0 +1,190 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Writes synthetic sets of YANG modules of a given shape for benchmarking the plugin.
+
+The main module defines the identities, typedefs and groupings that every other
+module uses, and a tree of containers that the other modules augment. The same
+parameters always write the same modules.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import io
+import os
+
+
+MAIN_MODULE = "bench-main"
+
+ModuleSetParameters = collections.namedtuple(
+    "ModuleSetParameters",
+    [
+        # The number of modules, including the main module
+        "modules",
+        # The number of top-level containers of the main module, each using one of
+        # the groupings and holding a list
+        "containers",
+        # The number of groupings of the main module, each using the previous one
+        "groupings",
+        # The number of typedefs of the main module, each derived from the previous
+        # one, the last of which is used by every grouping
+        "typedef_chain",
+        # The number of leafrefs to the key of the list in each container
+        "leafrefs",
+        # The number of identities derived from the base identity in each module
+        "identities",
+        # The number of augments of the containers of the main module in each of
+        # the other modules
+        "augments",
+    ],
+)
+
+PRESETS = {
+    "small": ModuleSetParameters(
+        modules=3,
+        containers=4,
+        groupings=3,
+        typedef_chain=3,
+        leafrefs=2,
+        identities=4,
+        augments=4,
+    ),
+    "medium": ModuleSetParameters(
+        modules=8,
+        containers=16,
+        groupings=6,
+        typedef_chain=5,
+        leafrefs=4,
+        identities=16,
+        augments=16,
+    ),
+    "large": ModuleSetParameters(
+        modules=24,
+        containers=48,
+        groupings=10,
+        typedef_chain=8,
+        leafrefs=8,
+        identities=32,
+        augments=48,
+    ),
+}
+
+
+def write_modules(parameters, directory):
+    """
+    Writes the modules of the given shape to *directory* and returns their paths,
+    starting with that of the main module
+    """
+    modules = [(MAIN_MODULE, _make_main_module(parameters))]
+    modules.extend(
+        (_get_module_name(index), _make_augmenting_module(parameters, index))
+        for index in range(1, parameters.modules)
+    )
+
+    paths = []
+    for name, text in modules:
+        path = os.path.join(directory, name + ".yang")
+        with io.open(path, "w", encoding="utf-8") as module_file:
+            module_file.write(text)
+        paths.append(path)
+    return paths
+
+
+def _get_module_name(index):
+    return "bench-augment-{}".format(index)
+
+
+def _make_main_module(parameters):
+    lines = [
+        "module {} {{".format(MAIN_MODULE),
+        '  namespace "urn:bench:main";',
+        "  prefix m;",
+        "",
+        "  identity base-identity;",
+    ]
+    lines.extend(_make_identities(parameters.identities, "main", "base-identity"))
+
+    lines.append("")
+    lines.append("  typedef chain-0 {")
+    lines.append('    type string { length "1..255"; }')
+    lines.append("  }")
+    for index in range(1, parameters.typedef_chain):
+        lines.append("  typedef chain-{} {{".format(index))
+        lines.append("    type chain-{};".format(index - 1))
+        lines.append('    description "Typedef {} of the chain";'.format(index))
+        lines.append("  }")
+    last_typedef = "chain-{}".format(max(parameters.typedef_chain - 1, 0))
+
+    for index in range(parameters.groupings):
+        lines.append("")
+        lines.append("  grouping grouping-{} {{".format(index))
+        if index:
+            lines.append("    uses grouping-{};".format(index - 1))
+        lines.append("    leaf text-{} {{ type {}; }}".format(index, last_typedef))
+        lines.append("    leaf kind-{} {{".format(index))
+        lines.append("      type identityref { base base-identity; }")
+        lines.append("    }")
+        lines.append("    container nested-{} {{".format(index))
+        lines.append("      leaf count { type uint32; default 0; }")
+        lines.append("    }")
+        lines.append("  }")
+
+    for index in range(parameters.containers):
+        lines.append("")
+        lines.append("  container container-{} {{".format(index))
+        if parameters.groupings:
+            lines.append("    uses grouping-{};".format(index % parameters.groupings))
+        lines.append("    list entry {")
+        lines.append("      key name;")
+        lines.append("      leaf name {{ type {}; }}".format(last_typedef))
+        lines.append("    }")
+        for leafref_index in range(parameters.leafrefs):
+            lines.append("    leaf ref-{} {{".format(leafref_index))
+            lines.append('      type leafref { path "../entry/name"; }')
+            lines.append("    }")
+        lines.append("  }")
+
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _make_augmenting_module(parameters, index):
+    module_name = _get_module_name(index)
+    prefix = "a{}".format(index)
+    lines = [
+        "module {} {{".format(module_name),
+        '  namespace "urn:bench:augment:{}";'.format(index),
+        "  prefix {};".format(prefix),
+        "",
+        "  import {} {{ prefix m; }}".format(MAIN_MODULE),
+        "",
+    ]
+    lines.extend(_make_identities(parameters.identities, prefix, "m:base-identity"))
+
+    # The augments need a container of the main module to target
+    augment_count = parameters.augments if parameters.containers else 0
+    for augment_index in range(augment_count):
+        target = "container-{}".format((index + augment_index) % parameters.containers)
+        lines.append("")
+        lines.append('  augment "/m:{}" {{'.format(target))
+        lines.append("    container {}-{} {{".format(prefix, augment_index))
+        if parameters.groupings:
+            lines.append(
+                "      uses m:grouping-{};".format(augment_index % parameters.groupings)
+            )
+        lines.append("      leaf target {")
+        lines.append('        type leafref { path "../../m:entry/m:name"; }')
+        lines.append("      }")
+        lines.append("    }")
+        lines.append("  }")
+
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _make_identities(count, prefix, base):
+    return [
+        "  identity {}-identity-{} {{ base {}; }}".format(prefix, index, base)
+        for index in range(count)
+    ]
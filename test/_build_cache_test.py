@@ -0,0 +1,80 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the _build_cache module"""
+
+from __future__ import unicode_literals
+
+import io
+import os
+
+from yinsolidated import _build_cache
+
+
+def _store(cache, key, text):
+    entry = cache.open_entry(key)
+    entry.write(text)
+    entry.commit()
+
+
+def _read(cache, key):
+    output = io.StringIO()
+    return output.getvalue() if cache.copy_to(key, output) else None
+
+
+class TestMakeKey(object):
+    def test_same_parts_same_key(self):
+        assert _build_cache.make_key("a", {"b": 1, "c": 2}) == _build_cache.make_key(
+            "a", {"c": 2, "b": 1}
+        )
+
+    def test_different_parts_different_key(self):
+        assert _build_cache.make_key("a", 1) != _build_cache.make_key("a", 2)
+
+
+class TestBuildCache(object):
+    def test_miss(self, tmpdir):
+        cache = _build_cache.BuildCache(str(tmpdir))
+        assert _read(cache, "missing") is None
+
+    def test_hit(self, tmpdir):
+        cache = _build_cache.BuildCache(str(tmpdir))
+        _store(cache, "key", "<module/>é")
+
+        assert _read(cache, "key") == "<module/>é"
+
+    def test_creates_directory(self, tmpdir):
+        directory = str(tmpdir.join("nested", "cache"))
+        _store(_build_cache.BuildCache(directory), "key", "text")
+
+        assert os.path.isdir(directory)
+
+    def test_discarded_entry_not_stored(self, tmpdir):
+        cache = _build_cache.BuildCache(str(tmpdir))
+        entry = cache.open_entry("key")
+        entry.write("partial")
+        entry.discard()
+
+        assert _read(cache, "key") is None
+        assert not tmpdir.listdir()
+
+    def test_least_recently_used_evicted(self, tmpdir):
+        cache = _build_cache.BuildCache(str(tmpdir), max_size=25)
+        _store(cache, "old", "x" * 10)
+        _store(cache, "used", "x" * 10)
+        os.utime(cache.get_entry_path("old"), (1, 1))
+        os.utime(cache.get_entry_path("used"), (2, 2))
+
+        _read(cache, "used")
+        _store(cache, "new", "x" * 10)
+
+        assert _read(cache, "old") is None
+        assert _read(cache, "used") is not None
+        assert _read(cache, "new") is not None
+
+
+class TestTeeOutput(object):
+    def test_writes_to_all_outputs(self):
+        first, second = io.StringIO(), io.StringIO()
+        _build_cache.TeeOutput(first, second).write("text")
+
+        assert first.getvalue() == second.getvalue() == "text"
@@ -42,3 +42,13 @@ def test_is_data_definition(keyword):
 @pytest.mark.parametrize("keyword", ["module", "rpc", "identity", "foo"])
 def test_is_not_data_definition(keyword):
     assert not _common.is_data_definition(keyword)
+
+
+def test_node_id_stable():
+    node_id = _common.get_node_id("/t:test-container/t:test-leaf")
+    assert node_id == _common.get_node_id("/t:test-container/t:test-leaf")
+    assert 0 <= node_id < 2 ** 63
+
+
+def test_node_ids_differ():
+    assert _common.get_node_id("/t:test-leaf") != _common.get_node_id("/a:test-leaf")
@@ -0,0 +1,140 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the _json_writer module"""
+
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+
+import pytest
+
+import yinsolidated
+from yinsolidated import _json_writer
+
+
+_EXPECTED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "expected.json")
+
+
+@pytest.fixture(scope="module")
+def model():
+    with open(_EXPECTED_MODEL_PATH) as file_:
+        return json.load(file_)
+
+
+class _RecordingOutput(io.StringIO):
+    def __init__(self):
+        super(_RecordingOutput, self).__init__()
+        self.write_count = 0
+
+    def write(self, text):
+        self.write_count += 1
+        return super(_RecordingOutput, self).write(text)
+
+
+def test_indented_output_matches_json_dumps(model):
+    output = io.StringIO()
+    _json_writer.write_tree(model, output, indent=2)
+
+    assert output.getvalue() == json.dumps(model, indent=2)
+
+
+def test_compact_output_has_no_whitespace(model):
+    output = io.StringIO()
+    _json_writer.write_tree(model, output, indent=0)
+
+    assert output.getvalue() == json.dumps(model, separators=(",", ":"))
+
+
+def test_output_is_written_in_chunks(model):
+    output = _RecordingOutput()
+    _json_writer.write_tree(model, output, chunk_size=1024)
+
+    assert output.write_count > 1
+    assert output.getvalue() == json.dumps(model, indent=2)
+
+
+def test_output_is_parseable(model):
+    output = io.StringIO()
+    _json_writer.write_tree(model, output)
+
+    module_elem = yinsolidated.parse_json(output.getvalue())
+
+    assert module_elem.keyword == "module"
+    assert module_elem.find("container").name == "submodule-container"
+
+
+def test_members_can_change_until_first_child():
+    output = io.StringIO()
+    writer = _json_writer.JsonStreamWriter(output, indent=0)
+
+    module = {"keyword": "module"}
+    writer.open(module)
+    module["name"] = "test"
+
+    leaf = {"keyword": "leaf"}
+    writer.open(leaf, module)
+    module["ignored"] = "too late"
+    leaf["name"] = "test-leaf"
+
+    writer.close()
+
+    assert json.loads(output.getvalue()) == {
+        "keyword": "module",
+        "name": "test",
+        "children": [{"keyword": "leaf", "name": "test-leaf"}],
+    }
+
+
+def test_siblings_close_previous_subtree():
+    output = io.StringIO()
+    writer = _json_writer.JsonStreamWriter(output, indent=0)
+
+    module = {"keyword": "module"}
+    container = {"keyword": "container"}
+    writer.open(module)
+    writer.open(container, module)
+    writer.open({"keyword": "leaf"}, container)
+    writer.open({"keyword": "identity"}, module)
+    writer.close()
+
+    assert json.loads(output.getvalue()) == {
+        "keyword": "module",
+        "children": [
+            {"keyword": "container", "children": [{"keyword": "leaf"}]},
+            {"keyword": "identity"},
+        ],
+    }
+
+
+def test_parent_must_be_open():
+    writer = _json_writer.JsonStreamWriter(io.StringIO())
+    writer.open({"keyword": "module"})
+
+    with pytest.raises(yinsolidated.Error, match="Parent element is not open"):
+        writer.open({"keyword": "leaf"}, {"keyword": "container"})
+
+
+def test_single_root():
+    writer = _json_writer.JsonStreamWriter(io.StringIO())
+    writer.open({"keyword": "module"})
+
+    with pytest.raises(yinsolidated.Error, match="already has a root element"):
+        writer.open({"keyword": "module"})
+
+
+def test_key_dictionary():
+    output = io.StringIO()
+    _json_writer.write_tree(
+        {"keyword": "module", "children": [{"keyword": "leaf", "name": "a"}]},
+        output,
+        indent=0,
+        key_dictionary={"keyword": "$k", "children": "$c"},
+    )
+
+    assert json.loads(output.getvalue()) == {
+        "key-dictionary": {"$k": "keyword", "$c": "children"},
+        "$k": "module",
+        "$c": [{"$k": "leaf", "name": "a"}],
+    }
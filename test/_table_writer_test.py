@@ -0,0 +1,92 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the _table_writer module"""
+
+from __future__ import unicode_literals
+
+import copy
+import io
+import json
+import os
+
+import pytest
+
+import yinsolidated
+from yinsolidated import _table_writer
+
+
+_EXPECTED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "expected.json")
+
+_YIN_NAMESPACE = "urn:ietf:params:xml:ns:yang:yin:1"
+
+_SMALL_MODEL = {
+    "keyword": "module",
+    "namespace": _YIN_NAMESPACE,
+    "name": "test",
+    "module-prefix": "t",
+    "nsmap": {"t": "urn:test"},
+    "children": [
+        {
+            "keyword": "leaf",
+            "namespace": _YIN_NAMESPACE,
+            "name": "test-leaf",
+            "children": [
+                {"keyword": "type", "namespace": _YIN_NAMESPACE, "name": "string"}
+            ],
+        },
+        {"keyword": "simple-extension", "namespace": "urn:test", "text": "test"},
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def model():
+    with open(_EXPECTED_MODEL_PATH) as file_:
+        return json.load(file_)
+
+
+def test_build_table():
+    table = _table_writer.build_table(_SMALL_MODEL)
+    strings = table["strings"]
+
+    assert table["parents"] == [-1, 0, 1, 0]
+    assert [strings[keyword_id] for keyword_id in table["keywords"]] == [
+        "module",
+        "leaf",
+        "type",
+        "simple-extension",
+    ]
+    assert [
+        strings[name_id] if name_id >= 0 else None for name_id in table["names"]
+    ] == ["test", "test-leaf", "string", None,]
+    assert strings[table["namespaces"][3]] == "urn:test"
+    assert table["attribute-offsets"] == [0, 2, 2, 2, 3]
+    assert [strings[key_id] for key_id in table["attribute-keys"]] == [
+        "xmlns:t",
+        "module-prefix",
+        "text",
+    ]
+
+
+def test_strings_stored_once():
+    table = _table_writer.build_table(_SMALL_MODEL)
+
+    assert len(table["strings"]) == len(set(table["strings"]))
+    assert table["namespaces"][:3] == [table["namespaces"][0]] * 3
+
+
+def test_round_trip(model):
+    output = io.StringIO()
+    _table_writer.write_table(model, output)
+
+    assert yinsolidated.parse_table(output.getvalue()) == yinsolidated.parse_json(
+        copy.deepcopy(model)
+    )
+
+
+def test_unsupported_version():
+    table = _table_writer.build_table(_SMALL_MODEL)
+    table["version"] = _table_writer.FORMAT_VERSION + 1
+
+    with pytest.raises(yinsolidated.Error):
+        yinsolidated.parse_table(json.dumps(table))
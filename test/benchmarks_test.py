@@ -0,0 +1,145 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the benchmarks"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+import sys
+
+import pyang
+import yinsolidated
+from yinsolidated import convert
+
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "benchmarks")
+)
+
+import plugin_run  # pylint: disable=import-error,wrong-import-position
+import run  # pylint: disable=import-error,wrong-import-position
+import synthetic_model  # pylint: disable=import-error,wrong-import-position
+import synthetic_yang  # pylint: disable=import-error,wrong-import-position
+
+
+_PARAMETERS = synthetic_model.ModelParameters(
+    depth=2, fanout=2, lists=1, identities=3, typedef_inlining=2, augments=1
+)
+
+
+def test_generated_models_match():
+    xml_text, json_text = synthetic_model.generate(_PARAMETERS)
+
+    assert synthetic_model.generate(_PARAMETERS) == (xml_text, json_text)
+    assert convert.xml_tree_to_json(
+        yinsolidated.fromstring(xml_text)
+    ) == yinsolidated.parse_json(json_text)
+
+
+def test_generated_model_shape():
+    module_elem = yinsolidated.parse_json(synthetic_model.generate(_PARAMETERS)[1])
+
+    top_container = module_elem.find("container")
+    value_leaf = top_container.find("leaf")
+    assert value_leaf.type.typedef.type.typedef.type.length == "1..10"
+
+    identity_leaf = top_container.findall("leaf")[1]
+    assert len(identity_leaf.type.get_identities()) == 2
+
+    list_elem = module_elem.find("list")
+    assert list_elem.findall("leaf")[1].type.leafref_target.name == "name"
+
+    augment_elem = top_container.findall("container")[-1]
+    assert augment_elem.namespace == synthetic_model.AUGMENT_NAMESPACE
+
+
+def test_run(tmpdir):
+    output_path = str(tmpdir.join("results.json"))
+    assert (
+        run.main(
+            ["--preset", "small", "--depth", "2", "--repeat", "1", "-o", output_path]
+        )
+        == 0
+    )
+
+    with open(output_path) as output_file:
+        results = json.load(output_file)
+
+    assert results["format"] == run.FORMAT_NAME
+    assert results["parameters"]["depth"] == 2
+    assert sorted(results["scenarios"]) == sorted(run.SCENARIOS)
+    for timings in results["scenarios"].values():
+        assert sorted(timings) == ["json", "xml"]
+
+
+_MODULE_SET_PARAMETERS = synthetic_yang.ModuleSetParameters(
+    modules=2,
+    containers=2,
+    groupings=2,
+    typedef_chain=2,
+    leafrefs=1,
+    identities=2,
+    augments=2,
+)
+
+
+def test_written_modules_validate(tmpdir):
+    paths = synthetic_yang.write_modules(_MODULE_SET_PARAMETERS, str(tmpdir))
+    assert [os.path.basename(path) for path in paths] == [
+        "bench-main.yang",
+        "bench-augment-1.yang",
+    ]
+
+    ctx = pyang.Context(pyang.FileRepository(str(tmpdir)))
+    for path in paths:
+        with open(path) as module_file:
+            ctx.add_module(path, module_file.read())
+    ctx.validate()
+
+    assert [error for error in ctx.errors if pyang.error.is_error(error[1])] == []
+
+
+def test_plugin_run(tmpdir):
+    output_path = str(tmpdir.join("results.json"))
+    args = ["--modules", "2", "--containers", "2", "--repeat", "1"]
+    assert plugin_run.main(args + ["-o", output_path]) == 0
+
+    with open(output_path) as output_file:
+        results = json.load(output_file)
+
+    assert results["format"] == plugin_run.FORMAT_NAME
+    assert results["parameters"]["containers"] == 2
+    assert sorted(results["scenarios"]) == sorted(plugin_run.SCENARIOS)
+    for measurements in results["scenarios"].values():
+        assert measurements["seconds"] > 0
+        assert measurements["output-bytes"] > 0
+
+    assert (
+        plugin_run.main(args + ["--baseline", output_path, "--threshold", "100"]) == 0
+    )
+
+
+def _make_results(seconds, output_bytes, containers=2):
+    return {
+        "parameters": {"containers": containers},
+        "scenarios": {
+            "xml": {
+                "seconds": seconds,
+                "peak-memory-bytes": None,
+                "output-bytes": output_bytes,
+            }
+        },
+    }
+
+
+def test_find_regressions():
+    baseline = _make_results(1.0, 1000)
+
+    assert plugin_run.find_regressions(baseline, _make_results(1.1, 1000), 0.2) == []
+    assert plugin_run.find_regressions(baseline, _make_results(0.5, 1300), 0.2) == [
+        "xml output-bytes is 1300 (+30% from 1000)"
+    ]
+    assert plugin_run.find_regressions(baseline, _make_results(1.0, 1000, 3), 0.2) == [
+        "the baseline was measured with different modules"
+    ]
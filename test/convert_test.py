@@ -0,0 +1,254 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the convert module"""
+
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+
+import pyang
+import pytest
+from lxml import etree
+
+import yinsolidated
+from yinsolidated import __main__ as main_module
+from yinsolidated import _common, convert
+from yinsolidated.plugin import plugin
+
+
+_MODULES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "modules")
+
+_MODULE_FILENAMES = ["test-module.yang", "augmenting-module.yang"]
+
+_SIMPLE_MODEL = """<?xml version='1.0' encoding='utf-8'?>
+<yin:module xmlns:yin="urn:ietf:params:xml:ns:yang:yin:1" xmlns:t="test:ns"
+            name="test" module-prefix="t" module-name="test">
+  <yin:description>
+    <yin:text>A test module</yin:text>
+  </yin:description>
+  <t:simple-extension>extension text</t:simple-extension>
+  <yin:container name="c">
+    <yin:leaf xmlns:a="augmenting:ns" name="l" module-prefix="a"
+              module-name="augmenting">
+      <yin:type name="string"/>
+      <yin:must condition="../l != 'x'">
+        <yin:error-message>
+          <yin:value>not x</yin:value>
+        </yin:error-message>
+      </yin:must>
+    </yin:leaf>
+  </yin:container>
+</yin:module>
+"""
+
+
+@pytest.fixture(scope="module")
+def modules():
+    ctx = pyang.Context(pyang.FileRepository(_MODULES_DIR))
+    loaded_modules = []
+    for filename in _MODULE_FILENAMES:
+        with open(os.path.join(_MODULES_DIR, filename)) as module_file:
+            loaded_modules.append(ctx.add_module(filename, module_file.read()))
+    ctx.validate()
+    return loaded_modules
+
+
+def _build_models(modules, **kwargs):
+    models = plugin._build_consolidated_models(modules, ["xml", "json"], **kwargs)
+    return etree.tostring(models["xml"]), json.loads(json.dumps(models["json"]))
+
+
+def _xml_to_json(xml_text, **kwargs):
+    json_file = io.StringIO()
+    convert.xml_to_json(io.BytesIO(xml_text), json_file, **kwargs)
+    return json_file.getvalue()
+
+
+def _json_to_xml(json_text, **kwargs):
+    xml_file = io.BytesIO()
+    convert.json_to_xml(io.StringIO(json_text), xml_file, **kwargs)
+    return xml_file.getvalue()
+
+
+def _canonicalize(xml_text):
+    xml_parser = etree.XMLParser(remove_blank_text=True)
+    return etree.tostring(etree.fromstring(xml_text, xml_parser), method="c14n")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        pytest.param({}, id="plain"),
+        pytest.param({"typedef_table": True}, id="typedef_table"),
+        pytest.param({"node_ids": True}, id="node_ids"),
+    ],
+)
+def test_xml_to_json_same_as_plugin(modules, kwargs):
+    xml_model, json_model = _build_models(modules, **kwargs)
+    assert json.loads(_xml_to_json(xml_model)) == json_model
+
+
+def test_xml_to_json_indent(modules):
+    xml_model, json_model = _build_models(modules)
+    json_text = _xml_to_json(xml_model, indent=None)
+
+    assert "\n" not in json_text
+    assert json.loads(json_text) == json_model
+
+
+def test_json_round_trip(modules):
+    _, json_model = _build_models(modules)
+    xml_model = _json_to_xml(json.dumps(json_model))
+    assert json.loads(_xml_to_json(xml_model)) == json_model
+
+
+def test_json_to_xml_same_as_source():
+    json_model = _xml_to_json(_SIMPLE_MODEL.encode("utf-8"))
+    assert _canonicalize(_json_to_xml(json_model)) == _canonicalize(
+        _SIMPLE_MODEL.encode("utf-8")
+    )
+
+
+def test_json_to_xml_compact(modules):
+    xml_model, _ = _build_models(modules, node_ids=True)
+    _, compact_model = _build_models(modules, node_ids=True, compact=True)
+
+    converted_model = _json_to_xml(json.dumps(compact_model))
+    assert json.loads(_xml_to_json(converted_model)) == json.loads(
+        _xml_to_json(xml_model)
+    )
+
+
+def test_json_to_xml_parses(modules):
+    _, json_model = _build_models(modules)
+    module_elem = yinsolidated.fromstring(_json_to_xml(json.dumps(json_model)))
+
+    leaf_elem = module_elem.find(
+        ".//yin:leaf[@name='augmenting-leaf']", namespaces={"yin": _common.YIN_NS},
+    )
+    assert leaf_elem.namespace == "urn:xml:ns:test:augment"
+    assert leaf_elem.schema_path == "/test:augmented-container/aug:augmenting-leaf"
+
+
+def test_content_hashes_dropped(modules):
+    xml_model, _ = _build_models(modules, content_hashes=True)
+    json_model = json.loads(_xml_to_json(xml_model))
+    assert "content-hash" not in json_model
+
+    converted_model = yinsolidated.fromstring(_json_to_xml(json.dumps(json_model)))
+    assert converted_model.get("content-hash") is None
+
+
+def test_command(tmpdir):
+    xml_path = str(tmpdir.join("model.xml"))
+    json_path = str(tmpdir.join("model.json"))
+    converted_path = str(tmpdir.join("converted.xml"))
+    with io.open(xml_path, "w", encoding="utf-8") as xml_file:
+        xml_file.write(_SIMPLE_MODEL)
+
+    assert main_module.main(["convert", xml_path, json_path]) == 0
+    assert main_module.main(["convert", json_path, converted_path]) == 0
+
+    with io.open(json_path, encoding="utf-8") as json_file:
+        assert json.load(json_file)["name"] == "test"
+    with io.open(converted_path, "rb") as converted_file:
+        assert _canonicalize(converted_file.read()) == _canonicalize(
+            _SIMPLE_MODEL.encode("utf-8")
+        )
+
+
+_COMPARED_PROPERTIES = [
+    "keyword",
+    "module_name",
+    "namespace",
+    "prefix",
+    "schema_path",
+    "description",
+    "is_config",
+    "is_mandatory",
+    "default",
+    "units",
+    "status",
+]
+
+_COMPARED_TYPE_PROPERTIES = ["name", "length", "range", "path", "unprefixed_name"]
+
+
+def _get_property(element, name):
+    try:
+        return getattr(element, name)
+    except AttributeError:
+        return AttributeError
+
+
+def _assert_same_properties(element, other):
+    stack = [(element, other)]
+    while stack:
+        element, other = stack.pop()
+        for name in _COMPARED_PROPERTIES:
+            assert _get_property(element, name) == _get_property(other, name)
+
+        if element.keyword in ("leaf", "leaf-list"):
+            for name in _COMPARED_TYPE_PROPERTIES:
+                assert _get_property(element.type, name) == _get_property(
+                    other.type, name
+                )
+
+        children = list(element.iterate_data_definitions())
+        other_children = list(other.iterate_data_definitions())
+        assert len(children) == len(other_children)
+        stack.extend(zip(children, other_children))
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        pytest.param({}, id="plain"),
+        pytest.param({"typedef_table": True}, id="typedef_table"),
+    ],
+)
+def test_xml_tree_to_json(modules, kwargs):
+    xml_model, json_model = _build_models(modules, **kwargs)
+    module_elem = yinsolidated.fromstring(xml_model)
+
+    json_module_elem = convert.xml_tree_to_json(module_elem)
+
+    assert json_module_elem == yinsolidated.parse_json(json.dumps(json_model))
+    _assert_same_properties(module_elem, json_module_elem)
+    assert _canonicalize(etree.tostring(module_elem)) == _canonicalize(xml_model)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        pytest.param({}, id="plain"),
+        pytest.param({"typedef_table": True}, id="typedef_table"),
+    ],
+)
+def test_json_tree_to_xml(modules, kwargs):
+    _, json_model = _build_models(modules, **kwargs)
+    json_module_elem = yinsolidated.parse_json(json.dumps(json_model))
+
+    module_elem = convert.json_tree_to_xml(json_module_elem)
+
+    assert isinstance(module_elem, yinsolidated.ModuleElement)
+    _assert_same_properties(module_elem, json_module_elem)
+    assert json_module_elem == yinsolidated.parse_json(json.dumps(json_model))
+
+
+def test_json_tree_to_xml_same_as_source():
+    module_elem = yinsolidated.fromstring(_SIMPLE_MODEL.encode("utf-8"))
+
+    converted_elem = convert.json_tree_to_xml(convert.xml_tree_to_json(module_elem))
+
+    assert _canonicalize(etree.tostring(converted_elem)) == _canonicalize(
+        _SIMPLE_MODEL.encode("utf-8")
+    )
+    assert (
+        converted_elem.find(
+            "yin:container/yin:leaf", namespaces={"yin": _common.YIN_NS}
+        ).namespace
+        == "augmenting:ns"
+    )
@@ -0,0 +1,179 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the diff module"""
+
+from __future__ import unicode_literals
+
+import copy
+import json
+import os
+
+import pytest
+
+import yinsolidated
+from yinsolidated import diff
+
+
+_EXPECTED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "expected.json")
+
+
+@pytest.fixture(scope="module")
+def raw_model():
+    with open(_EXPECTED_MODEL_PATH) as file_:
+        return json.load(file_)
+
+
+def _find_child(raw_element, name):
+    return next(child for child in raw_element["children"] if child.get("name") == name)
+
+
+def _diff_json(raw_model, change):
+    new_raw_model = copy.deepcopy(raw_model)
+    change(new_raw_model)
+
+    changes = diff.diff_models(
+        yinsolidated.parse_json(copy.deepcopy(raw_model)),
+        yinsolidated.parse_json(new_raw_model),
+    )
+    return [(kind, category, path) for kind, category, path, _, _ in changes]
+
+
+class TestJsonModels(object):
+    def test_identical(self, raw_model):
+        assert _diff_json(raw_model, lambda _: None) == []
+
+    def test_node_removed(self, raw_model):
+        def change(model):
+            model["children"].remove(_find_child(model, "root-container"))
+
+        assert _diff_json(raw_model, change) == [
+            (diff.REMOVED, "node", "/test:root-container")
+        ]
+
+    def test_node_added(self, raw_model):
+        def change(model):
+            container = _find_child(model, "root-container")
+            new_leaf = copy.deepcopy(_find_child(model, "root-leaf"))
+            new_leaf["name"] = "new-leaf"
+            container["children"].append(new_leaf)
+
+        assert _diff_json(raw_model, change) == [
+            (diff.ADDED, "node", "/test:root-container/test:new-leaf")
+        ]
+
+    def test_node_changed(self, raw_model):
+        def change(model):
+            leaf = _find_child(model, "root-leaf")
+            config = leaf["children"][0]
+            config["value"] = "false"
+
+        assert _diff_json(raw_model, change) == [
+            (diff.CHANGED, "node", "/test:root-leaf")
+        ]
+
+    def test_default_changed(self, raw_model):
+        def change(model):
+            leaf = _find_child(model, "root-leaf")
+            default = leaf["children"][1]
+            default["value"] = "other-default"
+
+        assert _diff_json(raw_model, change) == [
+            (diff.CHANGED, "default", "/test:root-leaf")
+        ]
+
+    def test_default_removed(self, raw_model):
+        def change(model):
+            leaf = _find_child(model, "root-leaf")
+            del leaf["children"][1]
+
+        assert _diff_json(raw_model, change) == [
+            (diff.REMOVED, "default", "/test:root-leaf")
+        ]
+
+    def test_inlined_typedef_changed(self, raw_model):
+        def change(model):
+            leaf = _find_child(model, "leaf-with-typedef")
+            typedef = leaf["children"][0]["children"][0]
+            typedef["children"][0]["children"][0]["value"] = "1..10"
+
+        assert _diff_json(raw_model, change) == [
+            (diff.CHANGED, "type", "/test:leaf-with-typedef")
+        ]
+
+    def test_identity_changed(self, raw_model):
+        def change(model):
+            identity = _find_child(model, "test-derived-identity")
+            identity["children"][0]["name"] = "other-base-identity"
+
+        assert _diff_json(raw_model, change) == [
+            (diff.CHANGED, "identity", "test:test-derived-identity")
+        ]
+
+    def test_identity_added(self, raw_model):
+        def change(model):
+            identity = copy.deepcopy(_find_child(model, "test-derived-identity"))
+            identity["name"] = "new-identity"
+            model["children"].append(identity)
+
+        assert _diff_json(raw_model, change) == [
+            (diff.ADDED, "identity", "test:new-identity")
+        ]
+
+
+_TYPEDEF_TABLE_MODEL = """
+<module xmlns="urn:ietf:params:xml:ns:yang:yin:1" xmlns:t="test:ns"
+        name="test" module-prefix="t" module-name="test">
+  <container name="c">
+    <leaf name="l">
+      <type name="t:name" typedef-ref="{typedef_id}"/>
+    </leaf>
+  </container>
+  <typedef name="other" typedef-id="{other_typedef_id}">
+    <type name="int8"/>
+  </typedef>
+  <typedef name="name" typedef-id="{typedef_id}">
+    <type name="string">
+      <length value="{length}"/>
+    </type>
+  </typedef>
+</module>
+"""
+
+
+def _make_typedef_table_model(typedef_id="1", other_typedef_id="2", length="1..8"):
+    return yinsolidated.fromstring(
+        _TYPEDEF_TABLE_MODEL.format(
+            typedef_id=typedef_id, other_typedef_id=other_typedef_id, length=length
+        )
+    )
+
+
+class TestXmlModels(object):
+    def test_identical(self):
+        assert (
+            diff.diff_models(_make_typedef_table_model(), _make_typedef_table_model())
+            == []
+        )
+
+    def test_typedef_ids_ignored(self):
+        new_model = _make_typedef_table_model(typedef_id="2", other_typedef_id="1")
+        assert diff.diff_models(_make_typedef_table_model(), new_model) == []
+
+    def test_referenced_typedef_changed(self):
+        old_model = _make_typedef_table_model()
+        new_model = _make_typedef_table_model(length="1..16")
+
+        changes = diff.diff_models(old_model, new_model)
+        assert [(change.kind, change.category, change.path) for change in changes] == [
+            (diff.CHANGED, "type", "/t:c/t:l")
+        ]
+        assert changes[0].old.typedef.type.length == "1..8"
+        assert changes[0].new.typedef.type.length == "1..16"
+
+
+def test_mixed_parsers(raw_model):
+    with pytest.raises(yinsolidated.Error):
+        diff.diff_models(
+            _make_typedef_table_model(),
+            yinsolidated.parse_json(copy.deepcopy(raw_model)),
+        )
@@ -0,0 +1,140 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the instrumentation module"""
+
+from __future__ import unicode_literals
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import yinsolidated
+from yinsolidated import instrumentation, json_parser, parser
+
+
+_TEST_DIR = os.path.dirname(__file__)
+
+
+def _load_json_model():
+    with open(os.path.join(_TEST_DIR, "expected.json")) as model_file:
+        return yinsolidated.parse_json(model_file.read())
+
+
+_MODELS = [
+    pytest.param(
+        "xml",
+        lambda: yinsolidated.parse(os.path.join(_TEST_DIR, "model.xml")).getroot(),
+        id="xml",
+    ),
+    pytest.param("json", _load_json_model, id="json"),
+]
+
+
+@pytest.fixture(autouse=True)
+def disable_instrumentation():
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def _get_calls(backend, attribute):
+    for stats in instrumentation.snapshot().calls:
+        if (stats.backend, stats.attribute) == (backend, attribute):
+            return stats.calls
+    return 0
+
+
+def test_disabled_by_default():
+    assert not instrumentation.is_enabled()
+
+
+def test_disable_restores_classes():
+    original_type = vars(parser.LeafElement)["type"]
+    original_find = vars(json_parser.YinElement)["find"]
+
+    instrumentation.enable()
+    assert vars(parser.LeafElement)["type"] is not original_type
+    assert vars(json_parser.YinElement)["find"] is not original_find
+
+    instrumentation.disable()
+    assert vars(parser.LeafElement)["type"] is original_type
+    assert vars(json_parser.YinElement)["find"] is original_find
+    assert not instrumentation.is_enabled()
+
+
+@pytest.mark.parametrize("backend, load_model", _MODELS)
+def test_counts_calls(backend, load_model):
+    module_elem = load_model()
+    instrumentation.enable()
+
+    data_defs = list(module_elem.iterate_data_definitions())
+    for data_def in data_defs:
+        _ = data_def.is_config
+
+    assert _get_calls(backend, "YinElement.iterate_data_definitions") == 1
+    assert _get_calls(backend, "DataDefinitionElement.is_config") == len(data_defs)
+
+    stats = instrumentation.snapshot().calls
+    assert all(stat.seconds >= 0 for stat in stats)
+    assert all(stat.backend == backend for stat in stats)
+
+
+@pytest.mark.parametrize("backend, load_model", _MODELS)
+def test_counts_cache_hits(backend, load_model):
+    module_elem = load_model()
+    instrumentation.enable()
+
+    _ = module_elem.content_hash
+    _ = module_elem.content_hash
+
+    assert instrumentation.snapshot().caches == [
+        instrumentation.CacheStats(backend, "content-hash", 1, 1)
+    ]
+
+
+def test_not_counted_when_disabled():
+    module_elem = _load_json_model()
+    instrumentation.enable()
+    _ = module_elem.namespace
+    instrumentation.disable()
+    _ = module_elem.namespace
+
+    assert _get_calls("json", "YinElement.namespace") == 1
+
+
+def test_reset():
+    module_elem = _load_json_model()
+    instrumentation.enable()
+    _ = module_elem.content_hash
+
+    instrumentation.reset()
+
+    assert instrumentation.snapshot() == instrumentation.Snapshot([], [])
+
+
+def test_report():
+    module_elem = _load_json_model()
+    instrumentation.enable()
+    _ = module_elem.content_hash
+    _ = module_elem.content_hash
+
+    report = instrumentation.report()
+
+    assert "YinElement.content_hash" in report
+    assert "50.0%" in report
+
+
+def test_enabled_by_environment():
+    env = dict(os.environ)
+    env[instrumentation.ENVIRONMENT_VARIABLE] = "1"
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import yinsolidated; print(yinsolidated.instrumentation.is_enabled())",
+        ],
+        env=env,
+    )
+    assert output.strip() == b"True"
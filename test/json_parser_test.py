@@ -4,11 +4,239 @@
 
 from __future__ import unicode_literals
 
+import copy
 import types
 
 import pytest
 
 import yinsolidated
+from yinsolidated import _common
+
+
+_DEDUPE_MODEL = {
+    "keyword": "module",
+    "module-prefix": "t",
+    "nsmap": {"yin": "urn:ietf:params:xml:ns:yang:yin:1", "t": "test:ns"},
+    "children": [
+        {
+            "keyword": "leaf",
+            "name": "leaf-a",
+            "children": [
+                {
+                    "keyword": "type",
+                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                    "name": "percentage",
+                    "children": [
+                        {
+                            "keyword": "typedef",
+                            "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                            "name": "percentage",
+                            "children": [
+                                {
+                                    "keyword": "type",
+                                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                                    "name": "uint8",
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ],
+        },
+        {
+            "keyword": "leaf",
+            "name": "leaf-b",
+            "children": [
+                {
+                    "keyword": "type",
+                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                    "name": "percentage",
+                    "children": [
+                        {
+                            "keyword": "typedef",
+                            "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                            "name": "percentage",
+                            "children": [
+                                {
+                                    "keyword": "type",
+                                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                                    "name": "uint8",
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ],
+        },
+        {
+            "keyword": "leaf",
+            "name": "leaf-c",
+            "module-prefix": "o",
+            "nsmap": {"o": "other:ns"},
+            "children": [
+                {
+                    "keyword": "type",
+                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                    "name": "percentage",
+                    "children": [
+                        {
+                            "keyword": "typedef",
+                            "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                            "name": "percentage",
+                            "children": [
+                                {
+                                    "keyword": "type",
+                                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                                    "name": "uint8",
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ],
+        },
+    ],
+}
+
+
+class TestDedupe(object):
+    @pytest.fixture
+    def leaves(self):
+        module_elem = yinsolidated.parse_json(copy.deepcopy(_DEDUPE_MODEL), dedupe=True)
+        return module_elem, module_elem.findall("leaf")
+
+    def test_identical_subtrees_shared(self, leaves):
+        _, (leaf_a, leaf_b, _) = leaves
+
+        assert leaf_a.type is leaf_b.type
+        assert leaf_b.type.base_type.name == "uint8"
+
+    def test_subtrees_in_other_scopes_not_shared(self, leaves):
+        _, (leaf_a, _, leaf_c) = leaves
+
+        assert leaf_a.type is not leaf_c.type
+        assert leaf_a.type.prefix == "t"
+        assert leaf_c.type.prefix == "o"
+
+    def test_data_node_parents(self, leaves):
+        module_elem, leaves = leaves
+
+        for leaf in leaves:
+            assert leaf.parent is module_elem
+
+    def test_report(self, leaves):
+        module_elem, _ = leaves
+        report = module_elem.dedupe_report
+
+        assert report.shared_subtrees == 1
+        assert report.replaced_subtrees == 1
+        assert report.elements_saved == 3
+        assert report.bytes_saved > 0
+
+    def test_no_report_without_dedupe(self):
+        module_elem = yinsolidated.parse_json(copy.deepcopy(_DEDUPE_MODEL))
+
+        assert module_elem.dedupe_report is None
+
+    def test_same_model(self):
+        deduped = yinsolidated.parse_json(copy.deepcopy(_DEDUPE_MODEL), dedupe=True)
+        original = yinsolidated.parse_json(copy.deepcopy(_DEDUPE_MODEL))
+
+        assert deduped == original
+
+
+class TestCompact(object):
+    def test_key_dictionary_and_default_namespace_expanded(self):
+        compact_model = {
+            "key-dictionary": {"$k": "keyword", "$n": "name", "$c": "children"},
+            "default-namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+            "$k": "module",
+            "$n": "test-module",
+            "$c": [
+                {"$k": "leaf", "$n": "test-leaf"},
+                {"$k": "ext", "namespace": "urn:xml:ns:ext", "$n": "arg"},
+            ],
+        }
+
+        module_elem = yinsolidated.parse_json(compact_model)
+
+        assert module_elem == yinsolidated.parse_json(
+            {
+                "keyword": "module",
+                "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                "name": "test-module",
+                "children": [
+                    {
+                        "keyword": "leaf",
+                        "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                        "name": "test-leaf",
+                    },
+                    {"keyword": "ext", "namespace": "urn:xml:ns:ext", "name": "arg"},
+                ],
+            }
+        )
+        assert module_elem.find("leaf").name == "test-leaf"
+
+
+_DOCUMENTED_MODEL = {
+    "keyword": "module",
+    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+    "name": "test",
+    "module-prefix": "t",
+    "children": [
+        {
+            "keyword": "description",
+            "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+            "text": "Test model",
+        },
+        {
+            "keyword": "leaf",
+            "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+            "name": "documented-leaf",
+            "children": [
+                {
+                    "keyword": "description",
+                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                    "text": "A leaf",
+                },
+                {
+                    "keyword": "reference",
+                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                    "text": "RFC 6020",
+                },
+                {
+                    "keyword": "type",
+                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                    "name": "string",
+                },
+            ],
+        },
+    ],
+}
+
+
+class TestStripDocumentation(object):
+    def test_documentation_skipped(self):
+        module_elem = yinsolidated.parse_json(
+            copy.deepcopy(_DOCUMENTED_MODEL), strip_documentation=True
+        )
+        leaf_elem = module_elem.find("leaf")
+
+        assert [child.keyword for child in module_elem.children] == ["leaf"]
+        assert [child.keyword for child in leaf_elem.children] == ["type"]
+
+    def test_description_raises(self):
+        module_elem = yinsolidated.parse_json(
+            copy.deepcopy(_DOCUMENTED_MODEL), strip_documentation=True
+        )
+
+        with pytest.raises(yinsolidated.DocumentationStrippedError):
+            module_elem.find("leaf").description
+
+    def test_description_without_stripping(self):
+        module_elem = yinsolidated.parse_json(copy.deepcopy(_DOCUMENTED_MODEL))
+
+        assert module_elem.find("leaf").description == "A leaf"
 
 
 class TestYinElement(object):
@@ -307,6 +535,107 @@ class TestGetAncestorOrSelfDataNodes(object):
         assert data_node_ancestors[2].keyword == "leaf"
 
 
+_SCHEMA_PATH_MODEL = {
+    "keyword": "module",
+    "name": "test",
+    "module-prefix": "t",
+    "children": [
+        {
+            "keyword": "container",
+            "name": "test-container",
+            "children": [
+                {
+                    "keyword": "choice",
+                    "name": "test-choice",
+                    "children": [
+                        {
+                            "keyword": "case",
+                            "name": "test-case",
+                            "children": [{"keyword": "leaf", "name": "test-leaf"}],
+                        }
+                    ],
+                },
+                {
+                    "keyword": "container",
+                    "name": "augmenting-container",
+                    "module-prefix": "a",
+                    "children": [{"keyword": "leaf", "name": "augmenting-leaf"}],
+                },
+            ],
+        },
+        {
+            "keyword": "rpc",
+            "name": "test-rpc",
+            "children": [
+                {
+                    "keyword": "input",
+                    "children": [
+                        {
+                            "keyword": "leaf",
+                            "name": "input-leaf",
+                            "id": "42",
+                            "schema-path": "/t:emitted",
+                        }
+                    ],
+                }
+            ],
+        },
+    ],
+}
+
+
+class TestSchemaPath(object):
+    @pytest.fixture
+    def model(self):
+        return yinsolidated.parse_json(copy.deepcopy(_SCHEMA_PATH_MODEL))
+
+    def test_choice_and_case_omitted(self, model):
+        leaf_elem = model.find("container").find("choice").find("case").find("leaf")
+        assert leaf_elem.schema_path == "/t:test-container/t:test-leaf"
+        assert leaf_elem.node_id == _common.get_node_id(leaf_elem.schema_path)
+
+    def test_augmenting_prefix(self, model):
+        leaf_elem = model.find("container").findall("container")[0].find("leaf")
+        assert (
+            leaf_elem.schema_path
+            == "/t:test-container/a:augmenting-container/a:augmenting-leaf"
+        )
+
+    def test_rpc_input(self, model):
+        input_elem = model.find("rpc").find("input")
+        assert input_elem.schema_path == "/t:test-rpc/t:input"
+
+    def test_attributes_preferred(self, model):
+        leaf_elem = model.find("rpc").find("input").find("leaf")
+        assert leaf_elem.schema_path == "/t:emitted"
+        assert leaf_elem.node_id == 42
+
+    def test_not_a_schema_node(self, model):
+        choice_elem = model.find("container").find("choice")
+        assert choice_elem.schema_path is None
+        assert choice_elem.node_id is None
+
+    def test_missing_leafref_target(self):
+        leaf_elem = yinsolidated.parse_json(
+            {
+                "keyword": "leaf",
+                "name": "test-leaf",
+                "module-prefix": "t",
+                "children": [
+                    {
+                        "keyword": "type",
+                        "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                        "name": "leafref",
+                        "target-id": "1",
+                    }
+                ],
+            }
+        )
+
+        with pytest.raises(yinsolidated.MissingLeafrefTargetError):
+            leaf_elem.type.leafref_target
+
+
 class TestFind(object):
     def test_find(self, ancestor_data_node_model):
         assert ancestor_data_node_model.find("container").name == "test-container"
@@ -1110,6 +1439,89 @@ class TestTypeElement(object):
 
         assert type_elem.typedef is None
 
+    def test_typedef_reference(self):
+        module_elem = yinsolidated.parse_json(
+            {
+                "keyword": "module",
+                "children": [
+                    {
+                        "keyword": "leaf",
+                        "name": "test-leaf",
+                        "children": [
+                            {
+                                "keyword": "type",
+                                "name": "percentage",
+                                "typedef-ref": "1",
+                            }
+                        ],
+                    },
+                    {
+                        "keyword": "typedef",
+                        "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                        "name": "percentage",
+                        "typedef-id": "1",
+                        "children": [
+                            {
+                                "keyword": "type",
+                                "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                                "name": "meter",
+                                "typedef-ref": "2",
+                                "children": [
+                                    {
+                                        "keyword": "range",
+                                        "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                                        "value": "0..100",
+                                    }
+                                ],
+                            }
+                        ],
+                    },
+                    {
+                        "keyword": "typedef",
+                        "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                        "name": "meter",
+                        "typedef-id": "2",
+                        "children": [
+                            {
+                                "keyword": "type",
+                                "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                                "name": "uint8",
+                            }
+                        ],
+                    },
+                ],
+            }
+        )
+        type_elem = module_elem.find("leaf").find("type")
+
+        assert type_elem.typedef.name == "percentage"
+        assert type_elem.range == "0..100"
+        assert type_elem.base_type.name == "uint8"
+
+    def test_missing_typedef_reference(self):
+        module_elem = yinsolidated.parse_json(
+            {
+                "keyword": "module",
+                "children": [
+                    {
+                        "keyword": "leaf",
+                        "name": "test-leaf",
+                        "children": [
+                            {
+                                "keyword": "type",
+                                "name": "percentage",
+                                "typedef-ref": "1",
+                            }
+                        ],
+                    }
+                ],
+            }
+        )
+        type_elem = module_elem.find("leaf").find("type")
+
+        with pytest.raises(yinsolidated.MissingTypedefError):
+            _ = type_elem.typedef
+
     def test_bits(self):
         type_elem = yinsolidated.parse_json(
             {
@@ -2539,3 +2951,65 @@ class TestIdentityElement(object):
         assert len(direct_identities) == 2
         assert direct_identities[0].name == "derived-identity-1"
         assert direct_identities[1].name == "external-derived-identity"
+
+
+def _make_content_hash_model(l2_type="int8"):
+    def leaf(name, type_name):
+        return {
+            "keyword": "leaf",
+            "name": name,
+            "children": [{"keyword": "type", "name": type_name}],
+        }
+
+    return yinsolidated.parse_json(
+        {
+            "keyword": "module",
+            "name": "test",
+            "module-prefix": "t",
+            "nsmap": {"t": "test:ns"},
+            "children": [
+                {
+                    "keyword": "container",
+                    "name": "c",
+                    "children": [leaf("l1", "string"), leaf("l2", l2_type)],
+                },
+                leaf("sibling", "string"),
+            ],
+        }
+    )
+
+
+class TestContentHash(object):
+    def test_identical_models(self):
+        assert (
+            _make_content_hash_model().content_hash
+            == _make_content_hash_model().content_hash
+        )
+
+    def test_change_propagates_to_ancestors(self):
+        model = _make_content_hash_model()
+        changed_model = _make_content_hash_model(l2_type="int16")
+
+        container_elem = model.find("container")
+        changed_container_elem = changed_model.find("container")
+
+        assert model.content_hash != changed_model.content_hash
+        assert container_elem.content_hash != changed_container_elem.content_hash
+        assert (
+            container_elem.children[1].content_hash
+            != changed_container_elem.children[1].content_hash
+        )
+        assert (
+            container_elem.children[0].content_hash
+            == changed_container_elem.children[0].content_hash
+        )
+        assert (
+            model.find("leaf").content_hash == changed_model.find("leaf").content_hash
+        )
+
+    def test_emitted_hash_preferred(self):
+        model = _make_content_hash_model()
+        leaf_elem = model.find("leaf")
+        leaf_elem["content-hash"] = "emitted"
+
+        assert leaf_elem.content_hash == "emitted"
@@ -0,0 +1,154 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the memory module"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+
+import pytest
+
+import yinsolidated
+
+
+_TEST_DIR = os.path.dirname(__file__)
+
+_DUPLICATES_MODEL = {
+    "keyword": "module",
+    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+    "nsmap": {"yin": "urn:ietf:params:xml:ns:yang:yin:1", "t": "test:ns"},
+    "name": "test",
+    "module-prefix": "t",
+    "module-name": "test",
+    "children": [
+        {
+            "keyword": "leaf",
+            "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+            "name": "leaf-{}".format(index),
+            "children": [
+                {
+                    "keyword": "type",
+                    "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                    "name": "string",
+                    "children": [
+                        {
+                            "keyword": "length",
+                            "namespace": "urn:ietf:params:xml:ns:yang:yin:1",
+                            "value": "1..10",
+                        }
+                    ],
+                }
+            ],
+        }
+        for index in range(3)
+    ],
+}
+
+
+def _parse_duplicates_model(**kwargs):
+    return yinsolidated.parse_json(json.dumps(_DUPLICATES_MODEL), **kwargs)
+
+
+def _load_xml_model():
+    return yinsolidated.parse(os.path.join(_TEST_DIR, "model.xml")).getroot()
+
+
+def _load_json_model():
+    with open(os.path.join(_TEST_DIR, "expected.json")) as model_file:
+        return yinsolidated.parse_json(model_file.read())
+
+
+def _iter_json_elements(element):
+    yield element
+    for child in element.children:
+        for descendant in _iter_json_elements(child):
+            yield descendant
+
+
+@pytest.mark.parametrize(
+    "load_model, count_elements",
+    [
+        pytest.param(
+            _load_xml_model, lambda root: sum(1 for _ in root.iter()), id="xml"
+        ),
+        pytest.param(
+            _load_json_model,
+            lambda root: sum(1 for _ in _iter_json_elements(root)),
+            id="json",
+        ),
+    ],
+)
+def test_totals(load_model, count_elements):
+    root = load_model()
+    report = yinsolidated.memory_report(root)
+
+    assert report.elements == count_elements(root)
+    assert report.elements == sum(usage.elements for usage in report.keywords.values())
+    assert report.bytes == sum(usage.bytes for usage in report.keywords.values())
+    assert report.bytes == report.keywords["module"].retained_bytes
+    assert report.bytes > sum(usage.bytes for usage in report.subtrees) > 0
+    assert report.subtrees == sorted(
+        report.subtrees, key=lambda usage: usage.bytes, reverse=True
+    )
+    for usage in report.keywords.values():
+        assert usage.retained_bytes >= usage.bytes > 0
+
+
+def test_element_tree():
+    model_tree = yinsolidated.parse(os.path.join(_TEST_DIR, "model.xml"))
+    assert yinsolidated.memory_report(model_tree) == yinsolidated.memory_report(
+        model_tree.getroot()
+    )
+
+
+def test_subtrees():
+    report = yinsolidated.memory_report(_parse_duplicates_model())
+
+    assert [
+        (usage.keyword, usage.name, usage.elements) for usage in report.subtrees
+    ] == [("leaf", "leaf-{}".format(index), 3) for index in range(3)]
+    assert report.keywords["type"].elements == 3
+    assert report.keywords["type"].retained_bytes == (
+        report.keywords["type"].bytes + report.keywords["length"].bytes
+    )
+
+
+def test_duplicate_subtrees():
+    report = yinsolidated.memory_report(_parse_duplicates_model())
+
+    duplicates = report.duplicate_subtrees
+    assert (duplicates.distinct, duplicates.copies, duplicates.elements) == (1, 2, 4)
+    assert duplicates.bytes == 2 * (
+        report.keywords["type"].bytes // 3 + report.keywords["length"].bytes // 3
+    )
+
+
+def test_duplicate_strings():
+    report = yinsolidated.memory_report(_parse_duplicates_model())
+
+    # The YIN namespace is held by all 10 elements and the nsmap, "test" by the
+    # name and module name of the module, and "string" and "1..10" by the type of
+    # each of the 3 leaves
+    duplicates = report.duplicate_strings
+    assert (duplicates.distinct, duplicates.copies) == (4, 10 + 1 + 2 + 2)
+    assert duplicates.bytes > 0
+
+
+def test_shared_subtrees_counted_once():
+    report = yinsolidated.memory_report(_parse_duplicates_model(dedupe=True))
+
+    assert report.elements == 6
+    assert report.keywords["type"].elements == 1
+    assert report.duplicate_subtrees.copies == 0
+    assert [usage.elements for usage in report.subtrees] == [3, 1, 1]
+
+
+def test_xml_dedupe_saves_memory():
+    report = yinsolidated.memory_report(_load_xml_model())
+    deduped_report = yinsolidated.memory_report(
+        yinsolidated.parse(os.path.join(_TEST_DIR, "model.xml"), dedupe=True)
+    )
+
+    assert deduped_report.bytes <= report.bytes
+    assert deduped_report.duplicate_subtrees.copies <= report.duplicate_subtrees.copies
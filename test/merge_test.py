@@ -0,0 +1,181 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the merge module"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+
+import pyang
+import pytest
+from lxml import etree
+
+import yinsolidated
+from yinsolidated import merge
+from yinsolidated.plugin import plugin
+
+
+_MODULES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "modules")
+
+_YIN_NAMESPACE = "urn:ietf:params:xml:ns:yang:yin:1"
+
+_VENDOR_MODULE = """
+module vendor {
+    namespace "urn:vendor";
+    prefix v;
+
+    import test-module {
+        prefix t;
+    }
+
+    typedef vendor-string {
+        type string {
+            length "1..8";
+        }
+    }
+
+    augment "/t:augmented-container" {
+        leaf vendor-leaf {
+            type vendor-string;
+        }
+    }
+}
+"""
+
+
+def _load_modules(*module_texts):
+    ctx = pyang.Context(pyang.FileRepository(_MODULES_DIR))
+    modules = []
+    for path, module_text in module_texts:
+        if module_text is None:
+            with open(os.path.join(_MODULES_DIR, path)) as module_file:
+                module_text = module_file.read()
+        modules.append(ctx.add_module(path, module_text))
+    ctx.validate()
+    return modules
+
+
+def _build_model(fmt, module_texts, **kwargs):
+    model = plugin._build_consolidated_model(
+        _load_modules(*module_texts), fmt, **kwargs
+    )
+    if fmt == "xml":
+        return yinsolidated.fromstring(etree.tostring(model))
+    return yinsolidated.parse_json(json.dumps(model))
+
+
+def _serialize(model):
+    if isinstance(model, dict):
+        return json.dumps(model, sort_keys=True)
+
+    xml_parser = etree.XMLParser(remove_blank_text=True)
+    return etree.tostring(
+        etree.fromstring(etree.tostring(model), xml_parser), method="c14n"
+    )
+
+
+_BASE = [("test-module.yang", None)]
+
+_AUGMENTING = [("augmenting-module.yang", None)]
+
+_VENDOR = [("vendor.yang", _VENDOR_MODULE)]
+
+
+@pytest.mark.parametrize("fmt", ["xml", "json"])
+def test_same_as_consolidated_model(fmt):
+    base = _build_model(fmt, _BASE)
+    augment_model = _build_model(fmt, _AUGMENTING, augment_model=True)
+    expected = _build_model(fmt, _BASE + _AUGMENTING)
+
+    assert merge.merge_models(base, augment_model) is base
+    assert _serialize(base) == _serialize(expected)
+
+
+def test_augment_model_unchanged():
+    augment_model = _build_model("json", _AUGMENTING, augment_model=True)
+    expected = _serialize(augment_model)
+
+    merge.merge_models(_build_model("json", _BASE), augment_model)
+    assert _serialize(augment_model) == expected
+
+
+@pytest.mark.parametrize("fmt", ["xml", "json"])
+def test_grafted_properties(fmt):
+    base = _build_model(fmt, _BASE)
+    merge.merge_models(base, _build_model(fmt, _AUGMENTING, augment_model=True))
+
+    if fmt == "xml":
+        leaf_elem = base.find(
+            './/yin:leaf[@name="augmenting-case-leaf"]',
+            namespaces={"yin": _YIN_NAMESPACE},
+        )
+    else:
+        leaf_elem = next(
+            elem
+            for elem in base.iterfind("leaf", recursive=True)
+            if elem.name == "augmenting-case-leaf"
+        )
+
+    assert leaf_elem.prefix == "aug"
+    assert leaf_elem.module_name == "augmenting-module"
+    assert leaf_elem.namespace == "urn:xml:ns:test:augment"
+    assert leaf_elem.schema_path == "/aug:augmenting-case-leaf"
+
+
+def test_identities_added():
+    base = _build_model("json", _BASE)
+    merge.merge_models(base, _build_model("json", _AUGMENTING, augment_model=True))
+
+    identity_names = [identity.name for identity in base.findall("identity")]
+    assert identity_names.count("augmenting-derived-identity") == 1
+    assert len(identity_names) == len(set(identity_names))
+
+
+def test_typedef_ids_renamed():
+    base = _build_model("xml", _BASE, typedef_table=True)
+    augment_model = _build_model("xml", _VENDOR, typedef_table=True, augment_model=True)
+    typedef_ids = base.xpath(
+        "yin:typedef/@typedef-id", namespaces={"yin": _YIN_NAMESPACE}
+    )
+    assert "1" in typedef_ids
+
+    merge.merge_models(base, augment_model)
+
+    merged_ids = base.xpath(
+        "yin:typedef/@typedef-id", namespaces={"yin": _YIN_NAMESPACE}
+    )
+    assert len(merged_ids) == len(set(merged_ids)) == len(typedef_ids) + 1
+
+    leaf_elem = base.find(
+        './/yin:leaf[@name="vendor-leaf"]', namespaces={"yin": _YIN_NAMESPACE}
+    )
+    assert leaf_elem.type.typedef.name == "vendor-string"
+    assert leaf_elem.type.typedef.prefix == "v"
+
+
+def test_missing_target():
+    base = _build_model("json", _BASE)
+    base["children"] = [
+        child for child in base.children if child.name != "augmented-container"
+    ]
+
+    with pytest.raises(yinsolidated.MissingAugmentTargetError):
+        merge.merge_models(base, _build_model("json", _AUGMENTING, augment_model=True))
+
+
+def test_already_merged():
+    base = _build_model("json", _BASE)
+    augment_model = _build_model("json", _AUGMENTING, augment_model=True)
+    merge.merge_models(base, augment_model)
+
+    with pytest.raises(yinsolidated.Error):
+        merge.merge_models(base, augment_model)
+
+
+def test_mixed_parsers():
+    with pytest.raises(yinsolidated.Error):
+        merge.merge_models(
+            _build_model("xml", _BASE),
+            _build_model("json", _AUGMENTING, augment_model=True),
+        )
@@ -4,11 +4,15 @@
 
 from __future__ import unicode_literals
 
+import copy
+import gc
 import os
+import weakref
 
 import pytest
 
 import yinsolidated
+from yinsolidated import _common, parser
 
 
 _NSMAP = {"yin": "urn:ietf:params:xml:ns:yang:yin:1"}
@@ -26,6 +30,130 @@ def test_parse_file():
     assert container_element.name == "test"
 
 
+_DEDUPE_MODEL = """
+    <module xmlns="urn:ietf:params:xml:ns:yang:yin:1"
+            xmlns:t="test:ns"
+            module-prefix="t">
+        <leaf name="leaf-a">
+            <type name="percentage">
+                <typedef name="percentage">
+                    <type name="uint8"/>
+                </typedef>
+            </type>
+        </leaf>
+        <leaf name="leaf-b">
+            <type name="percentage">
+                <typedef name="percentage">
+                    <type name="uint8"/>
+                </typedef>
+            </type>
+        </leaf>
+        <leaf name="leaf-c" xmlns:o="other:ns" module-prefix="o">
+            <type name="percentage">
+                <typedef name="percentage">
+                    <type name="uint8"/>
+                </typedef>
+            </type>
+        </leaf>
+    </module>
+    """
+
+
+class TestDedupe(object):
+    @pytest.fixture
+    def module_elem(self):
+        return yinsolidated.fromstring(_DEDUPE_MODEL, dedupe=True)
+
+    def test_identical_typedefs_shared(self, module_elem):
+        leaf_a, leaf_b, _ = module_elem.findall("yin:leaf", namespaces=_NSMAP)
+
+        assert leaf_a.type.get("typedef-ref") == leaf_b.type.get("typedef-ref")
+        assert leaf_b.type.typedef.name == "percentage"
+        assert leaf_b.type.base_type.name == "uint8"
+
+    def test_typedefs_in_other_scopes_not_shared(self, module_elem):
+        leaf_a, _, leaf_c = module_elem.findall("yin:leaf", namespaces=_NSMAP)
+
+        assert leaf_a.type.get("typedef-ref") != leaf_c.type.get("typedef-ref")
+        assert leaf_a.type.typedef.prefix == "t"
+        assert leaf_c.type.typedef.prefix == "o"
+        assert leaf_c.type.typedef.namespace == "other:ns"
+
+    def test_no_typedefs_copied(self, module_elem):
+        assert not module_elem.xpath("//yin:type/yin:typedef", namespaces=_NSMAP)
+        assert len(module_elem.findall("yin:typedef", namespaces=_NSMAP)) == 2
+
+    def test_report(self, module_elem):
+        report = module_elem.dedupe_report
+
+        assert report.shared_subtrees == 1
+        assert report.replaced_subtrees == 1
+        assert report.elements_saved == 2
+        assert report.bytes_saved > 0
+
+    def test_no_report_without_dedupe(self):
+        module_elem = yinsolidated.fromstring(_DEDUPE_MODEL)
+
+        assert module_elem.dedupe_report is None
+
+    def test_parse_file(self):
+        model_tree = yinsolidated.parse(_TEST_CONSOLIDATED_MODEL_PATH, dedupe=True)
+
+        assert model_tree.getroot().dedupe_report.shared_subtrees == 0
+
+
+_DOCUMENTED_MODEL = """
+    <module xmlns="urn:ietf:params:xml:ns:yang:yin:1" name="test" module-prefix="t">
+        <organization><text>Org</text></organization>
+        <contact><text>Somebody</text></contact>
+        <description><text>Test model</text></description>
+        <leaf name="documented-leaf">
+            <description><text>A leaf</text></description>
+            <reference><text>RFC 6020</text></reference>
+            <type name="string"/>
+        </leaf>
+    </module>
+"""
+
+
+class TestStripDocumentation(object):
+    def test_documentation_removed(self):
+        module_elem = yinsolidated.fromstring(
+            _DOCUMENTED_MODEL, strip_documentation=True
+        )
+
+        assert [child.keyword for child in module_elem] == ["leaf"]
+        assert [child.keyword for child in module_elem.find("yin:leaf", _NSMAP)] == [
+            "type"
+        ]
+
+    def test_description_raises(self):
+        module_elem = yinsolidated.fromstring(
+            _DOCUMENTED_MODEL, strip_documentation=True
+        )
+        leaf_elem = module_elem.find("yin:leaf", namespaces=_NSMAP)
+
+        assert leaf_elem.type.name == "string"
+        with pytest.raises(yinsolidated.DocumentationStrippedError):
+            leaf_elem.description
+
+    def test_description_without_stripping(self):
+        module_elem = yinsolidated.fromstring(_DOCUMENTED_MODEL)
+
+        assert module_elem.find("yin:leaf", namespaces=_NSMAP).description == "A leaf"
+
+    def test_parse_file(self):
+        model_tree = yinsolidated.parse(
+            _TEST_CONSOLIDATED_MODEL_PATH, strip_documentation=True
+        )
+        module_element = model_tree.getroot()
+
+        assert module_element.find("yin:description", namespaces=_NSMAP) is None
+        assert module_element.find("yin:container", namespaces=_NSMAP).name == "test"
+        with pytest.raises(yinsolidated.DocumentationStrippedError):
+            module_element.description
+
+
 class TestYinElement(object):
     def test_keyword(self):
         module_elem = yinsolidated.fromstring(
@@ -354,6 +482,158 @@ class TestGetAncestorOrSelfDataNodes(object):
         assert data_node_ancestors[2].keyword == "leaf-list"
 
 
+_SCHEMA_PATH_MODEL = """
+<module xmlns="urn:ietf:params:xml:ns:yang:yin:1" name="test" module-prefix="t">
+    <container name="test-container">
+        <choice name="test-choice">
+            <case name="test-case">
+                <leaf name="test-leaf"/>
+            </case>
+        </choice>
+        <container name="augmenting-container" module-prefix="a">
+            <leaf name="augmenting-leaf"/>
+        </container>
+    </container>
+    <rpc name="test-rpc">
+        <input>
+            <leaf name="input-leaf" id="42" schema-path="/t:emitted"/>
+        </input>
+    </rpc>
+</module>
+"""
+
+
+class TestSchemaPath(object):
+    @pytest.fixture
+    def model(self):
+        return yinsolidated.fromstring(_SCHEMA_PATH_MODEL)
+
+    def test_choice_and_case_omitted(self, model):
+        leaf_elem = model.find(".//yin:leaf[@name='test-leaf']", namespaces=_NSMAP)
+        assert leaf_elem.schema_path == "/t:test-container/t:test-leaf"
+        assert leaf_elem.node_id == _common.get_node_id(leaf_elem.schema_path)
+
+    def test_augmenting_prefix(self, model):
+        leaf_elem = model.find(
+            ".//yin:leaf[@name='augmenting-leaf']", namespaces=_NSMAP
+        )
+        assert (
+            leaf_elem.schema_path
+            == "/t:test-container/a:augmenting-container/a:augmenting-leaf"
+        )
+
+    def test_rpc_input(self, model):
+        input_elem = model.find("yin:rpc/yin:input", namespaces=_NSMAP)
+        assert input_elem.schema_path == "/t:test-rpc/t:input"
+
+    def test_attributes_preferred(self, model):
+        leaf_elem = model.find(".//yin:leaf[@name='input-leaf']", namespaces=_NSMAP)
+        assert leaf_elem.schema_path == "/t:emitted"
+        assert leaf_elem.node_id == 42
+
+    def test_not_a_schema_node(self, model):
+        choice_elem = model.find(".//yin:choice", namespaces=_NSMAP)
+        assert choice_elem.schema_path is None
+        assert choice_elem.node_id is None
+
+    def test_missing_leafref_target(self):
+        leaf_elem = yinsolidated.fromstring(
+            """
+            <leaf xmlns="urn:ietf:params:xml:ns:yang:yin:1" name="test-leaf"
+                  module-prefix="t">
+                <type name="leafref" target-id="1">
+                    <path value="../missing-leaf"/>
+                </type>
+            </leaf>
+            """
+        )
+
+        with pytest.raises(yinsolidated.MissingLeafrefTargetError):
+            leaf_elem.type.leafref_target
+
+
+_LOOKUP_MODEL = """
+<module xmlns="urn:ietf:params:xml:ns:yang:yin:1" name="test" module-prefix="t">
+    <typedef name="name" typedef-id="1">
+        <type name="string"/>
+    </typedef>
+    <container name="test-container">
+        <leaf name="target" id="8">
+            <type name="t:name" typedef-ref="1"/>
+        </leaf>
+        <leaf name="reference">
+            <type name="leafref" target-id="8">
+                <path value="../target"/>
+            </type>
+        </leaf>
+    </container>
+</module>
+"""
+
+
+class TestLookupTables(object):
+    @staticmethod
+    def _find_leaf(name):
+        # Only the leaf is kept, so lxml drops the proxies of its ancestors
+        return yinsolidated.fromstring(_LOOKUP_MODEL).find(
+            ".//yin:leaf[@name='{}']".format(name), namespaces=_NSMAP
+        )
+
+    @staticmethod
+    def _count_calls(monkeypatch, module, name):
+        calls = []
+        function = getattr(module, name)
+
+        def counted(*args):
+            calls.append(args)
+            return function(*args)
+
+        monkeypatch.setattr(module, name, counted)
+        return calls
+
+    def test_node_id_index_kept(self, monkeypatch):
+        leaf_elem = self._find_leaf("reference")
+        builds = self._count_calls(monkeypatch, parser, "_build_node_id_index")
+
+        for _ in range(2):
+            gc.collect()
+            assert leaf_elem.type.leafref_target.name == "target"
+
+        assert len(builds) == 1
+
+    def test_typedef_table_kept(self, monkeypatch):
+        leaf_elem = self._find_leaf("target")
+        builds = self._count_calls(monkeypatch, parser, "_build_typedef_table")
+
+        for _ in range(5):
+            gc.collect()
+            assert leaf_elem.type.typedef.name == "name"
+
+        assert len(builds) == 1
+
+    def test_schema_path_kept(self, monkeypatch):
+        leaf_elem = self._find_leaf("target")
+        calls = self._count_calls(monkeypatch, _common, "get_schema_path")
+
+        for _ in range(2):
+            gc.collect()
+            assert leaf_elem.schema_path == "/t:test-container/t:target"
+
+        assert len(calls) == 1
+
+    def test_not_shared_with_copy(self):
+        module_elem = yinsolidated.fromstring(_LOOKUP_MODEL)
+        leaf_xpath = ".//yin:leaf[@name='reference']"
+        _ = module_elem.find(leaf_xpath, namespaces=_NSMAP).type.leafref_target
+
+        copied_elem = copy.deepcopy(module_elem)
+        target_elem = copied_elem.find(
+            leaf_xpath, namespaces=_NSMAP
+        ).type.leafref_target
+
+        assert target_elem.getroottree().getroot() is copied_elem
+
+
 class TestModuleElement(object):
     def test_name(self):
         module_elem = yinsolidated.fromstring(
@@ -954,6 +1234,45 @@ class TestTypeElement(object):
 
         assert type_elem.typedef is None
 
+    def test_typedef_reference(self):
+        module_elem = yinsolidated.fromstring(
+            """
+            <module xmlns="urn:ietf:params:xml:ns:yang:yin:1">
+                <leaf name="test-leaf">
+                    <type name="percentage" typedef-ref="1"/>
+                </leaf>
+                <typedef name="percentage" typedef-id="1">
+                    <type name="meter" typedef-ref="2">
+                        <range value="0..100"/>
+                    </type>
+                </typedef>
+                <typedef name="meter" typedef-id="2">
+                    <type name="uint8"/>
+                </typedef>
+            </module>
+            """
+        )
+        type_elem = module_elem.find("yin:leaf/yin:type", namespaces=_NSMAP)
+
+        assert type_elem.typedef.name == "percentage"
+        assert type_elem.range == "0..100"
+        assert type_elem.base_type.name == "uint8"
+
+    def test_missing_typedef_reference(self):
+        module_elem = yinsolidated.fromstring(
+            """
+            <module xmlns="urn:ietf:params:xml:ns:yang:yin:1">
+                <leaf name="test-leaf">
+                    <type name="percentage" typedef-ref="1"/>
+                </leaf>
+            </module>
+            """
+        )
+        type_elem = module_elem.find("yin:leaf/yin:type", namespaces=_NSMAP)
+
+        with pytest.raises(yinsolidated.MissingTypedefError):
+            _ = type_elem.typedef
+
     def test_bits(self):
         type_elem = yinsolidated.fromstring(
             """
@@ -1865,3 +2184,90 @@ class TestIdentityElement(object):
         assert len(direct_identities) == 2
         assert direct_identities[0].name == "derived-identity-1"
         assert direct_identities[1].name == "external-derived-identity"
+
+
+_CONTENT_HASH_MODEL = """
+<module xmlns="urn:ietf:params:xml:ns:yang:yin:1" xmlns:t="test:ns"
+        name="test" module-prefix="t">
+  <container name="c">
+    <leaf name="l1">
+      <type name="t:name" typedef-ref="{typedef_id}"/>
+    </leaf>
+    <leaf name="l2">
+      <type name="{l2_type}"/>
+    </leaf>
+  </container>
+  <leaf name="sibling">
+    <type name="string"/>
+  </leaf>
+  <typedef name="other" typedef-id="{other_typedef_id}">
+    <type name="int8"/>
+  </typedef>
+  <typedef name="name" typedef-id="{typedef_id}">
+    <type name="string"/>
+  </typedef>
+</module>
+"""
+
+
+def _make_content_hash_model(typedef_id="1", other_typedef_id="2", l2_type="int8"):
+    return yinsolidated.fromstring(
+        _CONTENT_HASH_MODEL.format(
+            typedef_id=typedef_id, other_typedef_id=other_typedef_id, l2_type=l2_type
+        )
+    )
+
+
+class TestContentHash(object):
+    @staticmethod
+    def _find(model, name):
+        return model.find(".//yin:*[@name='{}']".format(name), namespaces=_NSMAP)
+
+    def test_identical_models(self):
+        model = _make_content_hash_model()
+        other_model = _make_content_hash_model()
+
+        assert model.content_hash == other_model.content_hash
+        assert len(model.content_hash) == 64
+
+    def test_change_propagates_to_ancestors(self):
+        model = _make_content_hash_model()
+        changed_model = _make_content_hash_model(l2_type="int16")
+
+        for name in ("l2", "c"):
+            assert (
+                self._find(model, name).content_hash
+                != self._find(changed_model, name).content_hash
+            )
+        assert model.content_hash != changed_model.content_hash
+
+        for name in ("l1", "sibling"):
+            assert (
+                self._find(model, name).content_hash
+                == self._find(changed_model, name).content_hash
+            )
+
+    def test_typedef_ids_ignored(self):
+        model = _make_content_hash_model()
+        renumbered_model = _make_content_hash_model(
+            typedef_id="2", other_typedef_id="1"
+        )
+
+        assert model.content_hash == renumbered_model.content_hash
+
+    def test_model_freed(self):
+        model = _make_content_hash_model()
+        _ = model.content_hash
+        model_ref = weakref.ref(model)
+
+        del model
+        gc.collect()
+
+        assert model_ref() is None
+
+    def test_emitted_hash_preferred(self):
+        model = _make_content_hash_model()
+        leaf_elem = self._find(model, "sibling")
+        leaf_elem.set("content-hash", "emitted")
+
+        assert leaf_elem.content_hash == "emitted"
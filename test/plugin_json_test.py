@@ -11,6 +11,8 @@ import subprocess
 import pyang
 import pytest
 
+import yinsolidated
+from yinsolidated import shards
 from yinsolidated.plugin import plugin
 
 
@@ -22,8 +24,7 @@ AUGMENTING_NAMESPACE = "urn:xml:ns:test:augment"
 NSMAP = {"yin": YIN_NAMESPACE, "test": TEST_NAMESPACE, "aug": AUGMENTING_NAMESPACE}
 
 
-@pytest.fixture(scope="module")
-def consolidated_model():
+def run_pyang(*options):
     test_file_dir = os.path.dirname(os.path.realpath(__file__))
     modules_dir = os.path.join(test_file_dir, "modules")
     main_module = os.path.join(modules_dir, "test-module.yang")
@@ -37,15 +38,19 @@ def consolidated_model():
         "-p",
         modules_dir,
     ]
+    pyang_command.extend(options)
 
     if pyang.__version__ < "1.7.2":
         pyang_command.extend(["--plugindir", YINSOLIDATED_PLUGIN_DIRECTORY])
 
     pyang_command.extend([main_module, augmenting_module])
 
-    consolidated_model_json = subprocess.check_output(pyang_command)
+    return subprocess.check_output(pyang_command).decode("utf-8")
+
 
-    return json.loads(consolidated_model_json.decode("utf-8"))
+@pytest.fixture(scope="module")
+def consolidated_model():
+    return json.loads(run_pyang())
 
 
 def get_nested(yin_element, *path):
@@ -159,3 +164,132 @@ class TestEverything(object):
             expected = json.load(file_)
 
         assert consolidated_model == expected
+
+
+class TestJsonIndent(object):
+    def test_default_indent_matches_json_dumps(self, consolidated_model):
+        assert run_pyang() == json.dumps(consolidated_model, indent=2)
+
+    def test_compact(self, consolidated_model):
+        compact_json = run_pyang("--yinsolidated-json-indent=0")
+
+        assert "\n" not in compact_json
+        assert json.loads(compact_json) == consolidated_model
+
+
+class TestCompact(object):
+    def test_compact_parses_to_same_model(self, consolidated_model):
+        compact_json = run_pyang("--yinsolidated-compact")
+
+        raw_model = json.loads(compact_json)
+
+        assert "\n" not in compact_json
+        assert raw_model["default-namespace"] == "urn:ietf:params:xml:ns:yang:yin:1"
+        assert "namespace" not in raw_model["children"][0]
+        assert yinsolidated.parse_json(compact_json) == yinsolidated.parse_json(
+            json.dumps(consolidated_model)
+        )
+
+    def test_compact_keys_parse_to_same_model(self, consolidated_model):
+        compact_json = run_pyang("--yinsolidated-compact-keys")
+
+        raw_model = json.loads(compact_json)
+
+        assert raw_model["$k"] == "module"
+        assert "keyword" not in raw_model["$c"][0]
+        assert yinsolidated.parse_json(compact_json) == yinsolidated.parse_json(
+            json.dumps(consolidated_model)
+        )
+
+
+class TestTable(object):
+    def test_table_parses_to_same_model(self, consolidated_model):
+        table_json = run_pyang("--yinsolidated-output-format=table")
+
+        raw_table = json.loads(table_json)
+
+        assert raw_table["format"] == "yinsolidated-node-table"
+        assert raw_table["parents"][0] == -1
+        assert yinsolidated.parse_table(table_json) == yinsolidated.parse_json(
+            json.dumps(consolidated_model)
+        )
+
+    def test_table_written_with_json(self, consolidated_model, tmpdir):
+        table_path = str(tmpdir.join("model.table.json"))
+        json_model = run_pyang("--yinsolidated-table-output=" + table_path)
+
+        with open(table_path) as table_file:
+            table_model = yinsolidated.parse_table(table_file.read())
+
+        assert json.loads(json_model) == consolidated_model
+        assert table_model == yinsolidated.parse_json(json_model)
+
+
+class TestShards(object):
+    def test_shards_load_to_same_model(self, consolidated_model, tmpdir):
+        shard_dir = str(tmpdir.join("shards"))
+        json_model = run_pyang("--yinsolidated-shard-dir=" + shard_dir)
+
+        assert json.loads(json_model) == consolidated_model
+        assert shards.load_shards(shard_dir) == yinsolidated.parse_json(json_model)
+
+
+def _iter_elements(element):
+    yield element
+    for child in element.children:
+        for descendant in _iter_elements(child):
+            yield descendant
+
+
+class TestContentHashes(object):
+    @pytest.mark.parametrize(
+        "options",
+        [
+            pytest.param([], id="plain"),
+            pytest.param(["--yinsolidated-typedef-table"], id="typedef_table"),
+            pytest.param(["--yinsolidated-compact-keys"], id="compact_keys"),
+        ],
+    )
+    def test_emitted_hashes_match(self, options):
+        raw_model = run_pyang("--yinsolidated-content-hashes", *options)
+        model = yinsolidated.parse_json(raw_model)
+        unhashed_model = yinsolidated.parse_json(run_pyang(*options))
+
+        hashed_elements = [
+            elem for elem in _iter_elements(model) if elem.get("content-hash")
+        ]
+        assert hashed_elements
+        assert model.get("content-hash") == unhashed_model.content_hash
+
+        for elem, unhashed_elem in zip(
+            _iter_elements(model), _iter_elements(unhashed_model)
+        ):
+            if elem.get("content-hash") is not None:
+                assert elem.get("content-hash") == unhashed_elem.content_hash
+
+    def test_only_nodes_hashed(self):
+        model = yinsolidated.parse_json(run_pyang("--yinsolidated-content-hashes"))
+
+        leaf_elem = next(model.iterfind("leaf"))
+        assert leaf_elem.get("content-hash") is not None
+        assert leaf_elem.type.get("content-hash") is None
+
+
+class TestTypedefTable(object):
+    def test_typedef_resolved(self, consolidated_model):
+        model_with_typedef_table = yinsolidated.parse_json(
+            run_pyang("--yinsolidated-typedef-table")
+        )
+        model_with_copies = yinsolidated.parse_json(json.dumps(consolidated_model))
+
+        for model in (model_with_typedef_table, model_with_copies):
+            leaf_elem = next(
+                child
+                for child in model.iterfind("leaf")
+                if child.name == "leaf-with-typedef"
+            )
+
+            assert leaf_elem.type.typedef.name == "derived-typedef"
+            assert leaf_elem.type.length == "11 | 42..max"
+            assert leaf_elem.type.typedef.type.typedef.default == "bumfuzzling"
+            assert leaf_elem.type.base_type.name == "string"
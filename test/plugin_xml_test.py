@@ -4,13 +4,20 @@
 
 from __future__ import unicode_literals
 
+import collections
+import io
+import json
 import os
+import shutil
 import subprocess
+import sys
 
 import pyang
 import pytest
 from lxml import doctestcompare, etree
 
+import yinsolidated
+from yinsolidated import _json_writer
 from yinsolidated.plugin import plugin
 
 
@@ -22,8 +29,7 @@ AUGMENTING_NAMESPACE = "urn:xml:ns:test:augment"
 NSMAP = {"yin": YIN_NAMESPACE, "test": TEST_NAMESPACE, "aug": AUGMENTING_NAMESPACE}
 
 
-@pytest.fixture(scope="module")
-def consolidated_model():
+def run_pyang(*options):
     test_file_dir = os.path.dirname(os.path.realpath(__file__))
     modules_dir = os.path.join(test_file_dir, "modules")
     main_module = os.path.join(modules_dir, "test-module.yang")
@@ -36,15 +42,41 @@ def consolidated_model():
         "-p",
         modules_dir,
     ]
+    pyang_command.extend(options)
 
     if pyang.__version__ < "1.7.2":
         pyang_command.extend(["--plugindir", YINSOLIDATED_PLUGIN_DIRECTORY])
 
     pyang_command.extend([main_module, augmenting_module])
 
-    consolidated_model_xml = subprocess.check_output(pyang_command)
+    return subprocess.check_output(pyang_command)
+
+
+def load_modules(*paths):
+    test_file_dir = os.path.dirname(os.path.realpath(__file__))
+    modules_dir = os.path.join(test_file_dir, "modules")
+
+    ctx = pyang.Context(pyang.FileRepository(modules_dir))
+    modules = []
+    for path in paths or ("test-module.yang", "augmenting-module.yang"):
+        with open(os.path.join(modules_dir, path)) as module_file:
+            modules.append(ctx.add_module(path, module_file.read()))
+    ctx.validate()
+
+    return modules
+
+
+def load_module_text(path, module_text):
+    ctx = pyang.Context(pyang.FileRepository("."))
+    module = ctx.add_module(path, module_text)
+    ctx.validate()
+
+    return module
 
-    return etree.fromstring(consolidated_model_xml)
+
+@pytest.fixture(scope="module")
+def consolidated_model():
+    return etree.fromstring(run_pyang())
 
 
 _XML_CHECKER = doctestcompare.LXMLOutputChecker()
@@ -900,6 +932,80 @@ class TestTypedef(object):
         assert_xml_equal(expected_xml, actual_xml)
 
 
+@pytest.fixture(scope="module")
+def model_with_typedef_table():
+    return yinsolidated.fromstring(run_pyang("--yinsolidated-typedef-table"))
+
+
+class TestTypedefTable(object):
+    def test_type_refers_to_typedef(self, model_with_typedef_table):
+        type_elem = model_with_typedef_table.find(
+            'yin:leaf[@name="leaf-with-typedef"]/yin:type', namespaces=NSMAP
+        )
+        actual_xml = etree.tostring(type_elem)
+
+        expected_xml = """
+            <type xmlns="{yin}" name="derived-typedef" typedef-ref="4"/>
+            """.format(
+            **NSMAP
+        )
+
+        assert_xml_equal(expected_xml, actual_xml)
+
+    def test_typedef_table(self, model_with_typedef_table):
+        typedef_elem = model_with_typedef_table.find(
+            'yin:typedef[@typedef-id="4"]', namespaces=NSMAP
+        )
+        actual_xml = etree.tostring(typedef_elem)
+
+        expected_xml = """
+            <typedef xmlns="{yin}"
+                     xmlns:test="{test}"
+                     name="derived-typedef"
+                     module-prefix="test"
+                     module-name="test-module"
+                     typedef-id="4">
+                <type name="base-typedef" typedef-ref="9">
+                    <length value="11 | 42..max"/>
+                </type>
+            </typedef>
+            """.format(
+            **NSMAP
+        )
+
+        assert_xml_equal(expected_xml, actual_xml)
+
+    def test_each_typedef_added_once(self, model_with_typedef_table):
+        typedef_ids = model_with_typedef_table.xpath(
+            "yin:typedef/@typedef-id", namespaces=NSMAP
+        )
+        typedef_refs = model_with_typedef_table.xpath(
+            "//yin:type/@typedef-ref", namespaces=NSMAP
+        )
+
+        assert len(typedef_ids) == len(set(typedef_ids))
+        assert set(typedef_ids) == set(typedef_refs)
+        assert len(typedef_refs) > len(typedef_ids)
+
+    def test_no_typedefs_copied(self, model_with_typedef_table):
+        assert not model_with_typedef_table.xpath(
+            "//yin:type/yin:typedef", namespaces=NSMAP
+        )
+
+    def test_typedef_resolved(self, model_with_typedef_table, consolidated_model):
+        model_with_copies = yinsolidated.fromstring(etree.tostring(consolidated_model))
+
+        for model in (model_with_typedef_table, model_with_copies):
+            type_elem = model.find(
+                'yin:leaf[@name="leaf-with-typedef"]/yin:type', namespaces=NSMAP
+            )
+
+            assert type_elem.typedef.name == "derived-typedef"
+            assert type_elem.length == "11 | 42..max"
+            assert type_elem.typedef.type.typedef.default == "bumfuzzling"
+            assert type_elem.base_type.name == "string"
+
+
 class TestLeafref(object):
     def test_leafref_type_resolved(self, consolidated_model):
         leaf_elem = consolidated_model.find(
@@ -1157,3 +1263,501 @@ class TestAugment(object):
             "aug": AUGMENTING_NAMESPACE,
         }
         assert grouped_anyxml_elem.nsmap == expected_nsmap
+
+
+class TestLookupCounters(object):
+    def test_module_lookups_cached(self):
+        counters = collections.Counter()
+        plugin._build_consolidated_model(load_modules(), "xml", counters=counters)
+
+        # one nsmap per module and one namespace per module are computed
+        assert (
+            counters["module-nsmap-lookups"] - counters["module-nsmap-cache-hits"] == 2
+        )
+        assert (
+            counters["module-namespace-lookups"]
+            - counters["module-namespace-cache-hits"]
+            == 2
+        )
+        assert counters["module-nsmap-cache-hits"] > 0
+
+
+class TestProfile(object):
+    def test_profile_report(self):
+        profiler = plugin._Profiler()
+        plugin._build_consolidated_model(load_modules(), "xml", profiler=profiler)
+        report = profiler.get_report("xml")
+
+        assert report["format"] == "xml"
+        statements = report["statements"]
+        assert statements["total"] == sum(statements["by-module"].values())
+        assert set(statements["by-module"]) == {
+            "test-module",
+            "augmenting-module",
+        }
+        assert {"main-module", "typedef-inlining"} <= set(report["timings"])
+        assert report["counters"]["module-nsmap-lookups"] > 0
+
+    def test_typedef_amplification(self):
+        profiler = plugin._Profiler()
+        plugin._build_consolidated_model(load_modules(), "xml", profiler=profiler)
+        typedef_report = profiler.get_report("xml")["typedef-inlining"]
+
+        inner_type = next(
+            stats
+            for stats in typedef_report["by-typedef"]
+            if stats["name"] == "inner-type"
+        )
+        assert inner_type["uses"] == 5
+        assert inner_type["elements"] == 10
+        assert typedef_report["amplification"] > 1
+
+    def test_profile_written_next_to_output(self, tmpdir):
+        output_path = str(tmpdir.join("model.xml"))
+        run_pyang("--yinsolidated-profile", "-o", output_path)
+
+        with open(output_path + ".profile.json") as report_file:
+            report = json.load(report_file)
+
+        assert report["format"] == "xml"
+        assert report["statements"]["total"] > 0
+
+
+class TestBuildCache(object):
+    @staticmethod
+    def _run_pyang(modules_dir, cache_dir, *options):
+        pyang_command = [
+            "pyang",
+            "-f",
+            "yinsolidated",
+            "-p",
+            modules_dir,
+            "--yinsolidated-cache-dir",
+            cache_dir,
+        ]
+        pyang_command.extend(options)
+
+        if pyang.__version__ < "1.7.2":
+            pyang_command.extend(["--plugindir", YINSOLIDATED_PLUGIN_DIRECTORY])
+
+        pyang_command.extend(
+            [
+                os.path.join(modules_dir, "test-module.yang"),
+                os.path.join(modules_dir, "augmenting-module.yang"),
+            ]
+        )
+
+        return subprocess.check_output(pyang_command)
+
+    @pytest.fixture
+    def modules_dir(self, tmpdir):
+        test_file_dir = os.path.dirname(os.path.realpath(__file__))
+        modules_dir = str(tmpdir.join("modules"))
+        shutil.copytree(os.path.join(test_file_dir, "modules"), modules_dir)
+        return modules_dir
+
+    def test_cached_output_matches(self, modules_dir, tmpdir):
+        cache_dir = str(tmpdir.join("cache"))
+
+        first_output = self._run_pyang(modules_dir, cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+
+        assert self._run_pyang(modules_dir, cache_dir) == first_output
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_options_change_key(self, modules_dir, tmpdir):
+        cache_dir = str(tmpdir.join("cache"))
+
+        self._run_pyang(modules_dir, cache_dir)
+        self._run_pyang(modules_dir, cache_dir, "--yinsolidated-typedef-table")
+
+        assert len(os.listdir(cache_dir)) == 2
+
+    def test_submodule_change_invalidates(self, modules_dir, tmpdir):
+        cache_dir = str(tmpdir.join("cache"))
+        first_output = self._run_pyang(modules_dir, cache_dir)
+
+        submodule_path = os.path.join(modules_dir, "test-submodule.yang")
+        with open(submodule_path) as submodule_file:
+            submodule = submodule_file.read()
+        with open(submodule_path, "w") as submodule_file:
+            submodule_file.write(
+                submodule.replace("submodule-container", "changed-container")
+            )
+
+        second_output = self._run_pyang(modules_dir, cache_dir)
+
+        assert second_output != first_output
+        assert b"changed-container" in second_output
+
+
+class TestMultipleFormats(object):
+    def test_models_match_single_format_builds(self):
+        modules = load_modules()
+        models = plugin._build_consolidated_models(modules, ["xml", "json"])
+
+        assert etree.tostring(models["xml"]) == etree.tostring(
+            plugin._build_consolidated_model(modules, "xml")
+        )
+        assert models["json"] == plugin._build_consolidated_model(modules, "json")
+
+    def test_outputs_match_separate_runs(self, tmpdir):
+        json_path = str(tmpdir.join("model.json"))
+        xml_output = run_pyang("--yinsolidated-json-output", json_path)
+
+        assert xml_output == run_pyang()
+        with open(json_path, "rb") as json_file:
+            assert json_file.read() == run_pyang("--yinsolidated-output-format=json")
+
+
+_DEEP_MODEL_DEPTH = 1000
+
+
+@pytest.fixture(scope="module")
+def deep_module():
+    containers = "".join(
+        "container c{} {{".format(level) for level in range(_DEEP_MODEL_DEPTH)
+    )
+    typedefs = "typedef t0 { type string; }" + "".join(
+        "typedef t{} {{ type t{}; }}".format(level, level - 1)
+        for level in range(1, _DEEP_MODEL_DEPTH)
+    )
+    module_text = 'module deep {{ namespace "urn:deep"; prefix d; {} {} {} }}'.format(
+        typedefs,
+        containers + "leaf deep-leaf {{ type t{}; }}".format(_DEEP_MODEL_DEPTH - 1),
+        "}" * _DEEP_MODEL_DEPTH,
+    )
+
+    # pyang itself parses the module recursively
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, 20 * _DEEP_MODEL_DEPTH))
+    try:
+        return load_module_text("deep.yang", module_text)
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+
+
+class TestDeepModels(object):
+    def test_deep_xml_model(self, deep_module):
+        model = plugin._build_consolidated_model([deep_module], "xml")
+
+        leaf_elem = next(model.iter("{%s}leaf" % YIN_NAMESPACE))
+        # the module and each container
+        assert len(list(leaf_elem.iterancestors())) == _DEEP_MODEL_DEPTH + 1
+
+        # each typedef in the chain is inlined as a type and a typedef element
+        typedef_elems = list(leaf_elem.iter("{%s}typedef" % YIN_NAMESPACE))
+        assert len(typedef_elems) == _DEEP_MODEL_DEPTH
+        assert typedef_elems[-1].get("name") == "t0"
+
+    def test_deep_json_model(self, deep_module):
+        model = plugin._build_consolidated_model([deep_module], "json")
+
+        depth = 0
+        element = model
+        while element.get("children"):
+            element = element["children"][-1]
+            depth += 1
+
+        assert element["keyword"] == "type"
+        assert element["name"] == "string"
+        # each container, the leaf, a type and typedef per typedef and the base type
+        assert depth == _DEEP_MODEL_DEPTH + 1 + 2 * _DEEP_MODEL_DEPTH + 1
+
+    def test_deep_model_streamed(self, deep_module):
+        output = io.StringIO()
+        json_writer = _json_writer.JsonStreamWriter(output, indent=0)
+        plugin._build_consolidated_model([deep_module], "json", json_writer=json_writer)
+        json_writer.close()
+
+        assert output.getvalue().count('"keyword":"typedef"') == _DEEP_MODEL_DEPTH
+
+
+_IDENTITY_MODULE = """
+module identities {
+    namespace "urn:identities";
+    prefix i;
+
+    identity root;
+    identity color { base root; }
+    identity red { base color; }
+    identity dark-red { base red; }
+    identity shape { base root; }
+
+    container paint {
+        leaf color { type identityref { base color; } }
+    }
+    container drawing {
+        leaf shape { type identityref { base shape; } }
+    }
+}
+"""
+
+
+class TestRoots(object):
+    @staticmethod
+    def _get_names(model, keyword):
+        return [
+            elem.get("name")
+            for elem in model.iterfind("yin:" + keyword, namespaces=NSMAP)
+        ]
+
+    def test_only_selected_subtrees(self):
+        model = plugin._build_consolidated_model(
+            load_modules(), "xml", roots=["/root-container", "/test-rpc"]
+        )
+
+        assert self._get_names(model, "container") == ["root-container"]
+        assert self._get_names(model, "rpc") == ["test-rpc"]
+        assert not self._get_names(model, "leaf")
+        assert not self._get_names(model, "notification")
+
+    def test_selected_subtree_complete(self):
+        modules = load_modules()
+        full_model = plugin._build_consolidated_model(modules, "xml")
+        model = plugin._build_consolidated_model(
+            modules, "xml", roots=["/root-container"]
+        )
+
+        xpath = 'yin:container[@name="root-container"]'
+        assert etree.tostring(model.find(xpath, namespaces=NSMAP)) == etree.tostring(
+            full_model.find(xpath, namespaces=NSMAP)
+        )
+
+    def test_ancestors_only_contain_selected_branch(self):
+        model = plugin._build_consolidated_model(
+            load_modules(), "xml", roots=["/t:augmented-container/augmenting-leaf"]
+        )
+
+        container_elem = model.find(
+            'yin:container[@name="augmented-container"]', namespaces=NSMAP
+        )
+        assert [
+            etree.QName(child).localname + " " + child.get("name")
+            for child in container_elem
+        ] == ["leaf augmenting-leaf"]
+
+    def test_choice_and_case_may_be_omitted(self):
+        model = plugin._build_consolidated_model(
+            load_modules(), "xml", roots=["/augmenting-case-leaf"]
+        )
+
+        leaf_elem = model.find("yin:choice/yin:case/yin:leaf", namespaces=NSMAP)
+        assert leaf_elem.get("name") == "augmenting-case-leaf"
+
+    def test_leafref_target_included(self):
+        model = plugin._build_consolidated_model(
+            load_modules(), "xml", roots=["/leaf-with-leafref"]
+        )
+
+        assert self._get_names(model, "leaf") == ["root-leaf", "leaf-with-leafref"]
+
+    def test_unreferenced_identities_pruned(self):
+        model = plugin._build_consolidated_model(
+            load_modules(), "xml", roots=["/root-leaf"]
+        )
+
+        assert not self._get_names(model, "identity")
+
+    def test_related_identities_kept(self):
+        module = load_module_text("identities.yang", _IDENTITY_MODULE)
+        model = plugin._build_consolidated_model(
+            [module], "xml", roots=["/paint/color"]
+        )
+
+        assert self._get_names(model, "identity") == [
+            "root",
+            "color",
+            "red",
+            "dark-red",
+        ]
+
+    def test_invalid_root(self):
+        with pytest.raises(plugin.InvalidRootError, match="/root-container/nope"):
+            plugin._build_consolidated_model(
+                load_modules(), "xml", roots=["/root-container/nope"]
+            )
+
+    def test_root_option(self):
+        model = etree.fromstring(run_pyang("--yinsolidated-root", "/root-leaf-list"))
+
+        assert self._get_names(model, "leaf-list") == ["root-leaf-list"]
+        assert not self._get_names(model, "container")
+
+
+class TestStripDocumentation(object):
+    def test_documentation_omitted(self):
+        model = yinsolidated.fromstring(run_pyang("--yinsolidated-strip-documentation"))
+
+        for keyword in ("description", "reference", "organization", "contact"):
+            assert not model.xpath("//yin:" + keyword, namespaces=NSMAP)
+
+        leaf_elem = model.find('yin:leaf[@name="root-leaf"]', namespaces=NSMAP)
+        assert leaf_elem.type.name == "string"
+        with pytest.raises(yinsolidated.DocumentationStrippedError):
+            leaf_elem.description
+
+    def test_same_as_stripping_while_parsing(self):
+        generated_model = yinsolidated.fromstring(
+            run_pyang("--yinsolidated-strip-documentation")
+        )
+        parsed_model = yinsolidated.fromstring(run_pyang(), strip_documentation=True)
+
+        assert [elem.tag for elem in generated_model.iter()] == [
+            elem.tag for elem in parsed_model.iter()
+        ]
+        assert generated_model.attrib == parsed_model.attrib
+
+
+class TestNodeIds(object):
+    @staticmethod
+    def _get_schema_nodes(model):
+        return [
+            elem
+            for elem in model.iter("{%s}*" % YIN_NAMESPACE)
+            if elem.keyword in ("container", "leaf", "rpc", "input", "notification")
+        ]
+
+    def test_attributes_match_computed_values(self):
+        generated_model = yinsolidated.fromstring(run_pyang("--yinsolidated-node-ids"))
+        parsed_model = yinsolidated.fromstring(run_pyang())
+
+        generated_nodes = self._get_schema_nodes(generated_model)
+        parsed_nodes = self._get_schema_nodes(parsed_model)
+        assert [
+            (elem.get("schema-path"), int(elem.get("id"))) for elem in generated_nodes
+        ] == [(elem.schema_path, elem.node_id) for elem in parsed_nodes]
+
+    def test_ids_unique(self):
+        model = yinsolidated.fromstring(run_pyang("--yinsolidated-node-ids"))
+
+        node_ids = [elem.get("id") for elem in model.xpath("//*[@id]")]
+        assert len(node_ids) == len(set(node_ids))
+
+    def test_augmenting_node(self):
+        model = yinsolidated.fromstring(run_pyang("--yinsolidated-node-ids"))
+
+        leaf_elem = model.find('.//yin:leaf[@name="augmenting-leaf"]', namespaces=NSMAP)
+        assert leaf_elem.get("schema-path").endswith("/aug:augmenting-leaf")
+
+    def test_json_model(self):
+        model = yinsolidated.parse_json(
+            run_pyang(
+                "--yinsolidated-output-format=json", "--yinsolidated-node-ids"
+            ).decode("utf-8")
+        )
+
+        container_elem = model.find("container")
+        assert container_elem["schema-path"] == "/test:" + container_elem.name
+        assert container_elem.node_id == int(container_elem["id"])
+
+
+_LEAFREF_MODULE = """
+module leafrefs {
+    namespace "urn:leafrefs";
+    prefix l;
+
+    typedef name-ref {
+        type leafref {
+            path "/l:names/l:name";
+        }
+    }
+
+    leaf forward-ref {
+        type leafref {
+            path "../names/name";
+        }
+    }
+
+    leaf typedef-ref {
+        type name-ref;
+    }
+
+    leaf chained-ref {
+        type leafref {
+            path "../forward-ref";
+        }
+    }
+
+    container names {
+        leaf-list name {
+            type string;
+        }
+    }
+}
+"""
+
+
+class TestLeafrefTargets(object):
+    @pytest.fixture
+    def model(self):
+        module = load_module_text("leafrefs.yang", _LEAFREF_MODULE)
+        model = plugin._build_consolidated_model([module], "xml", node_ids=True)
+        return yinsolidated.fromstring(etree.tostring(model))
+
+    @staticmethod
+    def _get_leafref_target(model, leaf_name):
+        leaf_elem = model.find(
+            'yin:leaf[@name="{}"]'.format(leaf_name), namespaces=NSMAP
+        )
+        return leaf_elem.type.leafref_target
+
+    def test_forward_reference(self, model):
+        target = self._get_leafref_target(model, "forward-ref")
+        assert target.schema_path == "/l:names/l:name"
+
+    def test_typedef_leafref(self, model):
+        target = self._get_leafref_target(model, "typedef-ref")
+        assert target.keyword == "leaf-list"
+        assert target.name == "name"
+
+    def test_chained_leafref(self, model):
+        target = self._get_leafref_target(model, "chained-ref")
+        assert target.name == "forward-ref"
+        assert target.type.leafref_target.name == "name"
+
+    def test_not_a_leafref(self, model):
+        assert (
+            model.find(
+                "yin:container/yin:leaf-list", namespaces=NSMAP
+            ).type.leafref_target
+            is None
+        )
+
+    def test_json_model(self):
+        module = load_module_text("leafrefs.yang", _LEAFREF_MODULE)
+        output = io.StringIO()
+        writer = _json_writer.JsonStreamWriter(output)
+        plugin._build_consolidated_model(
+            [module], "json", json_writer=writer, node_ids=True
+        )
+        writer.close()
+
+        model = yinsolidated.parse_json(output.getvalue())
+        leaf_elem = model.find("leaf")
+        assert leaf_elem.type.leafref_target.schema_path == "/l:names/l:name"
+
+
+class TestAugmentModel(object):
+    def test_augments_of_other_modules(self):
+        model = plugin._build_consolidated_model(
+            load_modules("augmenting-module.yang"), "xml", augment_model=True
+        )
+
+        augment_elems = model.findall("yin:augment", namespaces=NSMAP)
+        assert [elem.get("target-node") for elem in augment_elems] == [
+            "/t:augmented-container",
+            "/t:root-choice",
+        ]
+        assert augment_elems[1].find("yin:case", namespaces=NSMAP).attrib == {
+            "name": "augmenting-case",
+            "module-prefix": "aug",
+            "module-name": "augmenting-module",
+        }
+
+    def test_disabled_by_default(self):
+        model = plugin._build_consolidated_model(
+            load_modules("augmenting-module.yang"), "xml"
+        )
+
+        assert model.find("yin:augment", namespaces=NSMAP) is None
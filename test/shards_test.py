@@ -0,0 +1,94 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the shards module"""
+
+from __future__ import unicode_literals
+
+import copy
+import json
+import os
+
+import pytest
+
+import yinsolidated
+from yinsolidated import shards
+
+
+_EXPECTED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "expected.json")
+
+
+@pytest.fixture(scope="module")
+def raw_model():
+    with open(_EXPECTED_MODEL_PATH) as file_:
+        return json.load(file_)
+
+
+@pytest.fixture
+def shard_dir(raw_model, tmpdir):
+    directory = str(tmpdir.join("shards"))
+    shards.write_shards(raw_model, directory)
+    return directory
+
+
+def _get_top_level_names(raw_model):
+    return [
+        child["name"]
+        for child in raw_model["children"]
+        if child["keyword"] in ("container", "leaf", "list", "rpc", "notification")
+    ]
+
+
+def test_manifest(raw_model, shard_dir):
+    manifest = shards.read_manifest(shard_dir)
+
+    assert manifest["module"]["module-name"] == raw_model["module-name"]
+    assert set(_get_top_level_names(raw_model)).issubset(
+        shard["name"] for shard in manifest["shards"]
+    )
+    for shard in manifest["shards"] + [manifest["root"]]:
+        assert os.path.isfile(os.path.join(shard_dir, shard["file"]))
+
+
+def test_load_all(raw_model, shard_dir):
+    assert shards.load_shards(shard_dir) == yinsolidated.parse_json(
+        copy.deepcopy(raw_model)
+    )
+
+
+def test_load_in_parallel(raw_model, shard_dir):
+    futures = pytest.importorskip("concurrent.futures")
+
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+        model = shards.load_shards(shard_dir, executor=executor)
+
+    assert model == yinsolidated.parse_json(copy.deepcopy(raw_model))
+
+
+def test_load_named_shards(raw_model, shard_dir):
+    name = _get_top_level_names(raw_model)[0]
+
+    model = shards.load_shards(shard_dir, names=[name])
+
+    assert [elem.name for elem in model.iterate_data_definitions()] == [name]
+    assert model.find("namespace") is not None
+    assert [elem["name"] for elem in model.iterfind("identity")] == [
+        child["name"]
+        for child in raw_model["children"]
+        if child["keyword"] == "identity"
+    ]
+
+
+def test_unknown_name(shard_dir):
+    with pytest.raises(yinsolidated.Error):
+        shards.load_shards(shard_dir, names=["missing"])
+
+
+def test_modified_shard(shard_dir):
+    manifest = shards.read_manifest(shard_dir)
+    with open(os.path.join(shard_dir, manifest["shards"][0]["file"]), "a") as file_:
+        file_.write(" ")
+
+    with pytest.raises(yinsolidated.Error):
+        shards.load_shards(shard_dir)
+
+    assert shards.load_shards(shard_dir, verify=False) is not None
@@ -0,0 +1,319 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Unit tests for the sqlite_store module"""
+
+from __future__ import unicode_literals
+
+import copy
+import gc
+import json
+import os
+import sqlite3
+
+import pytest
+
+import yinsolidated
+from yinsolidated import _common, diff, sqlite_store
+
+
+_EXPECTED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "expected.json")
+
+
+@pytest.fixture(scope="module")
+def raw_model():
+    with open(_EXPECTED_MODEL_PATH) as file_:
+        return json.load(file_)
+
+
+@pytest.fixture
+def store_path(raw_model, tmpdir):
+    path = str(tmpdir.join("model.db"))
+    sqlite_store.write_store(yinsolidated.parse_json(copy.deepcopy(raw_model)), path)
+    return path
+
+
+def _assert_same_tree(stored_elem, parsed_elem):
+    stack = [(stored_elem, parsed_elem)]
+    while stack:
+        stored_elem, parsed_elem = stack.pop()
+        assert dict(stored_elem) == {
+            key: value for key, value in parsed_elem.items() if key != "children"
+        }
+
+        stored_children = stored_elem.children
+        assert len(stored_children) == len(parsed_elem.children)
+        stack.extend(zip(stored_children, parsed_elem.children))
+
+
+def test_same_model(raw_model, store_path):
+    with sqlite_store.SqliteStore(store_path) as store:
+        _assert_same_tree(
+            store.getroot(), yinsolidated.parse_json(copy.deepcopy(raw_model))
+        )
+
+
+def test_cache_bounded(raw_model, store_path):
+    with sqlite_store.SqliteStore(store_path, cache_size=3) as store:
+        _assert_same_tree(
+            store.getroot(), yinsolidated.parse_json(copy.deepcopy(raw_model))
+        )
+
+        assert store.cached_node_count == 4
+
+
+def test_navigation(store_path):
+    with sqlite_store.SqliteStore(store_path, cache_size=3) as store:
+        module_elem = store.getroot()
+        leaf_elem = next(
+            elem for elem in module_elem.iterate_data_nodes() if elem.keyword == "leaf"
+        )
+
+        assert leaf_elem.parent is not None
+        assert leaf_elem.getroottree()["keyword"] == "module"
+        assert leaf_elem.type.name is not None
+        assert leaf_elem.prefix == module_elem.prefix
+
+
+def test_find_by_schema_path(raw_model, store_path):
+    parsed_model = yinsolidated.parse_json(copy.deepcopy(raw_model))
+    data_nodes = list(parsed_model.iterate_data_nodes())
+
+    with sqlite_store.SqliteStore(store_path) as store:
+        for data_node in data_nodes:
+            stored_elem = store.find_by_schema_path(data_node.schema_path)
+            assert (stored_elem.keyword, stored_elem.name) == (
+                data_node.keyword,
+                data_node.name,
+            )
+
+        assert store.find_by_schema_path("/missing") is None
+
+
+_YIN = "urn:ietf:params:xml:ns:yang:yin:1"
+
+_LOOKUP_MODEL = {
+    "keyword": "module",
+    "namespace": _YIN,
+    "name": "test",
+    "module-prefix": "t",
+    "children": [
+        {
+            "keyword": "typedef",
+            "namespace": _YIN,
+            "name": "name",
+            "typedef-id": "1",
+            "children": [{"keyword": "type", "namespace": _YIN, "name": "string"}],
+        }
+    ]
+    + [
+        {
+            "keyword": "container",
+            "namespace": _YIN,
+            "name": "container-{}".format(index),
+            "children": [
+                {
+                    "keyword": "leaf",
+                    "namespace": _YIN,
+                    "name": "target",
+                    "children": [
+                        {
+                            "keyword": "type",
+                            "namespace": _YIN,
+                            "name": "t:name",
+                            "typedef-ref": "1",
+                        }
+                    ],
+                },
+                {
+                    "keyword": "leaf",
+                    "namespace": _YIN,
+                    "name": "reference",
+                    "children": [
+                        {
+                            "keyword": "type",
+                            "namespace": _YIN,
+                            "name": "leafref",
+                            "target-id": str(
+                                _common.get_node_id(
+                                    "/t:container-{}/t:target".format(index)
+                                )
+                            ),
+                        }
+                    ],
+                },
+            ],
+        }
+        for index in range(10)
+    ],
+}
+
+
+def _count_loaded_elements(store):
+    # The elements of the store still in memory, whether the store keeps them or not
+    # pylint: disable=protected-access
+    gc.collect()
+    return sum(
+        1
+        for obj in gc.get_objects()
+        if isinstance(obj, sqlite_store._StoredElement)
+        and obj.__dict__.get("_store") is store
+    )
+
+
+class TestLookups(object):
+    @pytest.fixture
+    def store(self, tmpdir):
+        path = str(tmpdir.join("lookup.db"))
+        sqlite_store.write_store(
+            yinsolidated.parse_json(copy.deepcopy(_LOOKUP_MODEL)), path
+        )
+        with sqlite_store.SqliteStore(path, cache_size=5) as store:
+            yield store
+
+    def test_leafref_target(self, store):
+        leaf_elem = store.find_by_schema_path("/t:container-7/t:reference")
+        target_elem = leaf_elem.type.leafref_target
+
+        assert target_elem.schema_path == "/t:container-7/t:target"
+        assert _count_loaded_elements(store) <= 6
+
+    def test_leafref_target_attribute(self, tmpdir):
+        model = copy.deepcopy(_LOOKUP_MODEL)
+        model["children"][3]["children"][0]["id"] = "42"
+        model["children"][3]["children"][1]["children"][0]["target-id"] = "42"
+        path = str(tmpdir.join("lookup.db"))
+        sqlite_store.write_store(yinsolidated.parse_json(model), path)
+
+        with sqlite_store.SqliteStore(path, cache_size=5) as store:
+            leaf_elem = store.find_by_schema_path("/t:container-2/t:reference")
+            assert leaf_elem.type.leafref_target.name == "target"
+
+    def test_missing_leafref_target(self, store):
+        type_elem = store.find_by_schema_path("/t:container-0/t:reference").type
+        type_elem["target-id"] = "1"
+
+        with pytest.raises(yinsolidated.MissingLeafrefTargetError):
+            type_elem.leafref_target
+
+    def test_typedef(self, store):
+        for index in range(10):
+            leaf_elem = store.find_by_schema_path(
+                "/t:container-{}/t:target".format(index)
+            )
+            assert leaf_elem.type.typedef.name == "name"
+
+        assert _count_loaded_elements(store) <= 6
+
+    def test_missing_typedef(self, store):
+        type_elem = store.find_by_schema_path("/t:container-0/t:target").type
+        type_elem["typedef-ref"] = "2"
+
+        with pytest.raises(yinsolidated.MissingTypedefError):
+            type_elem.typedef
+
+
+class TestSmallCache(object):
+    @pytest.fixture
+    def store(self, store_path):
+        with sqlite_store.SqliteStore(store_path, cache_size=3) as store:
+            yield store
+
+    def test_content_hash(self, raw_model, store):
+        parsed_model = yinsolidated.parse_json(copy.deepcopy(raw_model))
+
+        assert store.getroot().content_hash == parsed_model.content_hash
+        assert _count_loaded_elements(store) <= 4
+
+    def test_diff_models(self, raw_model, store, tmpdir):
+        changed_model = copy.deepcopy(raw_model)
+        changed_model["children"].append(
+            {"keyword": "leaf", "namespace": _YIN, "name": "added-leaf"}
+        )
+        path = str(tmpdir.join("changed.db"))
+        sqlite_store.write_store(yinsolidated.parse_json(changed_model), path)
+
+        with sqlite_store.SqliteStore(path, cache_size=3) as changed_store:
+            changes = diff.diff_models(store.getroot(), changed_store.getroot())
+
+        assert [(change.kind, change.path) for change in changes] == [
+            ("added", "/{}:added-leaf".format(raw_model["module-prefix"]))
+        ]
+
+    def test_memory_report(self, raw_model, store):
+        parsed_model = yinsolidated.parse_json(copy.deepcopy(raw_model))
+
+        report = yinsolidated.memory_report(store.getroot())
+
+        assert report.elements == yinsolidated.memory_report(parsed_model).elements
+        assert report.duplicate_subtrees.copies > 0
+        assert _count_loaded_elements(store) <= 4
+
+
+def test_identities_table(raw_model, store_path):
+    identity_names = [
+        child["name"]
+        for child in raw_model["children"]
+        if child["keyword"] == "identity"
+    ]
+
+    with sqlite_store.SqliteStore(store_path) as store:
+        assert [name for (name,) in store.execute("SELECT name FROM identities")] == (
+            identity_names
+        )
+
+
+def test_read_only(store_path):
+    with sqlite_store.SqliteStore(store_path) as store:
+        with pytest.raises(sqlite3.OperationalError):
+            store.execute("DELETE FROM nodes")
+
+
+def test_existing_path_not_overwritten(raw_model, store_path):
+    with open(store_path, "rb") as store_file:
+        contents = store_file.read()
+
+    with pytest.raises(yinsolidated.Error):
+        sqlite_store.write_store(
+            yinsolidated.parse_json(copy.deepcopy(raw_model)), store_path
+        )
+
+    with open(store_path, "rb") as store_file:
+        assert store_file.read() == contents
+
+
+def test_missing_path(tmpdir):
+    path = str(tmpdir.join("missing.db"))
+
+    with pytest.raises(yinsolidated.Error):
+        sqlite_store.SqliteStore(path)
+
+    assert not os.path.exists(path)
+
+
+def test_not_a_store(tmpdir):
+    path = str(tmpdir.join("other.db"))
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE other (value TEXT)")
+    connection.commit()
+    connection.close()
+
+    with pytest.raises(yinsolidated.Error, match="not a yinsolidated SQLite store"):
+        sqlite_store.SqliteStore(path)
+
+
+def test_not_a_database(tmpdir):
+    path = tmpdir.join("model.json")
+    path.write("{}")
+
+    with pytest.raises(yinsolidated.Error, match="not a yinsolidated SQLite store"):
+        sqlite_store.SqliteStore(str(path))
+
+
+def test_unsupported_version(store_path):
+    connection = sqlite3.connect(store_path)
+    connection.execute("UPDATE metadata SET value = '0' WHERE key = 'version'")
+    connection.commit()
+    connection.close()
+
+    with pytest.raises(yinsolidated.Error):
+        sqlite_store.SqliteStore(store_path)
@@ -6,11 +6,20 @@
 
 # Forward module definitions
 from yinsolidated._error import (
+    DocumentationStrippedError,
     Error,
+    MissingAugmentTargetError,
+    MissingLeafrefTargetError,
     MissingIdentityError,
     MissingModuleNameError,
     MissingPrefixError,
+    MissingTypedefError,
 )
 from yinsolidated._version import __version__
-from yinsolidated.json_parser import parse as parse_json
+from yinsolidated.json_parser import parse as parse_json, parse_table
+from yinsolidated.memory import memory_report
 from yinsolidated.parser import *
+
+# Imported last, as it instruments the element classes of both parsers if enabled by
+# the environment
+from yinsolidated import instrumentation
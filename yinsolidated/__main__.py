@@ -0,0 +1,70 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Command line tools for YINsolidated models.
+
+Usage::
+
+    python -m yinsolidated convert model.xml model.json
+    python -m yinsolidated convert model.json model.xml
+"""
+
+from __future__ import unicode_literals
+
+import argparse
+import io
+import sys
+
+from yinsolidated import convert
+
+
+def main(argv=None):
+    """Runs the command given by *argv*, or by the command line arguments"""
+    arg_parser = argparse.ArgumentParser(prog="python -m yinsolidated")
+    subparsers = arg_parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    convert_parser = subparsers.add_parser(
+        "convert",
+        help="convert a model between the XML and JSON formats",
+        description=(
+            "Converts a YINsolidated model between the XML and JSON formats. The "
+            "format of the input is detected from its first character."
+        ),
+    )
+    convert_parser.add_argument("input", help="the model to convert")
+    convert_parser.add_argument("output", help="the file to write the model to")
+    convert_parser.add_argument(
+        "--indent",
+        type=int,
+        default=2,
+        help=(
+            "the number of spaces to indent JSON output with, or 0 to omit "
+            "insignificant whitespace"
+        ),
+    )
+
+    args = arg_parser.parse_args(argv)
+    _convert(args.input, args.output, args.indent)
+    return 0
+
+
+def _convert(input_path, output_path, indent):
+    with io.open(input_path, "rb") as input_file:
+        first_character = input_file.read(1024).lstrip()[:1]
+        input_file.seek(0)
+
+        if first_character == b"<":
+            with io.open(output_path, "w", encoding="utf-8") as output_file:
+                convert.xml_to_json(input_file, output_file, indent=indent or None)
+        else:
+            with io.open(output_path, "wb") as output_file:
+                convert.json_to_xml(
+                    io.TextIOWrapper(input_file, encoding="utf-8"),
+                    output_file,
+                    pretty_print=bool(indent),
+                )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""On-disk cache of generated YINsolidated documents"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+_ENTRY_SUFFIX = ".cache"
+
+_COPY_CHUNK_SIZE = 64 * 1024
+
+
+def make_key(*parts):
+    """Returns a cache key identifying the JSON-serializable *parts*"""
+    serialized = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def hash_file(path):
+    """Returns the SHA-256 hex digest of the contents of the file at *path*"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(_COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class BuildCache(object):
+
+    """
+    A directory of generated documents keyed by a hash of their inputs.
+
+    Each document is stored in its own file. Whenever a document is added, the least
+    recently used documents are removed until the total size of the cache is at most
+    *max_size* bytes.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def copy_to(self, key, output):
+        """
+        Writes the document stored under *key* to *output*.
+
+        Returns False without writing anything if there is no such document.
+        """
+        path = self.get_entry_path(key)
+        try:
+            input_file = io.open(path, encoding="utf-8")
+        except (IOError, OSError):
+            return False
+
+        with input_file:
+            # Mark the entry as recently used so that it is evicted last
+            os.utime(path, None)
+            for chunk in iter(lambda: input_file.read(_COPY_CHUNK_SIZE), ""):
+                output.write(chunk)
+
+        return True
+
+    def open_entry(self, key):
+        """Returns a file-like object that stores the text written to it under *key*"""
+        return _CacheEntryWriter(self, key)
+
+    def evict(self):
+        """Removes the least recently used documents until the cache fits"""
+        entries = []
+        total_size = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(_ENTRY_SUFFIX):
+                continue
+
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+    def get_entry_path(self, key):
+        """Returns the path of the file storing the document under *key*"""
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+
+class _CacheEntryWriter(object):
+
+    """
+    Writes a document to a temporary file that is moved into the cache on
+    :meth:`commit`, so that a partially written document is never read.
+    """
+
+    def __init__(self, cache, key):
+        self._cache = cache
+        self._key = key
+
+        file_descriptor, self._temporary_path = tempfile.mkstemp(
+            dir=cache.directory, suffix=".tmp"
+        )
+        self._file = io.open(file_descriptor, "w", encoding="utf-8")
+
+    def write(self, text):
+        """Appends *text* to the document"""
+        self._file.write(text)
+
+    def commit(self):
+        """Stores the document in the cache"""
+        self._file.close()
+        os.rename(self._temporary_path, self._cache.get_entry_path(self._key))
+        self._cache.evict()
+
+    def discard(self):
+        """Throws away the document"""
+        self._file.close()
+        os.remove(self._temporary_path)
+
+
+class TeeOutput(object):
+
+    """Writes all text to each of *outputs*"""
+
+    def __init__(self, *outputs):
+        self._outputs = outputs
+
+    def write(self, text):
+        """Writes *text* to each output"""
+        for output in self._outputs:
+            output.write(text)
@@ -2,6 +2,12 @@
 
 """Shared constants and utilities"""
 
+import collections
+import hashlib
+
+from yinsolidated import _error
+
+
 YIN_NS = "urn:ietf:params:xml:ns:yang:yin:1"
 
 
@@ -20,3 +26,80 @@ def is_data_node(keyword):
 def is_data_definition(keyword):
     """Returns True if *keyword* is a YANG data definition keyword"""
     return keyword in DATA_DEFINITION_KEYWORDS
+
+
+# Keywords of the statements that make up a schema path: the data nodes, and the
+# statements containing the data nodes of operations and notifications
+SCHEMA_NODE_KEYWORDS = frozenset(
+    DATA_NODE_KEYWORDS + ["rpc", "input", "output", "notification"]
+)
+
+# Attributes of the schema node elements of a model generated with node ids
+NODE_ID_ATTRIBUTE = "id"
+SCHEMA_PATH_ATTRIBUTE = "schema-path"
+
+# Attribute of the type element of a leafref holding the id of the node it refers to
+TARGET_ID_ATTRIBUTE = "target-id"
+
+# Attribute holding the content hash of an element, which the plugin adds to the
+# elements with CONTENT_HASH_KEYWORDS if asked to
+CONTENT_HASH_ATTRIBUTE = "content-hash"
+
+CONTENT_HASH_KEYWORDS = SCHEMA_NODE_KEYWORDS.union(
+    ["module", "choice", "case", "identity"]
+)
+
+
+def get_node_id(schema_path):
+    """
+    Returns the id of the schema node at *schema_path*, a non-negative 63-bit
+    integer that stays the same for as long as the path does
+    """
+    digest = hashlib.sha256(schema_path.encode("utf-8")).hexdigest()
+    return int(digest[:16], 16) >> 1
+
+
+def get_schema_path(elements):
+    """
+    Returns the schema path of the last of *elements*, which are the elements from
+    the module element down to a schema node, e.g. ``/t:interfaces/t:interface``
+    """
+    schema_path = ""
+    prefix = None
+    for element in elements:
+        prefix = element.get("module-prefix", prefix)
+        if element.keyword in SCHEMA_NODE_KEYWORDS:
+            if prefix is None:
+                raise _error.MissingPrefixError(element)
+            name = element.get("name") or element.keyword
+            schema_path += "/" + prefix + ":" + name
+    return schema_path
+
+
+# Keywords of the statements whose subtrees never contain data nodes and are often
+# repeated verbatim, e.g. by inlined typedefs and leafref types
+SHAREABLE_KEYWORDS = frozenset(["type", "typedef", "pattern", "enum", "bit"])
+
+
+# Keywords of the statements that only document the model
+DOCUMENTATION_KEYWORDS = frozenset(
+    ["description", "reference", "organization", "contact"]
+)
+
+# Set to "true" on the module element of a model without documentation statements
+DOCUMENTATION_STRIPPED_ATTRIBUTE = "documentation-stripped"
+
+
+DedupeReport = collections.namedtuple(
+    "DedupeReport",
+    [
+        # Number of distinct subtrees that replaced at least one duplicate
+        "shared_subtrees",
+        # Number of duplicate subtrees that were replaced
+        "replaced_subtrees",
+        # Number of elements that did not need to be kept in memory
+        "elements_saved",
+        # Estimated number of bytes that did not need to be kept in memory
+        "bytes_saved",
+    ],
+)
@@ -0,0 +1,233 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Content hashes of the subtrees of a YINsolidated model"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+from lxml import etree
+
+from yinsolidated import _common
+
+
+# Members of JSON elements that are not part of their content. The members of the
+# compact form are removed by the parser.
+_NON_CONTENT_JSON_MEMBERS = frozenset(
+    ["children", "default-namespace", "key-dictionary"]
+)
+
+
+class SubtreeHasher(object):
+
+    """
+    Computes and memoizes the content hash of each subtree of the model under
+    *root*, whose elements are read by *backend*.
+
+    The hash of an element is the SHA-256 hex digest of its keyword, attributes and
+    text, the namespaces it declares and the hashes of its children, in order, so
+    the hashes of a subtree are computed bottom-up in one pass over it. The
+    ``typedef-id`` of a typedef is left out, and the ``typedef-ref`` of a type is
+    replaced by the hash of the typedef it refers to, so that the hash does not
+    depend on how a typedef table is numbered. The hash of an element with a
+    ``content-hash`` attribute is the value of that attribute.
+
+    The typedefs of the typedef table are hashed up front, so that only their
+    hashes are kept. Elements are only kept when *backend* needs them to be for
+    their keys to stay unique, so the hashes of a model loaded on demand, such as
+    an SQLite store, do not keep its elements in memory.
+    """
+
+    def __init__(self, root, backend):
+        self._backend = backend
+        # Maps the key of each element to its hash
+        self._hashes = {}
+        # The elements that must stay alive for their keys to stay unique
+        self._kept_elements = []
+
+        self._typedef_hashes = {}
+        self._typedefs = dict(
+            (typedef.get("typedef-id"), typedef)
+            for typedef in backend.iter_children(root)
+            if backend.get_keyword(typedef) == "typedef"
+            and typedef.get("typedef-id") is not None
+        )
+        for typedef_id in list(self._typedefs):
+            self._get_typedef_hash(typedef_id)
+        self._typedefs = {}
+
+    def get_hash(self, element):
+        """Returns the content hash of the subtree rooted at *element*"""
+        key = self._backend.get_key
+        try:
+            return self._hashes[key(element)]
+        except KeyError:
+            pass
+
+        # The hashes of the children of an element are computed before its own
+        stack = [(element, False)]
+        while stack:
+            current, children_hashed = stack.pop()
+            if children_hashed:
+                self._add_hash(
+                    current, self.get_digest(current, self._iter_child_hashes(current))
+                )
+            elif key(current) not in self._hashes:
+                content_hash = current.get(_common.CONTENT_HASH_ATTRIBUTE)
+                if content_hash is not None:
+                    self._add_hash(current, content_hash)
+                    continue
+
+                stack.append((current, True))
+                stack.extend(
+                    (child, False) for child in self._backend.iter_children(current)
+                )
+
+        return self._hashes[key(element)]
+
+    def get_digest(self, element, child_hashes):
+        """
+        Returns the digest of the content of *element* itself, followed by the
+        given hashes of its children
+        """
+        content = []
+        for name, value in self._backend.get_content(element):
+            if name == "typedef-id" or name == _common.CONTENT_HASH_ATTRIBUTE:
+                continue
+            if name == "typedef-ref":
+                value = self._get_typedef_hash(value)
+            content.append((name, value))
+
+        serialized = json.dumps([content, list(child_hashes)], sort_keys=True)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _add_hash(self, element, content_hash):
+        self._hashes[self._backend.get_key(element)] = content_hash
+        if self._backend.must_keep(element):
+            self._kept_elements.append(element)
+
+    def _get_typedef_hash(self, typedef_ref):
+        # Returns the hash of the typedef with *typedef_ref* as its typedef-id, or
+        # *typedef_ref* itself if there is none. The typedefs are hashed while the
+        # hasher is created, in which one may refer to another not yet hashed.
+        try:
+            return self._typedef_hashes[typedef_ref]
+        except KeyError:
+            pass
+
+        typedef = self._typedefs.get(typedef_ref)
+        if typedef is None:
+            return typedef_ref
+        content_hash = self._typedef_hashes[typedef_ref] = self.get_hash(typedef)
+        return content_hash
+
+    def _iter_child_hashes(self, element):
+        key = self._backend.get_key
+        for child in self._backend.iter_children(element):
+            yield self._hashes[key(child)]
+
+
+class XmlBackend(object):
+
+    """Reads the elements of XML models"""
+
+    @staticmethod
+    def get_key(element):
+        """Returns the key of *element* in the hashes of its model"""
+        return element
+
+    @staticmethod
+    def must_keep(_element):
+        """
+        Returns False, as the key of an XML element is the element itself, which
+        the hashes keep alive
+        """
+        return False
+
+    @staticmethod
+    def get_keyword(element):
+        """Returns the YIN keyword of *element*, or None for other elements"""
+        qname = etree.QName(element)
+        return qname.localname if qname.namespace == _common.YIN_NS else None
+
+    @staticmethod
+    def iter_children(element):
+        """Iterates over the child elements of *element*"""
+        return element.iterchildren(etree.Element)
+
+    @staticmethod
+    def get_content(element):
+        """Returns the (name, value) pairs that make up *element* itself"""
+        content = [("tag", element.tag)]
+        content.extend(sorted(element.attrib.items()))
+
+        if element.text is not None and element.text.strip():
+            content.append(("text", element.text))
+
+        parent = element.getparent()
+        parent_nsmap = {} if parent is None else parent.nsmap
+        content.extend(
+            ("xmlns:" + (prefix or ""), namespace)
+            for prefix, namespace in sorted(
+                element.nsmap.items(), key=lambda item: item[0] or ""
+            )
+            if parent_nsmap.get(prefix) != namespace
+        )
+        return content
+
+
+class JsonBackend(object):
+
+    """
+    Reads the elements of JSON models, whose elements without a namespace are in
+    *default_namespace*, if given
+    """
+
+    def __init__(self, default_namespace=None):
+        self._default_namespace = default_namespace
+
+    @staticmethod
+    def get_key(element):
+        """Returns the key of *element* in the hashes of its model"""
+        # Elements are dicts, which cannot be hashed. The elements of an SQLite
+        # store are loaded again whenever its cache drops them, so they are keyed
+        # by their row instead.
+        stored_id = getattr(element, "_stored_id", None)
+        if stored_id is not None:
+            return id(element.__dict__["_store"]), stored_id
+        return id(element)
+
+    @staticmethod
+    def must_keep(element):
+        """
+        Returns True if the hashes must keep *element* alive for its key to stay
+        unique, which is the case for the keys made of the id of the element
+        """
+        return getattr(element, "_stored_id", None) is None
+
+    def get_keyword(self, element):
+        """Returns the YIN keyword of *element*, or None for other elements"""
+        namespace = element.get("namespace", self._default_namespace)
+        return element["keyword"] if namespace == _common.YIN_NS else None
+
+    @staticmethod
+    def iter_children(element):
+        """Iterates over the child elements of *element*"""
+        try:
+            # The children of the elements of an SQLite store are loaded on demand
+            children = element.children
+        except AttributeError:
+            children = element.get("children") or []
+        return iter(children)
+
+    def get_content(self, element):
+        """Returns the (name, value) pairs that make up *element* itself"""
+        content = [
+            (name, value)
+            for name, value in element.items()
+            if name not in _NON_CONTENT_JSON_MEMBERS
+        ]
+        if "namespace" not in element and self._default_namespace is not None:
+            content.append(("namespace", self._default_namespace))
+        return sorted(content)
@@ -47,3 +47,32 @@ class MissingIdentityError(Error):
         super(MissingIdentityError, self).__init__(
             "Could not find identity {} in namespace {}".format(name, namespace)
         )
+
+
+class DocumentationStrippedError(Error):
+    def __init__(self, keyword):
+        super(DocumentationStrippedError, self).__init__(
+            "The description of {} is not available because the documentation was "
+            "stripped from the model".format(keyword)
+        )
+
+
+class MissingLeafrefTargetError(Error):
+    def __init__(self, target_id):
+        super(MissingLeafrefTargetError, self).__init__(
+            "Could not find leafref target with id {}".format(target_id)
+        )
+
+
+class MissingAugmentTargetError(Error):
+    def __init__(self, target_node):
+        super(MissingAugmentTargetError, self).__init__(
+            "Could not find augment target node {}".format(target_node)
+        )
+
+
+class MissingTypedefError(Error):
+    def __init__(self, typedef_id):
+        super(MissingTypedefError, self).__init__(
+            "Could not find typedef with typedef-id {}".format(typedef_id)
+        )
@@ -0,0 +1,176 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Incremental serialization of a YINsolidated JSON document"""
+
+from __future__ import unicode_literals
+
+import json
+
+from yinsolidated import _error
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class JsonStreamWriter(object):
+
+    """
+    Writes a tree of JSON element objects to *output* as the tree is built.
+
+    Elements must be passed to :meth:`open` in document order along with their
+    parent element. The members of an element are written when its first child is
+    opened or when it is closed, so they may still be modified until then. An element
+    is closed when one of its siblings or one of its ancestors' siblings is opened,
+    or when the writer itself is closed.
+
+    If *indent* is a positive integer, the document is pretty-printed exactly as
+    ``json.dumps(document, indent=indent)`` would print it. Otherwise, all
+    insignificant whitespace is omitted.
+
+    If a *key_dictionary* mapping member names to shorter names is given, each member
+    is written under its shorter name and the reverse mapping is added to the root
+    element as its ``key-dictionary`` member.
+    """
+
+    def __init__(
+        self, output, indent=2, chunk_size=DEFAULT_CHUNK_SIZE, key_dictionary=None
+    ):
+        self._output = output
+        self._indent = indent if indent and indent > 0 else None
+        self._chunk_size = chunk_size
+        self._key_dictionary = key_dictionary or {}
+
+        self._separators = (",", ": ") if self._indent else (",", ":")
+
+        self._buffer = []
+        self._buffered_size = 0
+
+        # Each entry is [element, has_opened_children]
+        self._stack = []
+        self._has_root = False
+
+    def open(self, element, parent=None):
+        """Adds *element* as the next child of *parent*, or as the document root"""
+        if parent is None:
+            if self._has_root:
+                raise _error.Error("JSON document already has a root element")
+            self._has_root = True
+        else:
+            self._close_until(parent)
+            self._start_child()
+
+        self._write("{")
+        self._stack.append([element, False])
+
+    def close(self):
+        """Closes all open elements and flushes the document to the output"""
+        while self._stack:
+            self._close_top()
+
+        self.flush()
+
+    def flush(self):
+        """Writes any buffered text to the output"""
+        if self._buffer:
+            self._output.write("".join(self._buffer))
+            self._buffer = []
+            self._buffered_size = 0
+
+    def _close_until(self, parent):
+        while self._stack and self._stack[-1][0] is not parent:
+            self._close_top()
+
+        if not self._stack:
+            raise _error.Error("Parent element is not open")
+
+    def _start_child(self):
+        entry = self._stack[-1]
+        level = _indent_level(len(self._stack) - 1)
+
+        if entry[1]:
+            self._write(self._separators[0])
+        else:
+            if self._write_members(entry[0], level):
+                self._write(self._separators[0])
+            self._write(self._newline(level + 1))
+            self._write(self._dump_key("children") + self._separators[1] + "[")
+            entry[1] = True
+
+        self._write(self._newline(level + 2))
+
+    def _close_top(self):
+        element, has_children = self._stack.pop()
+        level = _indent_level(len(self._stack))
+
+        if has_children:
+            self._write(self._newline(level + 1) + "]")
+            has_members = True
+        else:
+            has_members = self._write_members(element, level)
+
+        if has_members:
+            self._write(self._newline(level))
+        self._write("}")
+
+    def _write_members(self, element, level):
+        """Writes the members of *element* other than its children, if any"""
+        members = [(key, value) for key, value in element.items() if key != "children"]
+        if level == 0 and self._key_dictionary:
+            reverse_dictionary = dict(
+                (short_key, key) for key, short_key in self._key_dictionary.items()
+            )
+            members.insert(0, ("key-dictionary", reverse_dictionary))
+
+        item_separator, key_separator = self._separators
+        for index, (key, value) in enumerate(members):
+            if index:
+                self._write(item_separator)
+
+            self._write(self._newline(level + 1))
+            self._write(
+                self._dump_key(key) + key_separator + self._dumps(value, level + 1)
+            )
+
+        return bool(members)
+
+    def _dump_key(self, key):
+        return json.dumps(self._key_dictionary.get(key, key))
+
+    def _dumps(self, value, level):
+        text = json.dumps(value, indent=self._indent, separators=self._separators)
+        if self._indent and level:
+            text = text.replace("\n", self._newline(level))
+        return text
+
+    def _newline(self, level):
+        return "\n" + " " * (self._indent * level) if self._indent else ""
+
+    def _write(self, text):
+        self._buffer.append(text)
+        self._buffered_size += len(text)
+
+        if self._buffered_size >= self._chunk_size:
+            self.flush()
+
+
+def _indent_level(depth):
+    # Each nested element is indented inside both its parent and the "children" list
+    return depth * 2
+
+
+def write_tree(
+    root, output, indent=2, chunk_size=DEFAULT_CHUNK_SIZE, key_dictionary=None
+):
+    """Writes the JSON element tree rooted at *root* to *output* in chunks"""
+    writer = JsonStreamWriter(
+        output, indent=indent, chunk_size=chunk_size, key_dictionary=key_dictionary
+    )
+
+    stack = [(root, None)]
+    while stack:
+        element, parent = stack.pop()
+        writer.open(element, parent)
+        for child in reversed(element.get("children") or []):
+            stack.append((child, element))
+
+    writer.close()
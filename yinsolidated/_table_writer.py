@@ -0,0 +1,107 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""Serialization of a YINsolidated model as a flat table of nodes"""
+
+from __future__ import unicode_literals
+
+import collections
+import json
+
+
+FORMAT_NAME = "yinsolidated-node-table"
+
+FORMAT_VERSION = 1
+
+# Attribute keys of the namespace mappings of an element, e.g. "xmlns:yin". YANG
+# identifiers cannot contain a colon, so these never clash with other attributes.
+NSMAP_KEY_PREFIX = "xmlns:"
+
+# Members of the JSON elements that are stored in their own columns
+_COLUMN_KEYS = frozenset(["keyword", "namespace", "name", "nsmap", "children"])
+
+
+class _StringTable(object):
+
+    """Assigns each distinct string an index into a list of strings"""
+
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+
+    def get_id(self, string):
+        """Returns the index of *string*, adding it to the table if it is new"""
+        try:
+            return self._ids[string]
+        except KeyError:
+            string_id = self._ids[string] = len(self.strings)
+            self.strings.append(string)
+            return string_id
+
+    def get_optional_id(self, string):
+        """Returns the index of *string*, or -1 if it is None"""
+        return -1 if string is None else self.get_id(string)
+
+
+def build_table(root):
+    """
+    Returns the node table of the JSON element tree rooted at *root*.
+
+    Each node is a row of the parallel ``parents``, ``keywords``, ``namespaces`` and
+    ``names`` columns, in document order, so that the parent of each node precedes
+    it. The other attributes of the node at index ``i`` are the entries of the
+    ``attribute-keys`` and ``attribute-values`` columns from ``attribute-offsets[i]``
+    up to ``attribute-offsets[i + 1]``. All strings are stored once in the
+    ``strings`` table and referred to by their index, or by -1 if there is none.
+    """
+    strings = _StringTable()
+    parents = []
+    keywords = []
+    namespaces = []
+    names = []
+    attribute_offsets = [0]
+    attribute_keys = []
+    attribute_values = []
+
+    stack = [(root, -1)]
+    while stack:
+        element, parent_index = stack.pop()
+        index = len(parents)
+
+        parents.append(parent_index)
+        keywords.append(strings.get_id(element["keyword"]))
+        namespaces.append(strings.get_optional_id(element.get("namespace")))
+        names.append(strings.get_optional_id(element.get("name")))
+
+        for prefix, namespace in sorted((element.get("nsmap") or {}).items()):
+            attribute_keys.append(strings.get_id(NSMAP_KEY_PREFIX + prefix))
+            attribute_values.append(strings.get_id(namespace))
+
+        for key, value in element.items():
+            if key not in _COLUMN_KEYS:
+                attribute_keys.append(strings.get_id(key))
+                attribute_values.append(strings.get_id(value))
+
+        attribute_offsets.append(len(attribute_keys))
+
+        for child in reversed(element.get("children") or []):
+            stack.append((child, index))
+
+    return collections.OrderedDict(
+        [
+            ("format", FORMAT_NAME),
+            ("version", FORMAT_VERSION),
+            ("strings", strings.strings),
+            ("parents", parents),
+            ("keywords", keywords),
+            ("namespaces", namespaces),
+            ("names", names),
+            ("attribute-offsets", attribute_offsets),
+            ("attribute-keys", attribute_keys),
+            ("attribute-values", attribute_values),
+        ]
+    )
+
+
+def write_table(root, output):
+    """Writes the node table of the JSON element tree rooted at *root* to *output*"""
+    output.write(json.dumps(build_table(root), separators=(",", ":")))
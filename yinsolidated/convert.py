@@ -0,0 +1,359 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Converts YINsolidated models between the XML and JSON formats without regenerating
+them with pyang.
+
+An XML model is read with :func:`lxml.etree.iterparse` and written as JSON while it
+is read, so only the ancestors of the element being converted are kept in memory.
+A JSON model is loaded in full, since the standard library cannot decode JSON
+incrementally, but is written as XML one element at a time.
+
+The element trees returned by :func:`yinsolidated.parse` and
+:func:`yinsolidated.parse_json` can also be converted into each other directly,
+in a single walk over the tree, without serializing them first.
+"""
+
+from __future__ import unicode_literals
+
+import json
+
+from lxml import etree
+
+from yinsolidated import _common, _json_writer, json_parser, parser
+
+
+# Maps the keyword of each YIN statement whose argument is a sub-element in the XML
+# model to the name of that sub-element. The JSON model has a member of the same
+# name instead.
+_YIN_ELEMENT_ARGUMENTS = {
+    "contact": "text",
+    "description": "text",
+    "error-message": "value",
+    "organization": "text",
+    "reference": "text",
+}
+
+# Members of JSON elements that are not written as XML attributes. Content hashes
+# are computed from the elements of one format, so they are left out of the other.
+_NON_ATTRIBUTE_MEMBERS = frozenset(
+    ["keyword", "namespace", "nsmap", "children", _common.CONTENT_HASH_ATTRIBUTE]
+)
+
+_XML_INDENT = "  "
+
+
+def xml_to_json(xml_file, json_file, indent=2):
+    """
+    Converts the XML model read from *xml_file*, a path or a binary file object, to
+    the JSON model the plugin would have generated, and writes it to the text file
+    object *json_file*, pretty-printed with *indent* unless it is None.
+
+    Each element is given the same members as in the JSON model: its ``keyword``,
+    its ``namespace``, its attributes, and an ``nsmap`` with the namespaces it
+    declares, to which the namespace of the prefix of each extension element is
+    added. The elements of the main module with a ``module-name``, such as its
+    identities, are given the namespaces of the ``module`` element other than the
+    YIN namespace. The argument of a statement
+    that is a sub-element in the XML model, such as the ``text`` of a
+    ``description``, becomes a member of its element, as does the text of each
+    simple extension. Content hashes are left out, as they are computed from the
+    elements of one format.
+
+    Neither format records whether the argument of a complex extension is an
+    element, so a sub-element of an extension element in the same namespace that
+    has only text is taken to be its argument.
+    """
+    writer = _json_writer.JsonStreamWriter(json_file, indent=indent)
+
+    # Each entry is [xml_element, json_element, is_open, may_be_argument]. The
+    # elements below the top of the stack are open, as they have a child.
+    stack = []
+    for event, xml_element in etree.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            parent = None
+            if stack:
+                parent = stack[-1][0]
+                stack[-1][3] = False
+                _open_json_element(writer, stack)
+
+            stack.append(
+                [
+                    xml_element,
+                    _make_json_element(xml_element, parent),
+                    False,
+                    _may_be_argument_element(xml_element, parent),
+                ]
+            )
+            continue
+
+        _, json_element, is_open, may_be_argument = stack[-1]
+        if may_be_argument and xml_element.text is not None:
+            stack[-2][1][etree.QName(xml_element).localname] = xml_element.text
+        elif not is_open:
+            if _is_extension_element(xml_element) and not xml_element.attrib:
+                json_element["text"] = xml_element.text
+            _open_json_element(writer, stack)
+        stack.pop()
+
+        # The converted elements and their text are no longer needed
+        xml_element.clear()
+        while xml_element.getprevious() is not None:
+            del xml_element.getparent()[0]
+
+    writer.close()
+
+
+def _make_json_element(xml_element, parent):
+    qname = etree.QName(xml_element)
+    json_element = {"keyword": qname.localname, "namespace": qname.namespace}
+    json_element.update(
+        (key, value)
+        for key, value in xml_element.attrib.items()
+        if key != _common.CONTENT_HASH_ATTRIBUTE
+    )
+
+    nsmap = _get_json_nsmap(xml_element, parent)
+    if nsmap:
+        json_element["nsmap"] = nsmap
+
+    return json_element
+
+
+def _get_json_nsmap(xml_element, parent):
+    # The plugin gives the module element and the elements that begin the scope of
+    # another module the namespaces of that module's imports, and each extension
+    # element the namespace of its prefix. The XML model only declares those that
+    # are not in scope already.
+    if parent is None:
+        return dict(xml_element.nsmap)
+
+    nsmap = dict(
+        (prefix, namespace)
+        for prefix, namespace in xml_element.nsmap.items()
+        if parent.nsmap.get(prefix) != namespace
+    )
+    if xml_element.get("module-name") is not None and not nsmap:
+        # An element of the main module, whose namespaces are those of the module
+        # element other than the YIN namespace
+        nsmap = dict(
+            (prefix, namespace)
+            for prefix, namespace in xml_element.nsmap.items()
+            if namespace != _common.YIN_NS
+        )
+    elif _is_extension_element(xml_element):
+        nsmap[xml_element.prefix] = etree.QName(xml_element).namespace
+    return nsmap
+
+
+def _is_extension_element(xml_element):
+    return etree.QName(xml_element).namespace != _common.YIN_NS
+
+
+def _may_be_argument_element(xml_element, parent):
+    # Whether *xml_element* holds the argument of *parent*, provided that it turns
+    # out to have text and no sub-elements
+    if parent is None or xml_element.attrib:
+        return False
+
+    qname = etree.QName(xml_element)
+    parent_qname = etree.QName(parent)
+    if qname.namespace != parent_qname.namespace:
+        return False
+
+    if qname.namespace == _common.YIN_NS:
+        return _YIN_ELEMENT_ARGUMENTS.get(parent_qname.localname) == qname.localname
+
+    # The argument element of a complex extension is its first sub-element, is
+    # added without declaring any namespace, and is only used if the argument is
+    # not an attribute. Converted elements are only removed once their next
+    # sibling is, so any other sub-element still has a previous sibling.
+    return (
+        xml_element.getprevious() is None
+        and not parent.attrib
+        and len(xml_element.nsmap) == len(parent.nsmap)
+    )
+
+
+def _open_json_element(writer, stack):
+    entry = stack[-1]
+    if not entry[2]:
+        parent = stack[-2][1] if len(stack) > 1 else None
+        writer.open(entry[1], parent)
+        entry[2] = True
+
+
+def json_to_xml(json_file, xml_file, pretty_print=True):
+    """
+    Converts the JSON model read from the text file object *json_file* to the XML
+    model the plugin would have generated, and writes it to *xml_file*, a path or a
+    binary file object, indented unless *pretty_print* is False.
+
+    Models generated with ``--yinsolidated-compact`` or
+    ``--yinsolidated-compact-keys`` are expanded first. The members of each element
+    that hold the argument of a YIN statement whose argument is a sub-element, such
+    as the ``text`` of a ``description``, are written as sub-elements, and the
+    ``text`` of an extension element as its text. Every other member is written as
+    an attribute, including the argument of a complex extension, as the JSON model
+    does not record whether it is an element. Content hashes are left out.
+    """
+    # pylint: disable=protected-access
+    root = json_parser._expand_compact(json.load(json_file))
+
+    with etree.xmlfile(xml_file, encoding="utf-8") as xml_writer:
+        xml_writer.write_declaration()
+
+        # Each entry is (json_element, in-scope nsmap of its parent, depth) for the
+        # elements to write, or (context, has_children, depth) for the elements to
+        # close once their children are written
+        stack = [(root, {}, 0)]
+        while stack:
+            element, state, depth = stack.pop()
+            indentation = "\n" + _XML_INDENT * depth if pretty_print else None
+            if not isinstance(element, dict):
+                if state and indentation:
+                    xml_writer.write(indentation)
+                element.__exit__(None, None, None)
+                continue
+
+            if depth and indentation:
+                xml_writer.write(indentation)
+
+            context, nsmap = _open_xml_element(xml_writer, element, state)
+            children = element.get("children") or []
+
+            argument_name = _get_argument_member(element)
+            if argument_name is not None:
+                if indentation:
+                    xml_writer.write(indentation + _XML_INDENT)
+                with xml_writer.element(
+                    etree.QName(element.get("namespace"), argument_name)
+                ):
+                    xml_writer.write(element[argument_name])
+            elif _is_extension_json_element(element) and element.get("text"):
+                xml_writer.write(element["text"])
+
+            stack.append((context, bool(children) or argument_name is not None, depth))
+            stack.extend((child, nsmap, depth + 1) for child in reversed(children))
+
+
+def _open_xml_element(xml_writer, element, parent_nsmap):
+    # Only the namespaces that are not in scope already are declared, as lxml does
+    # when the plugin creates the element
+    declared = dict(
+        (prefix, namespace)
+        for prefix, namespace in (element.get("nsmap") or {}).items()
+        if parent_nsmap.get(prefix) != namespace
+    )
+    nsmap = dict(parent_nsmap)
+    nsmap.update(declared)
+
+    context = xml_writer.element(
+        etree.QName(element.get("namespace"), element["keyword"]),
+        attrib=_get_xml_attributes(element),
+        nsmap=declared or None,
+    )
+    context.__enter__()
+    return context, nsmap
+
+
+def _get_xml_attributes(element):
+    argument_name = _get_argument_member(element)
+    return dict(
+        (key, value)
+        for key, value in element.items()
+        if key not in _NON_ATTRIBUTE_MEMBERS
+        and key != argument_name
+        and not (key == "text" and _is_extension_json_element(element))
+    )
+
+
+def _get_argument_member(element):
+    if element.get("namespace") != _common.YIN_NS:
+        return None
+
+    argument_name = _YIN_ELEMENT_ARGUMENTS.get(element["keyword"])
+    return argument_name if element.get(argument_name) is not None else None
+
+
+def _is_extension_json_element(element):
+    return element.get("namespace") != _common.YIN_NS
+
+
+def xml_tree_to_json(module_element):
+    """
+    Returns the element tree that :func:`yinsolidated.parse_json` would return for
+    the JSON form of the model under the XML *module_element*, as converted by
+    :func:`xml_to_json`, and leaves *module_element* as it is.
+    """
+    # pylint: disable=protected-access
+    json_root = None
+
+    # Each entry is (xml_element, xml_parent, json_parent)
+    stack = [(module_element, None, None)]
+    while stack:
+        xml_element, xml_parent, json_parent = stack.pop()
+
+        data = _make_json_element(xml_element, xml_parent)
+        children = list(xml_element.iterchildren(etree.Element))
+        if (
+            children
+            and len(children[0]) == 0
+            and children[0].text is not None
+            and _may_be_argument_element(children[0], xml_element)
+        ):
+            argument_element = children.pop(0)
+            data[etree.QName(argument_element).localname] = argument_element.text
+        elif (
+            not children
+            and _is_extension_element(xml_element)
+            and not xml_element.attrib
+        ):
+            data["text"] = xml_element.text
+
+        element_class = json_parser._get_yin_element_class(data["keyword"])
+        json_element = element_class(data, parent=json_parent)
+        if json_root is None:
+            json_root = json_element
+
+        stack.extend((child, xml_element, json_element) for child in reversed(children))
+
+    return json_root
+
+
+def json_tree_to_xml(module_element):
+    """
+    Returns the element tree that :func:`yinsolidated.fromstring` would return for
+    the XML form of the model under the JSON *module_element*, as converted by
+    :func:`json_to_xml`, and leaves *module_element* as it is.
+    """
+    xml_root = None
+
+    # Each entry is (json_element, xml_parent)
+    stack = [(module_element, None)]
+    while stack:
+        element, xml_parent = stack.pop()
+
+        tag = etree.QName(element.get("namespace"), element["keyword"])
+        attributes = _get_xml_attributes(element)
+        nsmap = element.get("nsmap") or None
+        if xml_parent is None:
+            # The new document gets a parser of its own to keep its lookup tables
+            model_parser = parser._ModelParser()  # pylint: disable=protected-access
+            xml_element = xml_root = model_parser.makeelement(tag, attributes, nsmap)
+        else:
+            # lxml only declares the namespaces that are not in scope already
+            xml_element = etree.SubElement(xml_parent, tag, attributes, nsmap)
+
+        argument_name = _get_argument_member(element)
+        if argument_name is not None:
+            argument_element = etree.SubElement(
+                xml_element, etree.QName(element.get("namespace"), argument_name)
+            )
+            argument_element.text = element[argument_name]
+        elif _is_extension_json_element(element) and element.get("text"):
+            xml_element.text = element["text"]
+
+        stack.extend((child, xml_element) for child in reversed(element.children))
+
+    return xml_root
@@ -0,0 +1,238 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Compares two YINsolidated models and reports the data nodes, types, defaults and
+identities that were added, removed or changed between them.
+
+The content hash of every subtree of both models is computed in one pass over each
+model, so that identical subtrees are skipped without being compared element by
+element. Comparing two large models that differ in a few places therefore only
+takes the time to hash both models and to walk the parts that differ.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+
+from yinsolidated import _common, _content_hash, _error
+
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+Change = collections.namedtuple(
+    "Change",
+    [
+        # ADDED, REMOVED or CHANGED
+        "kind",
+        # "node", "type", "default" or "identity"
+        "category",
+        # The schema path of the data node, or the prefixed name of the identity
+        "path",
+        # The element in the old model, or None if it was added
+        "old",
+        # The element in the new model, or None if it was removed
+        "new",
+    ],
+)
+
+# Keywords of the statements whose children are merged into the schema node that
+# contains them, as they are not part of its schema path
+_TRANSPARENT_KEYWORDS = frozenset(["choice", "case"])
+
+# Keywords of the statements of a data node that are compared on their own
+_SEPARATELY_COMPARED_KEYWORDS = frozenset(["type", "default"])
+
+
+def diff_models(old, new):
+    """
+    Returns the list of :class:`Change` tuples from the model under the module
+    element *old* to the model under the module element *new*, which must be
+    returned by the same parser.
+
+    A data node, rpc, input, output or notification is reported as added or removed
+    with its schema path, without its descendants. A data node that is in both
+    models is reported as changed if any of its statements other than its ``type``,
+    its ``default`` and its data nodes differ, including the statements of the
+    choices and cases it contains. Changes to its ``type``, including the typedefs
+    it refers to, and to its ``default`` are reported separately. Identities are
+    reported by their prefixed name.
+    """
+    if isinstance(old, dict) != isinstance(new, dict):
+        raise _error.Error("the models to compare must be parsed by the same parser")
+
+    backend = _JsonBackend() if isinstance(old, dict) else _XmlBackend()
+    differ = _Differ(
+        backend,
+        _content_hash.SubtreeHasher(old, backend),
+        _content_hash.SubtreeHasher(new, backend),
+    )
+    return differ.diff(old, new)
+
+
+class _Differ(object):
+
+    """Walks the parts of two models that differ, collecting their changes"""
+
+    def __init__(self, backend, old_hasher, new_hasher):
+        self._backend = backend
+        self._old_hasher = old_hasher
+        self._new_hasher = new_hasher
+        self._changes = []
+
+    def diff(self, old_root, new_root):
+        """Returns the changes from the model of *old_root* to that of *new_root*"""
+        if self._is_same(old_root, new_root):
+            return []
+
+        self._diff_identities(old_root, new_root)
+
+        stack = [(old_root, new_root, "", old_root.get("module-prefix"))]
+        while stack:
+            old, new, path, prefix = stack.pop()
+            pending = []
+
+            old_children = self._get_schema_children(old, path, prefix)
+            new_children = self._get_schema_children(new, path, prefix)
+            for child_path, (old_child, _) in old_children.items():
+                if child_path not in new_children:
+                    self._add_change(REMOVED, "node", child_path, old_child, None)
+
+            for child_path, (new_child, new_prefix) in new_children.items():
+                try:
+                    old_child, _ = old_children[child_path]
+                except KeyError:
+                    self._add_change(ADDED, "node", child_path, None, new_child)
+                    continue
+
+                if not self._is_same(old_child, new_child):
+                    self._diff_schema_node(child_path, old_child, new_child)
+                    pending.append((old_child, new_child, child_path, new_prefix))
+
+            stack.extend(reversed(pending))
+
+        return self._changes
+
+    def _is_same(self, old, new):
+        return self._old_hasher.get_hash(old) == self._new_hasher.get_hash(new)
+
+    def _add_change(self, kind, category, path, old, new):
+        self._changes.append(Change(kind, category, path, old, new))
+
+    def _diff_identities(self, old_root, new_root):
+        old_identities = self._get_identities(old_root)
+        new_identities = self._get_identities(new_root)
+
+        for name, old in old_identities.items():
+            if name not in new_identities:
+                self._add_change(REMOVED, "identity", name, old, None)
+
+        for name, new in new_identities.items():
+            old = old_identities.get(name)
+            if old is None:
+                self._add_change(ADDED, "identity", name, None, new)
+            elif not self._is_same(old, new):
+                self._add_change(CHANGED, "identity", name, old, new)
+
+    def _get_identities(self, root):
+        root_prefix = root.get("module-prefix")
+        return collections.OrderedDict(
+            (
+                "{}:{}".format(
+                    identity.get("module-prefix", root_prefix), identity.get("name")
+                ),
+                identity,
+            )
+            for identity in self._backend.iter_children(root)
+            if self._backend.get_keyword(identity) == "identity"
+        )
+
+    def _get_schema_children(self, element, path, prefix):
+        # Maps the schema path of each schema node below *element*, but not below
+        # another schema node, to the node and the module prefix in effect for it
+        schema_children = collections.OrderedDict()
+
+        stack = [(element, prefix)]
+        while stack:
+            current, current_prefix = stack.pop()
+            pending = []
+            for child in self._backend.iter_children(current):
+                keyword = self._backend.get_keyword(child)
+                child_prefix = child.get("module-prefix", current_prefix)
+                if keyword in _common.SCHEMA_NODE_KEYWORDS:
+                    child_path = "{}/{}:{}".format(
+                        path, child_prefix, child.get("name") or keyword
+                    )
+                    schema_children[child_path] = (child, child_prefix)
+                elif keyword in _TRANSPARENT_KEYWORDS:
+                    pending.append((child, child_prefix))
+            stack.extend(reversed(pending))
+
+        return schema_children
+
+    def _diff_schema_node(self, path, old, new):
+        # The keyword of an element is part of its own hash
+        backend = self._backend
+        if self._get_own_hash(old, self._old_hasher) != self._get_own_hash(
+            new, self._new_hasher
+        ):
+            self._add_change(CHANGED, "node", path, old, new)
+
+        old_type = backend.find_child(old, "type")
+        new_type = backend.find_child(new, "type")
+        if old_type is None or new_type is None:
+            if old_type is not None or new_type is not None:
+                kind = ADDED if old_type is None else REMOVED
+                self._add_change(kind, "type", path, old_type, new_type)
+        elif not self._is_same(old_type, new_type):
+            self._add_change(CHANGED, "type", path, old_type, new_type)
+
+        old_default = backend.find_child(old, "default")
+        new_default = backend.find_child(new, "default")
+        old_value = None if old_default is None else old_default.get("value")
+        new_value = None if new_default is None else new_default.get("value")
+        if old_value != new_value:
+            if old_value is None:
+                kind = ADDED
+            elif new_value is None:
+                kind = REMOVED
+            else:
+                kind = CHANGED
+            self._add_change(kind, "default", path, old_default, new_default)
+
+    def _get_own_hash(self, element, hasher):
+        # The hash of the statements of a schema node, excluding its schema node
+        # descendants and the statements that are compared separately
+        child_hashes = []
+        for child in self._backend.iter_children(element):
+            keyword = self._backend.get_keyword(child)
+            if keyword in _TRANSPARENT_KEYWORDS:
+                child_hashes.append(self._get_own_hash(child, hasher))
+            elif (
+                keyword not in _common.SCHEMA_NODE_KEYWORDS
+                and keyword not in _SEPARATELY_COMPARED_KEYWORDS
+            ):
+                child_hashes.append(hasher.get_hash(child))
+
+        return hasher.get_digest(element, child_hashes)
+
+
+class _XmlBackend(_content_hash.XmlBackend):
+
+    """Reads models returned by :func:`yinsolidated.parse`"""
+
+    @staticmethod
+    def find_child(element, keyword):
+        """Returns the first YIN child element of *element* with *keyword*"""
+        return element.find("{{{}}}{}".format(_common.YIN_NS, keyword))
+
+
+class _JsonBackend(_content_hash.JsonBackend):
+
+    """Reads models returned by :func:`yinsolidated.parse_json`"""
+
+    @staticmethod
+    def find_child(element, keyword):
+        """Returns the first YIN child element of *element* with *keyword*"""
+        return element.find(keyword, namespace=_common.YIN_NS)
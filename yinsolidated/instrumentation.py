@@ -0,0 +1,256 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Counts the calls to the properties and methods of the elements returned by both
+parsers, and the time spent in them, to find out which ones a slow application
+relies on most.
+
+Instrumentation is off by default, and then costs nothing: the element classes are
+left untouched. :func:`enable` replaces each public property and method of the
+element classes with a wrapper that counts its calls, and :func:`disable` puts the
+original back. Setting the ``YINSOLIDATED_INSTRUMENTATION`` environment variable to
+any non-empty value enables it when the package is imported.
+
+The lookup tables that the parsers build on demand for each model, such as the
+typedef table or the content hashes, are counted as well: each request for one is
+a hit if it was already built, or a miss if it had to be built.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import functools
+import os
+import timeit
+import types
+
+from yinsolidated import json_parser, parser
+
+
+ENVIRONMENT_VARIABLE = "YINSOLIDATED_INSTRUMENTATION"
+
+CallStats = collections.namedtuple(
+    "CallStats",
+    [
+        # "xml" or "json"
+        "backend",
+        # The class that defines the property or method, and its name, such as
+        # "LeafElement.type"
+        "attribute",
+        # Number of calls
+        "calls",
+        # Total number of seconds spent in the calls, including the calls they make.
+        # Recursive calls are only timed once, and the time of a method returning an
+        # iterator does not include iterating over it.
+        "seconds",
+    ],
+)
+
+CacheStats = collections.namedtuple(
+    "CacheStats",
+    [
+        # "xml" or "json"
+        "backend",
+        # The name of the lookup table, such as "typedef"
+        "index",
+        # Number of requests for the table after it was built
+        "hits",
+        # Number of requests for the table that built it
+        "misses",
+    ],
+)
+
+Snapshot = collections.namedtuple(
+    "Snapshot",
+    [
+        # The CallStats of every property and method called at least once, the ones
+        # with the most time first
+        "calls",
+        # The CacheStats of every lookup table requested at least once, by name
+        "caches",
+    ],
+)
+
+_BACKENDS = [("xml", parser), ("json", json_parser)]
+
+# The (owner, name, original) of every attribute replaced while enabled
+_originals = []
+
+# The counter of each instrumented attribute or lookup table, kept when disabled
+_call_counters = {}
+_cache_counters = {}
+
+
+class _CallCounter(object):
+    __slots__ = ["calls", "seconds", "depth"]
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.depth = 0
+
+
+def enable():
+    """Starts counting calls, without resetting the counts gathered so far"""
+    if _originals:
+        return
+
+    for backend, module in _BACKENDS:
+        for element_class in _get_element_classes(module):
+            for name, value in sorted(vars(element_class).items()):
+                if name.startswith("_"):
+                    continue
+
+                key = (backend, "{}.{}".format(element_class.__name__, name))
+                if isinstance(value, property):
+                    instrumented = property(
+                        _instrument_function(value.fget, key), doc=value.__doc__
+                    )
+                elif isinstance(value, types.FunctionType):
+                    instrumented = _instrument_function(value, key)
+                else:
+                    continue
+
+                _replace(element_class, name, instrumented)
+
+        # pylint: disable=protected-access
+        _replace(
+            module,
+            "_get_root_index",
+            _instrument_root_index(module._get_root_index, backend),
+        )
+
+
+def disable():
+    """Stops counting calls and restores the original element classes"""
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+
+
+def is_enabled():
+    """Returns True if calls are being counted"""
+    return bool(_originals)
+
+
+def reset():
+    """Discards the counts gathered so far"""
+    for counter in _call_counters.values():
+        counter.calls = 0
+        counter.seconds = 0.0
+    for counter in _cache_counters.values():
+        counter.clear()
+
+
+def snapshot():
+    """Returns the :class:`Snapshot` of the counts gathered so far"""
+    calls = [
+        CallStats(backend, attribute, counter.calls, counter.seconds)
+        for (backend, attribute), counter in _call_counters.items()
+        if counter.calls
+    ]
+    calls.sort(key=lambda stats: (-stats.seconds, -stats.calls, stats.attribute))
+
+    caches = [
+        CacheStats(backend, index, counter["hits"], counter["misses"])
+        for (backend, index), counter in sorted(_cache_counters.items())
+        if counter
+    ]
+    return Snapshot(calls, caches)
+
+
+def report(limit=None):
+    """
+    Returns the counts gathered so far as a table, with only the *limit* properties
+    and methods with the most time if given
+    """
+    current = snapshot()
+    lines = [
+        "{:<6} {:<44} {:>10} {:>12} {:>14}".format(
+            "format", "attribute", "calls", "total (ms)", "per call (us)"
+        )
+    ]
+    for stats in current.calls[:limit]:
+        lines.append(
+            "{:<6} {:<44} {:>10} {:>12.3f} {:>14.3f}".format(
+                stats.backend,
+                stats.attribute,
+                stats.calls,
+                stats.seconds * 1000,
+                stats.seconds * 1000000 / stats.calls,
+            )
+        )
+
+    if current.caches:
+        lines.append("")
+        lines.append(
+            "{:<6} {:<44} {:>10} {:>12} {:>14}".format(
+                "format", "lookup table", "hits", "misses", "hit rate"
+            )
+        )
+        for stats in current.caches:
+            lines.append(
+                "{:<6} {:<44} {:>10} {:>12} {:>14.1%}".format(
+                    stats.backend,
+                    stats.index,
+                    stats.hits,
+                    stats.misses,
+                    float(stats.hits) / (stats.hits + stats.misses),
+                )
+            )
+
+    return "\n".join(lines)
+
+
+def _get_element_classes(module):
+    return [
+        value
+        for _, value in sorted(vars(module).items())
+        if isinstance(value, type) and issubclass(value, module.YinElement)
+    ]
+
+
+def _replace(owner, name, instrumented):
+    _originals.append((owner, name, vars(owner)[name]))
+    setattr(owner, name, instrumented)
+
+
+def _instrument_function(function, key):
+    counter = _call_counters.setdefault(key, _CallCounter())
+    timer = timeit.default_timer
+
+    @functools.wraps(function)
+    def instrumented(*args, **kwargs):
+        counter.calls += 1
+        counter.depth += 1
+        start = timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counter.depth -= 1
+            if not counter.depth:
+                counter.seconds += timer() - start
+
+    return instrumented
+
+
+def _instrument_root_index(get_root_index, backend):
+    @functools.wraps(get_root_index)
+    def instrumented(element, name, build):
+        built = []
+
+        def build_and_count(root):
+            built.append(True)
+            return build(root)
+
+        index = get_root_index(element, name, build_and_count)
+
+        counter = _cache_counters.setdefault((backend, name), collections.Counter())
+        counter["misses" if built else "hits"] += 1
+        return index
+
+    return instrumented
+
+
+if os.environ.get(ENVIRONMENT_VARIABLE):
+    enable()
@@ -13,34 +13,290 @@ from __future__ import unicode_literals
 
 import json
 import re
+import sys
 
 import xpathparser
 
-from yinsolidated import _common, _error
+from yinsolidated import _common, _content_hash, _error, _table_writer
 
 
 _YIN = "urn:ietf:params:xml:ns:yang:yin:1"
 
 
-def parse(contents):
-    """Parse the YINsolidated model from JSON or a string."""
+def parse(contents, dedupe=False, strip_documentation=False):
+    """
+    Parse the YINsolidated model from JSON or a string.
+
+    If *dedupe* is True, identical type, typedef, pattern, enum and bit subtrees
+    within the same module scope are only parsed once and the resulting elements are
+    shared by every parent they appear under. The parent of a shared element is the
+    parent of its first occurrence. The savings are available from the
+    *dedupe_report* of the returned module element.
+
+    If *strip_documentation* is True, description, reference, organization and
+    contact elements are skipped, as if the model had been generated with
+    ``--yinsolidated-strip-documentation``.
+
+    Models generated with ``--yinsolidated-compact`` or
+    ``--yinsolidated-compact-keys`` are expanded to the regular form while parsing.
+    """
     contents = json.loads(contents) if isinstance(contents, str) else contents
-    return _parse(contents)
+    contents = _expand_compact(contents)
+
+    interner = _SubtreeInterner() if dedupe else None
+    root = _parse(contents, interner=interner, strip_documentation=strip_documentation)
+
+    if dedupe:
+        _get_root_index(root, "dedupe-report", lambda _: interner.get_report())
+    if strip_documentation:
+        root[_common.DOCUMENTATION_STRIPPED_ATTRIBUTE] = "true"
+    return root
+
+
+def parse_table(contents):
+    """
+    Parse the YINsolidated model from the node table generated with
+    ``--yinsolidated-output-format=table``, given as JSON or a string.
+
+    The model is made of the same elements as the one returned by :func:`parse`.
+    They are created in a single pass over the columns of the table, in which the
+    parent of each node precedes it.
+    """
+    table = json.loads(contents) if isinstance(contents, str) else contents
+    if (
+        table.get("format") != _table_writer.FORMAT_NAME
+        or table.get("version") != _table_writer.FORMAT_VERSION
+    ):
+        raise _error.Error(
+            "unsupported node table format {} version {}".format(
+                table.get("format"), table.get("version")
+            )
+        )
+
+    strings = table["strings"]
+    attribute_offsets = table["attribute-offsets"]
+    attribute_keys = [strings[key_id] for key_id in table["attribute-keys"]]
+    attribute_values = [strings[value_id] for value_id in table["attribute-values"]]
+    nsmap_key_prefix = _table_writer.NSMAP_KEY_PREFIX
+
+    element_classes = {}
+    elements = []
+    rows = zip(table["parents"], table["keywords"], table["namespaces"], table["names"])
+    for index, (parent_index, keyword_id, namespace_id, name_id) in enumerate(rows):
+        keyword = strings[keyword_id]
+        data = {"keyword": keyword}
+        if namespace_id >= 0:
+            data["namespace"] = strings[namespace_id]
+        if name_id >= 0:
+            data["name"] = strings[name_id]
+
+        for position in range(attribute_offsets[index], attribute_offsets[index + 1]):
+            key = attribute_keys[position]
+            if key.startswith(nsmap_key_prefix):
+                nsmap = data.setdefault("nsmap", {})
+                nsmap[key[len(nsmap_key_prefix) :]] = attribute_values[position]
+            else:
+                data[key] = attribute_values[position]
+
+        try:
+            element_class = element_classes[keyword]
+        except KeyError:
+            element_class = element_classes[keyword] = _get_yin_element_class(keyword)
+
+        parent = elements[parent_index] if parent_index >= 0 else None
+        elements.append(element_class(data, parent=parent))
+
+    return elements[0]
+
+
+def _expand_compact(raw):
+    if not isinstance(raw, dict):
+        return raw
+
+    key_dictionary = raw.pop("key-dictionary", None) or {}
+    default_namespace = raw.pop("default-namespace", None)
+    if not key_dictionary and default_namespace is None:
+        return raw
+
+    def expand(element):
+        if not isinstance(element, dict):
+            return element
+
+        expanded = dict(
+            (key_dictionary.get(key, key), value) for key, value in element.items()
+        )
+        if default_namespace is not None:
+            expanded.setdefault("namespace", default_namespace)
+        return expanded
+
+    root = expand(raw)
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        children = element.get("children") if isinstance(element, dict) else None
+        if children:
+            children[:] = [expand(child) for child in children]
+            stack.extend(children)
+
+    return root
 
 
-def _parse(raw, parent=None):
+def _parse(raw, parent=None, interner=None, scope=None, strip_documentation=False):
     if not isinstance(raw, dict):
         raise _error.Error(
             "expected dict, got {type}: {value}".format(type=type(raw), value=raw)
         )
+
+    key = None
+    if interner is not None and raw.get("keyword") in _common.SHAREABLE_KEYWORDS:
+        key = interner.get_key(raw, scope)
+        shared = interner.get_shared(key)
+        if shared is not None:
+            parent.setdefault("children", []).append(shared)
+            return shared
+
     cls = _get_yin_element_class(raw.get("keyword"))
     children = raw.pop("children", [])
     parsed = cls(raw, parent=parent)
+
+    if _SCOPE_KEYS.intersection(raw):
+        scope = parsed
+
     for child in children:
-        _parse(child, parent=parsed)
+        if strip_documentation and _is_documentation(child):
+            continue
+
+        _parse(
+            child,
+            parent=parsed,
+            interner=interner,
+            scope=scope,
+            strip_documentation=strip_documentation,
+        )
+
+    if key is not None:
+        interner.add(key, parsed)
+
     return parsed
 
 
+def _is_documentation(raw):
+    return (
+        isinstance(raw, dict)
+        and raw.get("keyword") in _common.DOCUMENTATION_KEYWORDS
+        and raw.get("namespace") == _YIN
+    )
+
+
+# Attributes that change the result of properties derived from ancestor elements
+_SCOPE_KEYS = frozenset(["module-name", "module-prefix", "nsmap"])
+
+
+class _SubtreeInterner(object):
+
+    """Tracks the shareable subtrees parsed so far and how often each is reused"""
+
+    def __init__(self):
+        self._elements = {}
+        self._frozen = {}
+        self._reuse_counts = {}
+
+    def get_key(self, raw, scope):
+        # The scope is part of the key so that shared elements inherit the same
+        # prefix, module name and namespaces from their ancestors wherever they appear
+        return id(scope), self._freeze(raw)
+
+    def get_shared(self, key):
+        element = self._elements.get(key)
+        if element is not None:
+            self._reuse_counts[key] += 1
+        return element
+
+    def add(self, key, element):
+        self._elements[key] = element
+        self._reuse_counts[key] = 0
+
+    def get_report(self):
+        shared_subtrees = 0
+        replaced_subtrees = 0
+        elements_saved = 0
+        bytes_saved = 0
+
+        for key, reuse_count in self._reuse_counts.items():
+            if not reuse_count:
+                continue
+
+            subtree = list(_iterate_subtree(self._elements[key]))
+
+            shared_subtrees += 1
+            replaced_subtrees += reuse_count
+            elements_saved += reuse_count * len(subtree)
+            bytes_saved += reuse_count * sum(_get_element_size(e) for e in subtree)
+
+        return _common.DedupeReport(
+            shared_subtrees, replaced_subtrees, elements_saved, bytes_saved
+        )
+
+    def _freeze(self, raw):
+        # Nested shareable subtrees are frozen again when their parent is not shared,
+        # so remember the result for each raw dict seen during this parse. The raw
+        # dict is kept alive so that its id cannot be reused by another one.
+        try:
+            return self._frozen[id(raw)][1]
+        except KeyError:
+            pass
+
+        frozen = (
+            tuple(
+                sorted(
+                    (key, _freeze_value(value))
+                    for key, value in raw.items()
+                    if key != "children"
+                )
+            ),
+            tuple(self._freeze(child) for child in raw.get("children") or []),
+        )
+        self._frozen[id(raw)] = (raw, frozen)
+        return frozen
+
+
+def _freeze_value(value):
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def _iterate_subtree(element):
+    yield element
+    for child in element.children:
+        for descendant in _iterate_subtree(child):
+            yield descendant
+
+
+def _get_element_size(element):
+    size = sys.getsizeof(element) + sys.getsizeof(element.__dict__)
+    for key, value in element.items():
+        if key == "children":
+            # The children are measured as elements of their own
+            size += sys.getsizeof(value)
+        elif key != "keyword":
+            size += _get_value_size(value)
+    return size
+
+
+def _get_value_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + _get_value_size(item)
+    elif isinstance(value, list):
+        for item in value:
+            size += _get_value_size(item)
+    return size
+
+
 def _get_yin_element_class(name):
     yin_element_class_map = {
         "module": ModuleElement,
@@ -142,9 +398,53 @@ class YinElement(dict):
 
         if description is not None:
             description = _change_all_whitespace_to_spaces(description)
+        elif self.getroottree().get(_common.DOCUMENTATION_STRIPPED_ATTRIBUTE) == "true":
+            raise _error.DocumentationStrippedError(self.keyword)
 
         return description
 
+    @property
+    def schema_path(self):
+        """
+        The schema path of a data node, rpc, input, output or notification, or None
+        for any other element
+        """
+        schema_path = self.get(_common.SCHEMA_PATH_ATTRIBUTE)
+        if schema_path is None and self.keyword in _common.SCHEMA_NODE_KEYWORDS:
+            try:
+                schema_path = self.__dict__["_schema_path"]
+            except KeyError:
+                elements = reversed(list(self.iter_parents(include_self=True)))
+                schema_path = self.__dict__["_schema_path"] = _common.get_schema_path(
+                    elements
+                )
+
+        return schema_path
+
+    @property
+    def node_id(self):
+        """The stable id of the element's schema node, or None if it has none"""
+        node_id = self.get(_common.NODE_ID_ATTRIBUTE)
+        if node_id is not None:
+            return int(node_id)
+
+        schema_path = self.schema_path
+        return None if schema_path is None else _common.get_node_id(schema_path)
+
+    @property
+    def content_hash(self):
+        """
+        The SHA-256 hex digest of the element and its descendants, which changes
+        whenever any of them does. The hashes of the descendants are computed along
+        with it and kept for later use.
+        """
+        hasher = _get_root_index(
+            self,
+            "content-hash",
+            lambda root: _content_hash.SubtreeHasher(root, _content_hash.JsonBackend()),
+        )
+        return hasher.get_hash(self)
+
     def iterate_data_definitions(self):
         for child in self.children:
             if _common.is_data_definition(child.keyword):
@@ -210,11 +510,28 @@ class YinElement(dict):
         return parent
 
 
+def _get_root_index(element, name, build):
+    # Lookup tables built on demand for each model are stored on the root element
+    root = element.getroottree()
+    indexes = root.__dict__.setdefault("_indexes", {})
+
+    try:
+        return indexes[name]
+    except KeyError:
+        index = indexes[name] = build(root)
+        return index
+
+
 def _change_all_whitespace_to_spaces(string):
     return re.sub(r"\s+", " ", string).strip()
 
 
 class ModuleElement(YinElement):
+    @property
+    def dedupe_report(self):
+        """The DedupeReport of the model, or None if it was not parsed with dedupe"""
+        return _get_root_index(self, "dedupe-report", lambda _: None)
+
     def iterate_data_nodes(self):
         for data_node in _iterate_data_node(self):
             yield data_node
@@ -426,7 +743,15 @@ class TypeElement(YinElement):
 
     @property
     def typedef(self):
-        return self.find("typedef", namespace=_YIN)
+        typedef_ref = self.get("typedef-ref")
+        if typedef_ref is None:
+            return self.find("typedef", namespace=_YIN)
+
+        typedef_table = _get_root_index(self, "typedef", _build_typedef_table)
+        try:
+            return typedef_table[typedef_ref]
+        except KeyError:
+            raise _error.MissingTypedefError(typedef_ref)
 
     @property
     def bits(self):
@@ -477,6 +802,22 @@ class TypeElement(YinElement):
             else None
         )
 
+    @property
+    def leafref_target(self):
+        """
+        The data node referred to by the type of a leaf or leaf-list, or None if the
+        type is not a leafref or the model was generated without node ids
+        """
+        target_id = self.get(_common.TARGET_ID_ATTRIBUTE)
+        if target_id is None:
+            return None
+
+        node_ids = _get_root_index(self, "node-id", _build_node_id_index)
+        try:
+            return node_ids[int(target_id)]
+        except KeyError:
+            raise _error.MissingLeafrefTargetError(target_id)
+
     @property
     def subtypes(self):
         base_type_elem = self.base_type
@@ -518,6 +859,26 @@ class TypeElement(YinElement):
         raise _error.MissingIdentityError(*identifier_to_find)
 
 
+def _build_typedef_table(root):
+    return {
+        typedef_elem["typedef-id"]: typedef_elem
+        for typedef_elem in root.iterfind("typedef", namespace=_YIN)
+        if "typedef-id" in typedef_elem
+    }
+
+
+def _build_node_id_index(root):
+    node_ids = {}
+    elements = [root]
+    while elements:
+        element = elements.pop()
+        if element.keyword in _common.SCHEMA_NODE_KEYWORDS:
+            node_ids[element.node_id] = element
+        elements.extend(element.children)
+
+    return node_ids
+
+
 def _parse_identifier(identifier, nsmap, default_namespace):
     if ":" in identifier:
         prefix, name = identifier.split(":")
@@ -0,0 +1,342 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Estimates how much memory each part of a parsed YINsolidated model takes, to help
+choose between parsing it with ``dedupe``, without its documentation or generating
+it in a more compact form.
+
+The size of an element of the JSON parser is measured with :func:`sys.getsizeof`
+on the element and the values it holds. The XML parser keeps its elements in
+libxml2 structures that Python cannot measure, so their size is estimated from the
+typical size of those structures and of the strings they hold. Either way, the
+sizes are estimates to compare parts of a model, or models with each other, rather
+than exact counts of bytes.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import sys
+
+from lxml import etree
+
+from yinsolidated import _content_hash, json_parser, parser
+
+
+MemoryReport = collections.namedtuple(
+    "MemoryReport",
+    [
+        # Number of elements in the model. An element shared by several parents is
+        # only counted once.
+        "elements",
+        # Estimated number of bytes taken by the elements of the model
+        "bytes",
+        # Maps each keyword to the KeywordUsage of its elements
+        "keywords",
+        # The SubtreeUsage of each child of the root element, the largest first
+        "subtrees",
+        # The DuplicateStrings of the attribute values and text of the model
+        "duplicate_strings",
+        # The DuplicateSubtrees of the model
+        "duplicate_subtrees",
+    ],
+)
+
+KeywordUsage = collections.namedtuple(
+    "KeywordUsage",
+    [
+        # Number of elements with the keyword
+        "elements",
+        # Estimated number of bytes taken by the elements themselves
+        "bytes",
+        # Estimated number of bytes taken by the subtrees of the elements, which
+        # would be freed if they were removed from the model. The subtrees of
+        # elements within another element with the same keyword are not counted
+        # again.
+        "retained_bytes",
+    ],
+)
+
+SubtreeUsage = collections.namedtuple(
+    "SubtreeUsage",
+    [
+        # The keyword of the root of the subtree
+        "keyword",
+        # The name of the root of the subtree, or None if it has none
+        "name",
+        # Number of elements in the subtree
+        "elements",
+        # Estimated number of bytes taken by the subtree
+        "bytes",
+    ],
+)
+
+DuplicateStrings = collections.namedtuple(
+    "DuplicateStrings",
+    [
+        # Number of distinct strings held more than once
+        "distinct",
+        # Number of copies of those strings beyond the first
+        "copies",
+        # Estimated number of bytes taken by those copies
+        "bytes",
+    ],
+)
+
+DuplicateSubtrees = collections.namedtuple(
+    "DuplicateSubtrees",
+    [
+        # Number of distinct subtrees that appear more than once
+        "distinct",
+        # Number of copies of those subtrees beyond the first, not counting the
+        # copies within another copy
+        "copies",
+        # Number of elements in those copies
+        "elements",
+        # Estimated number of bytes taken by those copies
+        "bytes",
+    ],
+)
+
+
+def memory_report(root):
+    """
+    Returns the :class:`MemoryReport` of the model under *root*, the module element
+    or element tree returned by either parser.
+
+    Subtrees are duplicates if their content hashes are the same (see
+    :attr:`YinElement.content_hash`). With the JSON parser, a subtree shared by
+    several parents because the model was parsed with ``dedupe`` is counted once
+    and is not a duplicate. Blank text between the elements of an XML model is part
+    of their size, but is not counted as duplicate strings.
+    """
+    if isinstance(root, etree._ElementTree):  # pylint: disable=protected-access
+        root = root.getroot()
+
+    if isinstance(root, etree._Element):  # pylint: disable=protected-access
+        backend = _XmlBackend()
+    else:
+        backend = _JsonBackend()
+
+    return _ModelMeasurer(root, backend).get_report()
+
+
+class _ModelMeasurer(object):
+
+    """Measures the elements of the model under *root* read by *backend*"""
+
+    def __init__(self, root, backend):
+        self._root = root
+        self._backend = backend
+
+        self._hasher = _content_hash.SubtreeHasher(root, backend.hash_backend)
+        self._measured_keys = set()
+        self._subtree_hashes = set()
+        self._duplicate_hashes = set()
+        self._duplicate_subtrees = [0, 0, 0]
+
+        # Maps each keyword to its [elements, bytes, retained bytes]
+        self._keyword_usage = {}
+        # Number of elements with each keyword being measured
+        self._open_keywords = collections.Counter()
+
+        # Maps each string to the identities of its copies, and its size
+        self._strings = {}
+
+    def get_report(self):
+        """Measures every element of the model and returns the MemoryReport"""
+        self._hasher.get_hash(self._root)
+
+        keyword = self._backend.get_keyword(self._root)
+        self._open_keywords[keyword] += 1
+        root_size = self._measure_element(self._root)
+
+        subtrees = []
+        for child in self._backend.iter_children(self._root):
+            elements, size = self._measure_subtree(child, False)
+            if elements:
+                subtrees.append(
+                    SubtreeUsage(
+                        self._backend.get_keyword(child),
+                        child.get("name"),
+                        elements,
+                        size,
+                    )
+                )
+        subtrees.sort(key=lambda usage: usage.bytes, reverse=True)
+
+        self._open_keywords[keyword] -= 1
+        self._keyword_usage[keyword][2] += root_size + sum(
+            usage.bytes for usage in subtrees
+        )
+
+        return MemoryReport(
+            elements=1 + sum(usage.elements for usage in subtrees),
+            bytes=root_size + sum(usage.bytes for usage in subtrees),
+            keywords=dict(
+                (keyword, KeywordUsage(*usage))
+                for keyword, usage in self._keyword_usage.items()
+            ),
+            subtrees=subtrees,
+            duplicate_strings=self._get_duplicate_strings(),
+            duplicate_subtrees=DuplicateSubtrees(
+                len(self._duplicate_hashes), *self._duplicate_subtrees
+            ),
+        )
+
+    def _measure_subtree(self, element, within_duplicate):
+        # Returns the number of elements and bytes of the subtree under *element*
+        key = self._backend.get_key(element)
+        if key in self._measured_keys:
+            return 0, 0
+
+        is_duplicate = False
+        if not within_duplicate:
+            content_hash = self._hasher.get_hash(element)
+            if content_hash in self._subtree_hashes:
+                is_duplicate = True
+                self._duplicate_hashes.add(content_hash)
+            else:
+                self._subtree_hashes.add(content_hash)
+
+        keyword = self._backend.get_keyword(element)
+        self._open_keywords[keyword] += 1
+
+        elements = 1
+        size = self._measure_element(element)
+        for child in self._backend.iter_children(element):
+            child_elements, child_size = self._measure_subtree(
+                child, within_duplicate or is_duplicate
+            )
+            elements += child_elements
+            size += child_size
+
+        self._open_keywords[keyword] -= 1
+        if not self._open_keywords[keyword]:
+            self._keyword_usage[keyword][2] += size
+
+        if is_duplicate:
+            self._duplicate_subtrees[0] += 1
+            self._duplicate_subtrees[1] += elements
+            self._duplicate_subtrees[2] += size
+
+        return elements, size
+
+    def _measure_element(self, element):
+        # Returns the size of *element* itself, and counts it and its strings
+        self._measured_keys.add(self._backend.get_key(element))
+
+        size = self._backend.get_size(element)
+        usage = self._keyword_usage.setdefault(
+            self._backend.get_keyword(element), [0, 0, 0]
+        )
+        usage[0] += 1
+        usage[1] += size
+
+        for string, identity, string_size in self._backend.iter_strings(element):
+            identities, _ = self._strings.setdefault(string, ([], string_size))
+            if identity is None or identity not in identities:
+                identities.append(identity)
+
+        return size
+
+    def _get_duplicate_strings(self):
+        distinct = copies = size = 0
+        for identities, string_size in self._strings.values():
+            if len(identities) > 1:
+                distinct += 1
+                copies += len(identities) - 1
+                size += (len(identities) - 1) * string_size
+        return DuplicateStrings(distinct, copies, size)
+
+
+class _XmlBackend(object):
+
+    """Measures the elements of models returned by the XML parser"""
+
+    hash_backend = _content_hash.XmlBackend()
+
+    @staticmethod
+    def get_key(element):
+        """Returns the key of *element* among the elements of its model"""
+        return element
+
+    @staticmethod
+    def get_keyword(element):
+        """Returns the keyword of *element*"""
+        return etree.QName(element).localname
+
+    @staticmethod
+    def iter_children(element):
+        """Iterates over the child elements of *element*"""
+        return element.iterchildren(etree.Element)
+
+    @staticmethod
+    def get_size(element):
+        """Returns the estimated size of *element* itself"""
+        return parser._estimate_element_size(  # pylint: disable=protected-access
+            element
+        )
+
+    @staticmethod
+    def iter_strings(element):
+        """
+        Iterates over the (string, identity, size) of each string of *element*.
+        libxml2 does not share them, so each one has no identity.
+        """
+        for value in element.attrib.values():
+            yield value, None, len(value.encode("utf-8")) + 1
+        if element.text is not None and element.text.strip():
+            yield element.text, None, len(element.text.encode("utf-8")) + 1
+
+
+class _JsonBackend(object):
+
+    """Measures the elements of models returned by the JSON parser"""
+
+    hash_backend = _content_hash.JsonBackend()
+
+    @staticmethod
+    def get_key(element):
+        """Returns the key of *element* among the elements of its model"""
+        return _JsonBackend.hash_backend.get_key(element)
+
+    @staticmethod
+    def get_keyword(element):
+        """Returns the keyword of *element*"""
+        return element.keyword
+
+    @staticmethod
+    def iter_children(element):
+        """Iterates over the child elements of *element*"""
+        return iter(element.children)
+
+    @staticmethod
+    def get_size(element):
+        """Returns the estimated size of *element* itself"""
+        return json_parser._get_element_size(  # pylint: disable=protected-access
+            element
+        )
+
+    @staticmethod
+    def iter_strings(element):
+        """
+        Iterates over the (string, identity, size) of each string of *element*,
+        where strings with the same identity are the same object. The elements of
+        an SQLite store are loaded with strings of their own, which are dropped
+        along with them, so their strings have no identity.
+        """
+        stored = getattr(element, "_stored_id", None) is not None
+        values = [
+            value
+            for name, value in element.items()
+            if name not in ("keyword", "children")
+        ]
+        while values:
+            value = values.pop()
+            if isinstance(value, dict):
+                values.extend(value.values())
+            elif isinstance(value, list):
+                values.extend(value)
+            elif isinstance(value, type("")):
+                yield value, None if stored else id(value), sys.getsizeof(value)
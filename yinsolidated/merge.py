@@ -0,0 +1,263 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Merges the model of a module that augments another module into the model of that
+module at runtime, without consolidating the modules with pyang again.
+
+The augmenting model is generated from the augmenting module alone, with
+``--yinsolidated-augment-model``, so that it holds an ``augment`` element for each
+of the module's augments of other modules.
+"""
+
+from __future__ import unicode_literals
+
+import copy
+import itertools
+
+from lxml import etree
+
+from yinsolidated import _common, _error, parser
+
+
+# Keywords of the elements that a target node path of an augment can go through
+_TARGET_KEYWORDS = _common.SCHEMA_NODE_KEYWORDS.union(["choice", "case"])
+
+# Keywords of the elements that have no name, and are named by their keyword in a
+# target node path instead
+_UNNAMED_KEYWORDS = frozenset(["input", "output"])
+
+# Root indexes of the parsers that no longer hold once elements have been added
+_STALE_INDEXES = ("typedef", "node-id", "content-hash")
+
+
+def merge_models(base, augment_model):
+    """
+    Merges the model under the module element *augment_model* into the model under
+    the module element *base*, and returns *base*.
+
+    Both models must be returned by the same parser, either :func:`yinsolidated.parse`
+    or :func:`yinsolidated.parse_json`. *base* is modified in place, while
+    *augment_model* is left as it is.
+
+    The data definitions of each ``augment`` element of *augment_model* are copied
+    to the element at its ``target-node`` in *base*, as if the modules had been
+    consolidated together. The identities of *augment_model* that *base* does not
+    already have are added to its module element, as are the typedefs of its
+    typedef table, whose ``typedef-id`` is changed if *base* already uses it. Each
+    copied element keeps the ``module-prefix``, ``module-name`` and namespace map
+    in effect for it in *augment_model*, so that the properties derived from its
+    ancestors are the same in *base*.
+
+    Raises a :class:`yinsolidated.MissingAugmentTargetError` if the target node of
+    an augment is not in *base*.
+    """
+    if isinstance(base, dict) != isinstance(augment_model, dict):
+        raise _error.Error("the models to merge must be parsed by the same parser")
+
+    backend = _JsonBackend if isinstance(base, dict) else _XmlBackend
+    typedef_ids = _get_new_typedef_ids(base, augment_model, backend)
+    identities = set(
+        (identity.module_name, identity.name)
+        for identity in backend.iter_children(base, "identity")
+    )
+
+    for element in backend.iter_children(augment_model):
+        keyword = element.keyword
+        if keyword == "augment":
+            _merge_augment(base, element, backend, typedef_ids)
+        elif keyword == "identity":
+            if (element.module_name, element.name) not in identities:
+                backend.graft(element, base, typedef_ids)
+        elif keyword == "typedef" and element.get("typedef-id") is not None:
+            backend.graft(element, base, typedef_ids)
+
+    backend.clear_indexes(base)
+    return base
+
+
+def _get_new_typedef_ids(base, augment_model, backend):
+    # Maps the typedef-id of each typedef in the table of the augmenting model that
+    # is already used by the base model to an unused one
+    used_ids = set(
+        typedef.get("typedef-id")
+        for typedef in backend.iter_children(base, "typedef")
+        if typedef.get("typedef-id") is not None
+    )
+
+    new_ids = {}
+    next_id = len(used_ids) + 1
+    for typedef in backend.iter_children(augment_model, "typedef"):
+        typedef_id = typedef.get("typedef-id")
+        if typedef_id is None:
+            continue
+
+        new_id = typedef_id
+        while new_id in used_ids:
+            new_id = str(next_id)
+            next_id += 1
+
+        used_ids.add(new_id)
+        if new_id != typedef_id:
+            new_ids[typedef_id] = new_id
+
+    return new_ids
+
+
+def _merge_augment(base, augment, backend, typedef_ids):
+    target = _find_target(base, augment, backend)
+
+    data_definitions = [
+        child
+        for child in backend.iter_children(augment)
+        if _common.is_data_definition(child.keyword)
+    ]
+
+    for data_definition in data_definitions:
+        name = _get_target_name(data_definition)
+        if _find_child(target, name, data_definition.namespace, backend) is not None:
+            raise _error.Error(
+                "{} '{}' already exists at {}".format(
+                    data_definition.keyword, name, augment.get("target-node")
+                )
+            )
+
+    for data_definition in data_definitions:
+        backend.graft(data_definition, target, typedef_ids)
+
+
+def _find_target(base, augment, backend):
+    target_node = augment.get("target-node")
+    nsmap = augment.namespace_map
+
+    target = base
+    for component in target_node.strip("/").split("/"):
+        prefix, _, name = component.rpartition(":")
+        try:
+            namespace = nsmap[prefix or augment.prefix]
+        except KeyError:
+            raise _error.MissingAugmentTargetError(target_node)
+
+        target = _find_child(target, name, namespace, backend)
+        if target is None:
+            raise _error.MissingAugmentTargetError(target_node)
+
+    return target
+
+
+def _find_child(element, name, namespace, backend):
+    for child in backend.iter_children(element):
+        if (
+            child.keyword in _TARGET_KEYWORDS
+            and _get_target_name(child) == name
+            and child.namespace == namespace
+        ):
+            return child
+    return None
+
+
+def _get_target_name(element):
+    keyword = element.keyword
+    return keyword if keyword in _UNNAMED_KEYWORDS else element.name
+
+
+class _XmlBackend(object):
+
+    """Merges models returned by :func:`yinsolidated.parse`"""
+
+    @staticmethod
+    def iter_children(element, keyword="*"):
+        """Iterates over the YIN child elements of *element* with *keyword*"""
+        return element.iterchildren("{{{}}}{}".format(_common.YIN_NS, keyword))
+
+    @staticmethod
+    def graft(element, parent, typedef_ids):
+        """Appends a copy of *element* and its descendants to *parent*"""
+        # The namespace map of an element cannot be changed once it is created, so
+        # the copy is created with every namespace in scope of the original
+        graft = etree.SubElement(parent, element.tag, nsmap=element.nsmap)
+        for key, value in element.attrib.items():
+            graft.set(key, value)
+        graft.set("module-prefix", element.prefix)
+        graft.set("module-name", element.module_name)
+        graft.text = element.text
+        graft.extend(copy.deepcopy(child) for child in element)
+
+        # The content hashes of the copy and its new ancestors no longer hold
+        for changed_element in itertools.chain([graft], graft.iterancestors()):
+            changed_element.attrib.pop(_common.CONTENT_HASH_ATTRIBUTE, None)
+
+        if typedef_ids:
+            for descendant in graft.iter(etree.Element):
+                for key, typedef_id in _rename_typedef_ids(descendant, typedef_ids):
+                    descendant.set(key, typedef_id)
+
+    @staticmethod
+    def clear_indexes(root):
+        """Drops the lookup tables of the model that no longer hold"""
+        # pylint: disable=protected-access
+        indexes = parser._get_root_indexes(root)[1] or {}
+        for name in _STALE_INDEXES:
+            indexes.pop(name, None)
+
+
+class _JsonBackend(object):
+
+    """Merges models returned by :func:`yinsolidated.parse_json`"""
+
+    @staticmethod
+    def iter_children(element, keyword=None):
+        """Iterates over the child elements of *element* with *keyword*, if given"""
+        return (
+            child
+            for child in element.children
+            if keyword is None or child.keyword == keyword
+        )
+
+    @staticmethod
+    def graft(element, parent, typedef_ids):
+        """Appends a copy of *element* and its descendants to *parent*"""
+        data = _copy_json_data(element)
+        data["module-prefix"] = element.prefix
+        data["module-name"] = element.module_name
+        if "nsmap" not in data:
+            data["nsmap"] = element.namespace_map
+
+        graft = type(element)(data, parent=parent)
+
+        # The content hashes of the copy and its new ancestors no longer hold
+        for changed_element in graft.iter_parents(include_self=True):
+            changed_element.pop(_common.CONTENT_HASH_ATTRIBUTE, None)
+
+        stack = [(element, graft)]
+        while stack:
+            original, graft = stack.pop()
+            graft.update(_rename_typedef_ids(graft, typedef_ids))
+
+            children = [
+                (child, type(child)(_copy_json_data(child), parent=graft))
+                for child in original.children
+            ]
+            stack.extend(reversed(children))
+
+    @staticmethod
+    def clear_indexes(root):
+        """Drops the lookup tables of the model that no longer hold"""
+        indexes = root.__dict__.get("_indexes", {})
+        for name in _STALE_INDEXES:
+            indexes.pop(name, None)
+
+
+def _copy_json_data(element):
+    data = dict((key, value) for key, value in element.items() if key != "children")
+    if "nsmap" in data:
+        data["nsmap"] = dict(data["nsmap"])
+    return data
+
+
+def _rename_typedef_ids(element, typedef_ids):
+    # Returns the typedef attributes of *element* to change, and their new values
+    return [
+        (key, typedef_ids[element.get(key)])
+        for key in ("typedef-id", "typedef-ref")
+        if element.get(key) in typedef_ids
+    ]
@@ -17,7 +17,7 @@ import re
 import xpathparser
 from lxml import etree
 
-from yinsolidated import _common, _error
+from yinsolidated import _common, _content_hash, _error
 
 
 _NSMAP = {"yin": _common.YIN_NS}
@@ -61,19 +61,260 @@ def _get_yin_element_class(name):
     return element_class
 
 
-# Custom XML parser to use for the YINsolidated model
+class _ModelIndexes(object):
+
+    """
+    The lookup tables built on demand for a model, and its root element. The root
+    element is kept alive with them so that lxml returns the same object for it for
+    as long as the document exists.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.indexes = {}
+
+
+class _ModelParser(etree.XMLParser):
+
+    """
+    Parses a single YINsolidated model. lxml elements are proxies that may be
+    discarded and created again at any time, so the lookup tables of the model are
+    kept by its parser instead, which its document keeps alive.
+    """
+
+    def __init__(self, **kwargs):
+        super(_ModelParser, self).__init__(**kwargs)
+        self.set_element_class_lookup(_ConsolidatedModelLookup())
+        self.model_indexes = _ModelIndexes()
+
+
+class _ModelPullParser(etree.XMLPullParser):
+
+    """Parses a single YINsolidated model incrementally (see :class:`_ModelParser`)"""
+
+    def __init__(self, **kwargs):
+        super(_ModelPullParser, self).__init__(**kwargs)
+        self.set_element_class_lookup(_ConsolidatedModelLookup())
+        self.model_indexes = _ModelIndexes()
+
+
+def _get_root_indexes(element):
+    # Returns the root element and its lookup tables, or None if its document was
+    # not parsed by one of the model parsers. Documents that share the parser of
+    # another one, such as deep copies, are given no lookup tables either.
+    tree = element.getroottree()
+    root = tree.getroot()
+    model_indexes = getattr(tree.parser, "model_indexes", None)
+    if model_indexes is None:
+        return root, None
+
+    if model_indexes.root is None:
+        model_indexes.root = root
+    return root, model_indexes.indexes if model_indexes.root is root else None
+
+
+def _get_root_index(element, name, build):
+    root, indexes = _get_root_indexes(element)
+    if indexes is None:
+        return build(root)
+
+    try:
+        return indexes[name]
+    except KeyError:
+        index = indexes[name] = build(root)
+        return index
+
+
+# Custom XML parser to use for the YINsolidated model. The lookup tables of the
+# models it parses are built again each time they are needed, as they cannot be
+# kept for each of them; use parse or fromstring instead.
 CONSOLIDATED_MODEL_PARSER = etree.XMLParser()
 CONSOLIDATED_MODEL_PARSER.set_element_class_lookup(_ConsolidatedModelLookup())
 
 
-def parse(path):
-    """Parses the YINsolidated model file at the given *path*"""
-    return etree.parse(path, parser=CONSOLIDATED_MODEL_PARSER)
+def parse(path, dedupe=False, strip_documentation=False):
+    """
+    Parses the YINsolidated model file at the given *path*
+
+    If *dedupe* is True, identical typedefs copied into type elements within the same
+    module scope are moved into a typedef table on the root element, as if the model
+    had been generated with ``--yinsolidated-typedef-table``. The savings are
+    available from the *dedupe_report* of the root module element.
+
+    If *strip_documentation* is True, description, reference, organization and
+    contact elements are discarded as soon as they are parsed, as if the model had
+    been generated with ``--yinsolidated-strip-documentation``.
+    """
+    if strip_documentation:
+        if hasattr(path, "read"):
+            root = _parse_without_documentation(_read_chunks(path))
+        else:
+            with open(path, "rb") as model_file:
+                root = _parse_without_documentation(
+                    _read_chunks(model_file), base_url=path
+                )
+        tree = root.getroottree()
+    else:
+        tree = etree.parse(path, parser=_ModelParser())
+
+    if dedupe:
+        _dedupe_typedefs(tree.getroot())
+    return tree
+
+
+def fromstring(xml_string, dedupe=False, strip_documentation=False):
+    """Parses the given string as the YINsolidated model (see :func:`parse`)"""
+    if strip_documentation:
+        root = _parse_without_documentation(
+            xml_string[start : start + _FEED_CHUNK_SIZE]
+            for start in range(0, len(xml_string), _FEED_CHUNK_SIZE)
+        )
+    else:
+        root = etree.fromstring(xml_string, parser=_ModelParser())
+
+    if dedupe:
+        _dedupe_typedefs(root)
+    return root
+
+
+_DOCUMENTATION_TAGS = [
+    etree.QName(_common.YIN_NS, keyword).text
+    for keyword in sorted(_common.DOCUMENTATION_KEYWORDS)
+]
+
+
+_SCHEMA_NODE_TAGS = [
+    etree.QName(_common.YIN_NS, keyword).text
+    for keyword in sorted(_common.SCHEMA_NODE_KEYWORDS)
+]
+
+
+_FEED_CHUNK_SIZE = 64 * 1024
+
+
+def _read_chunks(model_file):
+    chunk = model_file.read(_FEED_CHUNK_SIZE)
+    while chunk:
+        yield chunk
+        chunk = model_file.read(_FEED_CHUNK_SIZE)
+
+
+def _parse_without_documentation(chunks, base_url=None):
+    pull_parser = _ModelPullParser(
+        events=("end",), tag=_DOCUMENTATION_TAGS, base_url=base_url
+    )
+    for chunk in chunks:
+        pull_parser.feed(chunk)
+        _remove_documentation(pull_parser.read_events())
+    root = pull_parser.close()
+    _remove_documentation(pull_parser.read_events())
+
+    root.set(_common.DOCUMENTATION_STRIPPED_ATTRIBUTE, "true")
+    return root
+
+
+def _remove_documentation(events):
+    # Each element is removed as soon as it has been parsed, so the documentation
+    # of the whole model is never held in memory at once
+    for _, element in events:
+        element.getparent().remove(element)
+
+
+def _dedupe_typedefs(root):
+    # Elements can only have a single parent, so identical typedefs are shared by
+    # moving them into the typedef table rather than by sharing the elements
+    copied_typedefs = root.xpath(".//yin:type/yin:typedef", namespaces=_NSMAP)
+
+    typedef_table = _build_typedef_table(root)
+    typedef_ids = {}
+    reuse_counts = {}
+    elements_saved = 0
+    bytes_saved = 0
+
+    # Nested typedefs are replaced first so that their references are compared
+    for typedef_elem in reversed(copied_typedefs):
+        type_elem = typedef_elem.getparent()
+        key = _get_typedef_key(typedef_elem)
+
+        try:
+            typedef_id = typedef_ids[key]
+        except KeyError:
+            typedef_id = _get_unused_typedef_id(typedef_table)
+            typedef_ids[key] = typedef_id
+            reuse_counts[typedef_id] = 0
+            typedef_table[typedef_id] = _move_typedef_to_table(
+                typedef_elem, typedef_id, key, root
+            )
+        else:
+            reuse_counts[typedef_id] += 1
+            for element in typedef_elem.iter():
+                elements_saved += 1
+                bytes_saved += _estimate_element_size(element)
+
+        type_elem.remove(typedef_elem)
+        type_elem.set("typedef-ref", typedef_id)
+
+    report = _common.DedupeReport(
+        shared_subtrees=sum(1 for count in reuse_counts.values() if count),
+        replaced_subtrees=sum(reuse_counts.values()),
+        elements_saved=elements_saved,
+        bytes_saved=bytes_saved,
+    )
+    _get_root_index(root, "dedupe-report", lambda _: report)
+
+
+def _get_typedef_key(typedef_elem):
+    # The canonical form includes the namespaces in scope, and the prefix and module
+    # name are included so that the typedef is scoped the same way in the table
+    return (
+        _get_optional_attribute(typedef_elem, "prefix"),
+        _get_optional_attribute(typedef_elem, "module_name"),
+        etree.tostring(typedef_elem, method="c14n", with_tail=False),
+    )
+
+
+def _get_optional_attribute(element, name):
+    try:
+        return getattr(element, name)
+    except _error.Error:
+        return None
+
+
+def _get_unused_typedef_id(typedef_table):
+    typedef_id = len(typedef_table) + 1
+    while str(typedef_id) in typedef_table:
+        typedef_id += 1
+    return str(typedef_id)
+
+
+def _move_typedef_to_table(typedef_elem, typedef_id, key, root):
+    table_elem = etree.SubElement(root, typedef_elem.tag, nsmap=typedef_elem.nsmap)
 
+    for name, value in typedef_elem.attrib.items():
+        table_elem.set(name, value)
 
-def fromstring(xml_string):
-    """Parses the given string as the YINsolidated model"""
-    return etree.fromstring(xml_string, parser=CONSOLIDATED_MODEL_PARSER)
+    prefix, module_name, _ = key
+    if prefix is not None:
+        table_elem.set("module-prefix", prefix)
+    if module_name is not None:
+        table_elem.set("module-name", module_name)
+    table_elem.set("typedef-id", typedef_id)
+
+    table_elem.extend(list(typedef_elem))
+    return table_elem
+
+
+def _estimate_element_size(element):
+    # Rough sizes of the libxml2 structures for a node, its attributes and their
+    # values, and the text nodes inside and after it, on a 64-bit platform. Tag and
+    # attribute names are shared by libxml2.
+    size = 120
+    for value in element.attrib.values():
+        size += 96 + 120 + len(value.encode("utf-8")) + 1
+    for text in (element.text, element.tail):
+        if text is not None:
+            size += 120 + len(text.encode("utf-8")) + 1
+    return size
 
 
 class YinElement(etree.ElementBase):
@@ -119,9 +360,52 @@ class YinElement(etree.ElementBase):
 
         if description is not None:
             description = _change_all_whitespace_to_spaces(description)
+        elif _is_documentation_stripped(self):
+            raise _error.DocumentationStrippedError(self.keyword)
 
         return description
 
+    @property
+    def schema_path(self):
+        """
+        The schema path of a data node, rpc, input, output or notification, or None
+        for any other element
+        """
+        schema_path = self.get(_common.SCHEMA_PATH_ATTRIBUTE)
+        if schema_path is None and self.keyword in _common.SCHEMA_NODE_KEYWORDS:
+            schema_paths = _get_root_index(self, "schema-path", lambda _: {})
+            try:
+                schema_path = schema_paths[self]
+            except KeyError:
+                elements = list(self.iterancestors())[::-1] + [self]
+                schema_path = schema_paths[self] = _common.get_schema_path(elements)
+
+        return schema_path
+
+    @property
+    def node_id(self):
+        """The stable id of the element's schema node, or None if it has none"""
+        node_id = self.get(_common.NODE_ID_ATTRIBUTE)
+        if node_id is not None:
+            return int(node_id)
+
+        schema_path = self.schema_path
+        return None if schema_path is None else _common.get_node_id(schema_path)
+
+    @property
+    def content_hash(self):
+        """
+        The SHA-256 hex digest of the element and its descendants, which changes
+        whenever any of them does. The hashes of the descendants are computed along
+        with it and kept for later use.
+        """
+        hasher = _get_root_index(
+            self,
+            "content-hash",
+            lambda root: _content_hash.SubtreeHasher(root, _content_hash.XmlBackend()),
+        )
+        return hasher.get_hash(self)
+
     def iterate_data_definitions(self):
         for child in self:
             if _common.is_data_definition(etree.QName(child.tag).localname):
@@ -143,6 +427,11 @@ class YinElement(etree.ElementBase):
         )
 
 
+def _is_documentation_stripped(element):
+    root = element.getroottree().getroot()
+    return root.get(_common.DOCUMENTATION_STRIPPED_ATTRIBUTE) == "true"
+
+
 def _change_all_whitespace_to_spaces(string):
     return re.sub(r"\s+", " ", string).strip()
 
@@ -152,6 +441,11 @@ class ModuleElement(YinElement):
     def name(self):
         return self.get("name")
 
+    @property
+    def dedupe_report(self):
+        """The DedupeReport of the model, or None if it was not parsed with dedupe"""
+        return _get_root_index(self, "dedupe-report", lambda _: None)
+
 
 class DefinitionElement(YinElement):
     @property
@@ -357,7 +651,15 @@ class TypeElement(YinElement):
 
     @property
     def typedef(self):
-        return self.find("yin:typedef", namespaces=_NSMAP)
+        typedef_ref = self.get("typedef-ref")
+        if typedef_ref is None:
+            return self.find("yin:typedef", namespaces=_NSMAP)
+
+        typedef_table = _get_root_index(self, "typedef", _build_typedef_table)
+        try:
+            return typedef_table[typedef_ref]
+        except KeyError:
+            raise _error.MissingTypedefError(typedef_ref)
 
     @property
     def bits(self):
@@ -408,6 +710,22 @@ class TypeElement(YinElement):
             else None
         )
 
+    @property
+    def leafref_target(self):
+        """
+        The data node referred to by the type of a leaf or leaf-list, or None if the
+        type is not a leafref or the model was generated without node ids
+        """
+        target_id = self.get(_common.TARGET_ID_ATTRIBUTE)
+        if target_id is None:
+            return None
+
+        node_ids = _get_root_index(self, "node-id", _build_node_id_index)
+        try:
+            return node_ids[int(target_id)]
+        except KeyError:
+            raise _error.MissingLeafrefTargetError(target_id)
+
     @property
     def subtypes(self):
         base_type_elem = self.base_type
@@ -449,6 +767,17 @@ class TypeElement(YinElement):
         raise _error.MissingIdentityError(*identifier_to_find)
 
 
+def _build_typedef_table(root):
+    return {
+        typedef_elem.get("typedef-id"): typedef_elem
+        for typedef_elem in root.iterfind("yin:typedef[@typedef-id]", namespaces=_NSMAP)
+    }
+
+
+def _build_node_id_index(root):
+    return {element.node_id: element for element in root.iter(*_SCHEMA_NODE_TAGS)}
+
+
 def _parse_identifier(identifier, nsmap, default_namespace):
     if ":" in identifier:
         prefix, name = identifier.split(":")
@@ -13,14 +13,56 @@ NOTE: the main module MUST be passed as the first positional argument
 
 from __future__ import unicode_literals
 
+import collections
+import io
 import json
 import optparse
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 from lxml import etree
 from pyang import __version__ as pyang_version, plugin, statements, syntax, yin_parser
 
-from yinsolidated import _common
+from yinsolidated import (
+    __version__,
+    _build_cache,
+    _common,
+    _content_hash,
+    _json_writer,
+    _table_writer,
+    shards,
+)
+
 
+_FORMATS = ["xml", "json", "table"]
+
+# The shorter names of the most common JSON members written with
+# --yinsolidated-compact-keys. Short names start with "$" so that they cannot clash
+# with the YANG identifiers used as extension argument names.
+_COMPACT_JSON_KEYS = {
+    "children": "$c",
+    "condition": "$cd",
+    "content-hash": "$h",
+    "context-node": "$cx",
+    "keyword": "$k",
+    "module-name": "$mn",
+    "module-prefix": "$mp",
+    "name": "$n",
+    "id": "$id",
+    "target-id": "$tid",
+    "namespace": "$ns",
+    "nsmap": "$m",
+    "schema-path": "$sp",
+    "text": "$t",
+    "typedef-id": "$ti",
+    "typedef-ref": "$tr",
+    "value": "$v",
+}
 
 _EXTRA_PYANG_DATA_KEYWORDS = ["notification", "rpc", "input", "output"]
 
@@ -51,10 +93,175 @@ class ConsolidatedModelPlugin(plugin.PyangPlugin):
                 optparse.make_option(
                     "--yinsolidated-output-format",
                     dest="yinsoldated_output_format",
-                    choices=["xml", "json"],
+                    choices=_FORMATS,
                     default="xml",
                     help="The format of the output model",
                 ),
+                optparse.make_option(
+                    "--yinsolidated-xml-output",
+                    dest="yinsolidated_xml_output",
+                    default=None,
+                    help=(
+                        "Also write the XML model to this file, in the same pass "
+                        "as any other format"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-json-output",
+                    dest="yinsolidated_json_output",
+                    default=None,
+                    help=(
+                        "Also write the JSON model to this file, in the same pass "
+                        "as any other format"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-table-output",
+                    dest="yinsolidated_table_output",
+                    default=None,
+                    help=(
+                        "Also write the node table model to this file, in the same "
+                        "pass as any other format"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-shard-dir",
+                    dest="yinsolidated_shard_dir",
+                    default=None,
+                    metavar="DIR",
+                    help=(
+                        "Also write the JSON model to this directory, split into "
+                        "one shard per top-level data definition, rpc and "
+                        "notification plus a root shard, along with a manifest"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-json-indent",
+                    dest="yinsolidated_json_indent",
+                    type="int",
+                    default=2,
+                    help=(
+                        "The number of spaces to indent each level of the JSON "
+                        "model by, or 0 to omit all insignificant whitespace"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-compact",
+                    dest="yinsolidated_compact",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Omit all insignificant whitespace and, in the JSON model, "
+                        "the namespace of each YIN element"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-compact-keys",
+                    dest="yinsolidated_compact_keys",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Like --yinsolidated-compact, and also abbreviate the most "
+                        "common JSON member names"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-root",
+                    dest="yinsolidated_roots",
+                    action="append",
+                    default=None,
+                    metavar="PATH",
+                    help=(
+                        "Only include the data node at this schema path, e.g. "
+                        "/container/list, and its descendants, along with the "
+                        "identities and leafref targets they refer to. May be "
+                        "given more than once"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-strip-documentation",
+                    dest="yinsolidated_strip_documentation",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Omit description, reference, organization and contact "
+                        "statements from the model"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-node-ids",
+                    dest="yinsolidated_node_ids",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Add a stable id and the schema path to the element of "
+                        "each data node, and the id of the node it refers to to "
+                        "the type element of each leafref"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-content-hashes",
+                    dest="yinsolidated_content_hashes",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Add the content hash of its subtree to the module element "
+                        "and the element of each data definition, rpc, input, "
+                        "output, notification and identity"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-augment-model",
+                    dest="yinsolidated_augment_model",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Add the augments that the main module makes to other "
+                        "modules to the model, so that it can be merged into a "
+                        "model of those modules at runtime"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-typedef-table",
+                    dest="yinsolidated_typedef_table",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Add each typedef to the module element once and refer to "
+                        "it from each type that uses it, instead of copying the "
+                        "typedef into every type"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-profile",
+                    dest="yinsolidated_profile",
+                    action="store_true",
+                    default=False,
+                    help=(
+                        "Write a JSON report of where the time and elements of the "
+                        "model go to <output>.profile.json, or to stderr if no "
+                        "output file is given"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-cache-dir",
+                    dest="yinsolidated_cache_dir",
+                    default=None,
+                    help=(
+                        "Reuse the model generated by a previous run from this "
+                        "directory if none of the modules or options have changed"
+                    ),
+                ),
+                optparse.make_option(
+                    "--yinsolidated-cache-size",
+                    dest="yinsolidated_cache_size",
+                    type="int",
+                    default=_build_cache.DEFAULT_MAX_SIZE // (1024 * 1024),
+                    help=(
+                        "The maximum size of the cache directory in MiB, beyond "
+                        "which the least recently used models are removed"
+                    ),
+                ),
             ]
         )
 
@@ -65,36 +272,506 @@ class ConsolidatedModelPlugin(plugin.PyangPlugin):
 
     def emit(self, ctx, modules, output):
         """Override."""
-        fmt = ctx.opts.yinsoldated_output_format
-        model = _build_consolidated_model(modules, fmt)
+        outputs = _open_outputs(ctx, output)
+        profiler = _Profiler() if ctx.opts.yinsolidated_profile else None
+
+        try:
+            with _timed(profiler, "total"):
+                _emit_models(ctx, modules, outputs, profiler)
+        finally:
+            for fmt_outputs in outputs.values():
+                for fmt_output in fmt_outputs:
+                    if fmt_output is not output:
+                        fmt_output.close()
+
+        if profiler is not None:
+            _write_profile_report(
+                profiler.get_report(",".join(outputs)), ctx.opts.outfile
+            )
+
+
+def _open_outputs(ctx, output):
+    """
+    Returns an ordered mapping of each format to generate to the list of outputs to
+    write it to, starting with the format of the main *output*.
+    """
+    outputs = collections.OrderedDict([(ctx.opts.yinsoldated_output_format, [output])])
+
+    for fmt in _FORMATS:
+        path = getattr(ctx.opts, "yinsolidated_{}_output".format(fmt))
+        if path:
+            outputs.setdefault(fmt, []).append(io.open(path, "w", encoding="utf-8"))
+
+    return outputs
+
+
+def _emit_models(ctx, modules, outputs, profiler):
+    """
+    Writes the model of *modules* in each format to its outputs, building the
+    models that are not in the build cache in a single pass over *modules*.
+    """
+    cache = _open_build_cache(ctx)
+    cache_entries = []
+    pending_outputs = collections.OrderedDict()
+
+    for fmt, fmt_outputs in outputs.items():
+        fmt_output = _build_cache.TeeOutput(*fmt_outputs)
+        cache_key = _get_build_cache_key(ctx, modules, fmt) if cache else None
+
+        if cache_key is None:
+            pending_outputs[fmt] = fmt_output
+        elif cache.copy_to(cache_key, fmt_output):
+            _count(profiler, "build-cache-hits")
+        else:
+            _count(profiler, "build-cache-misses")
+            cache_entry = cache.open_entry(cache_key)
+            cache_entries.append(cache_entry)
+            pending_outputs[fmt] = _build_cache.TeeOutput(fmt_output, cache_entry)
+
+    try:
+        # Shards are not cached, so they are always built
+        if pending_outputs or ctx.opts.yinsolidated_shard_dir:
+            _write_models(ctx, modules, pending_outputs, profiler)
+    except Exception:
+        for cache_entry in cache_entries:
+            cache_entry.discard()
+        raise
+
+    for cache_entry in cache_entries:
+        cache_entry.commit()
+
+
+def _write_models(ctx, modules, outputs, profiler):
+    compact = _is_compact(ctx)
+    content_hashes = ctx.opts.yinsolidated_content_hashes
+    json_indent = 0 if compact else ctx.opts.yinsolidated_json_indent
+    json_key_dictionary = (
+        _COMPACT_JSON_KEYS if ctx.opts.yinsolidated_compact_keys else None
+    )
+
+    # The content hash of an element is only known once its descendants have been
+    # created, so the JSON model is only written as it is built without hashes
+    json_writer = None
+    if "json" in outputs and not content_hashes:
+        json_writer = _json_writer.JsonStreamWriter(
+            outputs["json"], indent=json_indent, key_dictionary=json_key_dictionary
+        )
+        if profiler is not None:
+            json_writer = _TimedJsonWriter(json_writer, profiler)
+
+    formats = list(outputs)
+    if ctx.opts.yinsolidated_shard_dir:
+        formats.append("shards")
+
+    models = _build_consolidated_models(
+        modules,
+        formats,
+        json_writer=json_writer,
+        typedef_table=ctx.opts.yinsolidated_typedef_table,
+        compact=compact,
+        roots=ctx.opts.yinsolidated_roots,
+        strip_documentation=ctx.opts.yinsolidated_strip_documentation,
+        node_ids=ctx.opts.yinsolidated_node_ids,
+        augment_model=ctx.opts.yinsolidated_augment_model,
+        content_hashes=content_hashes,
+        profiler=profiler,
+    )
 
-        document = (
-            etree.tostring(model, xml_declaration=True, pretty_print=True).decode(
-                "UTF-8"
+    if "xml" in outputs:
+        with _timed(profiler, "serialization"):
+            outputs["xml"].write(
+                etree.tostring(
+                    models["xml"], xml_declaration=True, pretty_print=not compact
+                ).decode("UTF-8")
             )
-            if fmt == "xml"
-            else json.dumps(model, indent=2)
+
+    if json_writer is not None:
+        json_writer.close()
+    elif "json" in outputs:
+        with _timed(profiler, "serialization"):
+            _json_writer.write_tree(
+                models["json"],
+                outputs["json"],
+                indent=json_indent,
+                key_dictionary=json_key_dictionary,
+            )
+
+    if "table" in outputs:
+        with _timed(profiler, "serialization"):
+            _table_writer.write_table(models["table"], outputs["table"])
+
+    if "shards" in models:
+        with _timed(profiler, "serialization"):
+            shards.write_shards(
+                models["shards"], ctx.opts.yinsolidated_shard_dir, indent=json_indent
+            )
+
+
+def _is_compact(ctx):
+    return ctx.opts.yinsolidated_compact or ctx.opts.yinsolidated_compact_keys
+
+
+def _open_build_cache(ctx):
+    """Returns the build cache selected by the options in *ctx*, if any"""
+    if not ctx.opts.yinsolidated_cache_dir:
+        return None
+
+    return _build_cache.BuildCache(
+        ctx.opts.yinsolidated_cache_dir,
+        max_size=ctx.opts.yinsolidated_cache_size * 1024 * 1024,
+    )
+
+
+def _get_build_cache_key(ctx, modules, fmt):
+    """
+    Returns the key under which the model of *modules* in *fmt* is cached, or None
+    if it cannot be cached.
+    """
+    try:
+        module_hashes = sorted(
+            [name, revision, _build_cache.hash_file(module.pos.ref)]
+            for (name, revision), module in ctx.modules.items()
         )
+    except (IOError, OSError):
+        # Modules that were not read from a file cannot be hashed
+        return None
+
+    options = {
+        "format": fmt,
+        "typedef-table": ctx.opts.yinsolidated_typedef_table,
+        "compact": _is_compact(ctx),
+        "roots": ctx.opts.yinsolidated_roots,
+        "strip-documentation": ctx.opts.yinsolidated_strip_documentation,
+        "node-ids": ctx.opts.yinsolidated_node_ids,
+        "augment-model": ctx.opts.yinsolidated_augment_model,
+        "content-hashes": ctx.opts.yinsolidated_content_hashes,
+    }
+    if fmt == "json":
+        options["json-indent"] = ctx.opts.yinsolidated_json_indent
+        options["compact-keys"] = ctx.opts.yinsolidated_compact_keys
+
+    return _build_cache.make_key(
+        __version__,
+        pyang_version,
+        [module.arg for module in modules],
+        module_hashes,
+        ctx.features,
+        options,
+    )
 
-        output.write(document)
 
+def _build_consolidated_model(modules, fmt, **kwargs):
+    """
+    Builds the consolidated model of *modules* in the given *fmt*.
+
+    See :func:`_build_consolidated_models` for the keyword arguments.
+    """
+    return _build_consolidated_models(modules, [fmt], **kwargs)[fmt]
+
+
+def _build_consolidated_models(
+    modules,
+    formats,
+    json_writer=None,
+    typedef_table=False,
+    compact=False,
+    roots=None,
+    strip_documentation=False,
+    node_ids=False,
+    augment_model=False,
+    content_hashes=False,
+    counters=None,
+    profiler=None,
+):
+    """
+    Builds the consolidated model of *modules* in each of the given *formats* in a
+    single pass, and returns a mapping of each format to its module element.
+
+    The models of the ``table`` and ``shards`` formats are the complete tree of JSON
+    elements, from which the node table or the shards are built.
+
+    If a *json_writer* is given, each element of the ``json`` format is handed to it
+    as soon as it is created rather than being retained by its parent, so only the
+    root element is returned.
+
+    If *typedef_table* is True, each typedef is added to the module element once and
+    each type using it refers to it by its ``typedef-id``.
+
+    If *compact* is True, JSON elements in the YIN namespace omit their namespace,
+    which is recorded once as the ``default-namespace`` of the module element.
+
+    If a list of *roots* schema paths is given, only the data nodes at those paths
+    and their descendants are included, along with their ancestors, the leafref
+    targets they refer to and the identities related to the bases of their
+    identityrefs.
+
+    If *strip_documentation* is True, description, reference, organization and
+    contact statements are omitted, and the module element is marked accordingly.
+
+    If *node_ids* is True, the element of each data node, rpc, input, output and
+    notification has an ``id`` and a ``schema-path`` attribute, and the type element
+    of each leafref has the ``target-id`` of the node it refers to.
+
+    If *augment_model* is True, each augment of another module's data tree made by
+    the main module is added to the module element as an ``augment`` element with
+    its ``target-node`` and the elements of the data definitions it adds, so that
+    the model can be merged into a model of the augmented module by
+    :func:`yinsolidated.merge.merge_models`.
+
+    If *content_hashes* is True, the module element and the element of each data
+    definition, rpc, input, output, notification and identity have a
+    ``content-hash`` attribute holding the content hash of their subtree, as
+    computed by the ``content_hash`` property of the parsed element. A *json_writer*
+    cannot be given along with it.
+
+    If a *counters* ``collections.Counter`` is given, it is updated with the number
+    of times each kind of lookup was performed and served from a cache.
+
+    If a *profiler* is given, it records the time spent in each phase of the build
+    and the number of elements created for each module and typedef.
+    """
+    if counters is None and profiler is not None:
+        counters = profiler.counters
+
+    factories = [_make_element_factory(fmt, json_writer, compact) for fmt in formats]
+    element_factory = (
+        factories[0] if len(factories) == 1 else _MultiElementFactory(factories)
+    )
+
+    selection = None
+    if roots:
+        with _timed(profiler, "selection"):
+            selection = _select_subtrees(modules, roots)
 
-def _build_consolidated_model(modules, fmt):
     main_module = modules[0]
-    module_element = _make_builtin_yin_element_recursive(main_module, fmt=fmt)
+    builder = _ModelBuilder(
+        element_factory,
+        main_module,
+        typedef_table=typedef_table,
+        selection=selection,
+        strip_documentation=strip_documentation,
+        node_ids=node_ids,
+        counters=counters,
+        profiler=profiler,
+    )
+
+    with _timed(profiler, "main-module"):
+        module_element = _make_builtin_yin_subtree(main_module, builder=builder)
+
+    with _timed(profiler, "external-identities"):
+        _add_external_identities(modules[1:], module_element, builder)
+
+    if augment_model:
+        with _timed(profiler, "augments"):
+            _add_augments(main_module, module_element, builder)
+
+    if builder.typedef_table is not None:
+        with _timed(profiler, "typedef-table"):
+            _add_typedef_table(builder.typedef_table, module_element, builder)
+
+    models = (
+        {formats[0]: module_element}
+        if len(factories) == 1
+        else dict(zip(formats, module_element.elements))
+    )
+
+    if content_hashes:
+        with _timed(profiler, "content-hashes"):
+            for fmt, model in models.items():
+                _add_content_hashes(model, _get_content_hash_backend(fmt, compact))
+
+    return models
+
+
+def _get_content_hash_backend(fmt, compact):
+    if fmt == "xml":
+        return _content_hash.XmlBackend()
+
+    # The elements of the compact JSON model omit the YIN namespace, which the
+    # parser restores
+    return _content_hash.JsonBackend(
+        default_namespace=yin_parser.yin_namespace
+        if fmt == "json" and compact
+        else None
+    )
+
+
+def _add_content_hashes(module_element, backend):
+    hasher = _content_hash.SubtreeHasher(module_element, backend)
+
+    # The hashes of all elements are computed before any attribute is added, so
+    # that they are those of the elements as they are parsed
+    hasher.get_hash(module_element)
+
+    stack = [module_element]
+    while stack:
+        element = stack.pop()
+        if backend.get_keyword(element) in _common.CONTENT_HASH_KEYWORDS:
+            element.set(_common.CONTENT_HASH_ATTRIBUTE, hasher.get_hash(element))
+        stack.extend(backend.iter_children(element))
+
+
+def _make_element_factory(fmt, json_writer, compact):
+    if fmt == "xml":
+        return _XmlElementFactory()
+
+    if fmt in ("table", "shards"):
+        # The node table and shards are built from the complete tree of JSON elements
+        return _JsonElementFactory()
+
+    return _JsonElementFactory(
+        json_writer, default_namespace=yin_parser.yin_namespace if compact else None
+    )
+
+
+class _ModelBuilder(object):
+
+    """State shared by every element created while building one consolidated model"""
+
+    def __init__(
+        self,
+        element_factory,
+        main_module,
+        typedef_table=False,
+        selection=None,
+        strip_documentation=False,
+        node_ids=False,
+        counters=None,
+        profiler=None,
+    ):
+        self.element_factory = element_factory
+        self.main_module = main_module
+        self.typedef_table = _TypedefTable() if typedef_table else None
+        self.selection = selection
+        self.strip_documentation = strip_documentation
+        self.node_ids = node_ids
+        self.counters = collections.Counter() if counters is None else counters
+        self.profiler = profiler
+
+        self._module_nsmaps = {}
+        self._module_namespaces = {}
+        self._data_tree_parents = None
+        self._schema_paths = {main_module: ("", main_module.i_prefix)}
+
+    def includes(self, statement):
+        """Returns whether a statement outside of the data tree is included"""
+        if (
+            self.strip_documentation
+            and statement.keyword in _common.DOCUMENTATION_KEYWORDS
+        ):
+            return False
+        return self.selection is None or self.selection.includes(statement)
+
+    def get_module_nsmap(self, module_statement):
+        """Returns the prefix to namespace mapping of *module_statement*'s imports"""
+        return self._get_cached(
+            "module-nsmap",
+            self._module_nsmaps,
+            module_statement,
+            lambda: _get_module_nsmap(module_statement, self),
+        )
+
+    def get_module_namespace(self, module_statement):
+        """Returns the namespace of *module_statement*"""
+        return self._get_cached(
+            "module-namespace",
+            self._module_namespaces,
+            module_statement,
+            lambda: module_statement.search_one("namespace").arg,
+        )
+
+    def get_schema_path(self, statement):
+        """
+        Returns the schema path of *statement*, or None if it is not in the data tree
+        of the main module
+        """
+        if self._data_tree_parents is None:
+            self._data_tree_parents = _index_parents(self.main_module)
+
+        # Walk up to the closest ancestor whose schema path is known, then work out
+        # the schema paths of the statements below it from the top down
+        pending = []
+        current = statement
+        while current not in self._schema_paths:
+            if current not in self._data_tree_parents:
+                return None
+            pending.append(current)
+            current = self._data_tree_parents[current]
+
+        path, prefix = self._schema_paths[current]
+        for current in reversed(pending):
+            # The prefix of each component is the module-prefix in effect for its
+            # element, which only changes where another module augments the tree
+            if _is_augmenting_another_module(current):
+                prefix = current.i_module.i_prefix
+
+            if current.keyword in _common.SCHEMA_NODE_KEYWORDS:
+                path = "{}/{}:{}".format(path, prefix, current.arg or current.keyword)
+
+            self._schema_paths[current] = (path, prefix)
+
+        return path
+
+    def _get_cached(self, name, cache, key, compute):
+        self.counters[name + "-lookups"] += 1
+        try:
+            value = cache[key]
+        except KeyError:
+            value = cache[key] = compute()
+        else:
+            self.counters[name + "-cache-hits"] += 1
+        return value
+
+
+class _TypedefTable(object):
+
+    """Assigns ids to the typedefs referred to by the model"""
 
-    _add_external_identities(modules[1:], module_element, fmt)
+    def __init__(self):
+        self._ids = {}
+        self._pending = collections.deque()
 
-    return module_element
+    def get_id(self, typedef_statement):
+        """Returns the id of *typedef_statement*, queueing it if it is new"""
+        try:
+            return self._ids[typedef_statement]
+        except KeyError:
+            typedef_id = str(len(self._ids) + 1)
+            self._ids[typedef_statement] = typedef_id
+            self._pending.append(typedef_statement)
+            return typedef_id
 
+    def pop_pending(self):
+        """Returns the next typedef that has not been added to the model, or None"""
+        return self._pending.popleft() if self._pending else None
 
-def _make_builtin_yin_element_recursive(statement, parent_elem=None, fmt="xml"):
-    yin_element = _make_builtin_yin_element(statement, parent_elem, fmt)
-    _append_children(statement, yin_element, fmt)
+
+def _make_builtin_yin_subtree(statement, parent_elem=None, builder=None):
+    """
+    Creates the element of *statement* and the elements of all of its descendants.
+
+    The statement tree is traversed with an explicit stack rather than recursion,
+    so that the depth of the model is not limited by the interpreter's recursion
+    limit.
+    """
+    yin_element = _make_builtin_yin_element(statement, parent_elem, builder)
+    _run_tasks(_get_child_tasks(statement, yin_element, builder))
     return yin_element
 
 
-def _make_builtin_yin_element(statement, parent_elem, fmt):
+def _run_tasks(tasks):
+    # Each task is a (function, arguments) pair. A function may return the tasks
+    # that create the descendants of the element it created, which run before the
+    # task that follows it so that elements are created in document order.
+    stack = tasks[::-1]
+    while stack:
+        function, arguments = stack.pop()
+        child_tasks = function(*arguments)
+        if child_tasks:
+            stack.extend(reversed(child_tasks))
+
+
+def _make_builtin_yin_element(statement, parent_elem, builder):
     try:
         argument_name, is_arg_yin_element = syntax.yin_map[statement.keyword]
     except KeyError:
@@ -108,26 +785,20 @@ def _make_builtin_yin_element(statement, parent_elem, fmt):
         module_name = statement.i_modulename
         module_prefix = statement.i_prefix
         nsmap["yin"] = yin_parser.yin_namespace
-        nsmap.update(_get_module_nsmap(statement))
-    elif _is_augmenting_another_module(statement) or statement.keyword == "identity":
+        nsmap.update(builder.get_module_nsmap(statement))
+    elif _is_augmenting_another_module(statement) or _is_root_level_definition(
+        statement, builder
+    ):
         module_name = statement.i_module.i_modulename
         module_prefix = statement.i_module.i_prefix
-        nsmap.update(_get_module_nsmap(statement.i_module))
+        nsmap.update(builder.get_module_nsmap(statement.i_module))
 
-    if fmt == "xml":
-        tag = etree.QName(yin_parser.yin_namespace, statement.keyword)
-        yin_element = (
-            etree.Element(tag, nsmap=nsmap)
-            if parent_elem is None
-            else etree.SubElement(parent_elem, tag, nsmap=nsmap)
-        )
-    else:
-        yin_element = _JsonElement(
-            keyword=statement.keyword,
-            namespace=yin_parser.yin_namespace,
-            parent_elem=parent_elem,
-            nsmap=nsmap,
-        )
+    if builder.profiler is not None:
+        builder.profiler.count_element(statement)
+
+    yin_element = builder.element_factory.make_element(
+        yin_parser.yin_namespace, statement.keyword, nsmap, parent_elem
+    )
 
     _add_statement_argument(
         argument_name,
@@ -135,7 +806,7 @@ def _make_builtin_yin_element(statement, parent_elem, fmt):
         yin_parser.yin_namespace,
         is_arg_yin_element,
         yin_element,
-        fmt,
+        builder,
     )
 
     if module_prefix is not None:
@@ -144,14 +815,28 @@ def _make_builtin_yin_element(statement, parent_elem, fmt):
     if module_name is not None:
         yin_element.set("module-name", module_name)
 
+    if statement.keyword == "module" and builder.strip_documentation:
+        yin_element.set(_common.DOCUMENTATION_STRIPPED_ATTRIBUTE, "true")
+
+    if builder.node_ids:
+        _add_node_id_attributes(statement, yin_element, builder)
+
+    if builder.typedef_table is not None:
+        _add_typedef_table_attribute(statement, yin_element, builder.typedef_table)
+
     return yin_element
 
 
 class _JsonElement(dict):
-    def __init__(self, keyword, namespace, nsmap, parent_elem):
-        super(_JsonElement, self).__init__(keyword=keyword, namespace=namespace)
+    def __init__(self, keyword, namespace, nsmap, parent_elem, writer=None):
+        super(_JsonElement, self).__init__(keyword=keyword)
 
-        if parent_elem is not None:
+        if namespace is not None:
+            self["namespace"] = namespace
+
+        if writer is not None:
+            writer.open(self, parent_elem)
+        elif parent_elem is not None:
             parent_elem["children"].append(self)
 
         if nsmap:
@@ -178,6 +863,111 @@ class _JsonElement(dict):
         self[key] = value
 
 
+class _XmlElementFactory(object):
+
+    """Creates the elements of the XML model"""
+
+    @staticmethod
+    def make_element(namespace, keyword, nsmap, parent_elem):
+        """Creates an element as the last child of *parent_elem*, if any"""
+        tag = etree.QName(namespace, keyword)
+        if parent_elem is None:
+            return etree.Element(tag, nsmap=nsmap)
+        return etree.SubElement(parent_elem, tag, nsmap=nsmap)
+
+    @staticmethod
+    def add_argument_element(yin_element, namespace, arg_name, arg_value):
+        """Adds a statement argument that is represented as a sub-element"""
+        arg_element = etree.SubElement(yin_element, etree.QName(namespace, arg_name))
+        arg_element.text = arg_value
+
+
+class _JsonElementFactory(object):
+
+    """
+    Creates the elements of the JSON model, handing them to *writer* if given.
+
+    If a *default_namespace* is given, it is only written once on the root element,
+    and the elements in that namespace omit it.
+    """
+
+    def __init__(self, writer=None, default_namespace=None):
+        self._writer = writer
+        self._default_namespace = default_namespace
+
+    def make_element(self, namespace, keyword, nsmap, parent_elem):
+        """Creates an element as the last child of *parent_elem*, if any"""
+        element = _JsonElement(
+            keyword=keyword,
+            namespace=None if namespace == self._default_namespace else namespace,
+            nsmap=nsmap,
+            parent_elem=parent_elem,
+            writer=self._writer,
+        )
+
+        if parent_elem is None and self._default_namespace is not None:
+            element["default-namespace"] = self._default_namespace
+
+        return element
+
+    @staticmethod
+    def add_argument_element(yin_element, namespace, arg_name, arg_value):
+        """Adds a statement argument that is represented as a sub-element"""
+        # pylint: disable=unused-argument
+        yin_element[arg_name] = arg_value
+
+
+class _MultiElementFactory(object):
+
+    """Creates the elements of several models at once using *factories*"""
+
+    def __init__(self, factories):
+        self._factories = factories
+
+    def make_element(self, namespace, keyword, nsmap, parent_elem):
+        """Creates an element in each model"""
+        return _MultiElement(
+            [
+                factory.make_element(
+                    namespace,
+                    keyword,
+                    nsmap,
+                    None if parent_elem is None else parent_elem.elements[index],
+                )
+                for index, factory in enumerate(self._factories)
+            ]
+        )
+
+    def add_argument_element(self, yin_element, namespace, arg_name, arg_value):
+        """Adds a statement argument to the element in each model"""
+        for factory, element in zip(self._factories, yin_element.elements):
+            factory.add_argument_element(element, namespace, arg_name, arg_value)
+
+
+class _MultiElement(object):
+
+    """The corresponding elements of several models"""
+
+    def __init__(self, elements):
+        self.elements = elements
+
+    @property
+    def text(self):
+        """Compatibility shim to mimic an etree.Element."""
+        return self.elements[0].text
+
+    @text.setter
+    def text(self, value):
+        """Compatibility shim to mimic an etree.Element."""
+        for element in self.elements:
+            element.text = value
+
+    def set(self, key, value):
+        """Compatibility shim to mimic an etree.Element."""
+        for element in self.elements:
+            element.set(key, value)
+
+
 class InvalidKeywordError(Exception):
 
     """A YANG statement has an invalid keyword"""
@@ -188,6 +978,16 @@ class InvalidKeywordError(Exception):
         )
 
 
+class InvalidRootError(Exception):
+
+    """A selected root path does not refer to a data node of the model"""
+
+    def __init__(self, path):
+        super(InvalidRootError, self).__init__(
+            "Could not find data node '{}'".format(path)
+        )
+
+
 def _is_augmenting_another_module(statement):
     return (
         _is_augmenting(statement)
@@ -200,7 +1000,13 @@ def _is_augmenting(statement):
     return hasattr(statement, "i_augment") and statement.i_augment is not None
 
 
-def _get_module_nsmap(module_statement):
+def _is_root_level_definition(statement, builder):
+    return statement.keyword == "identity" or (
+        statement.keyword == "typedef" and builder.typedef_table is not None
+    )
+
+
+def _get_module_nsmap(module_statement, builder):
     nsmap = {}
 
     prefixes = module_statement.i_prefixes
@@ -208,42 +1014,70 @@ def _get_module_nsmap(module_statement):
         imported_module_statement = statements.modulename_to_module(
             module_statement, module_name, revision
         )
-        namespace = imported_module_statement.search_one("namespace").arg
+        namespace = builder.get_module_namespace(imported_module_statement)
         nsmap[prefix] = namespace
 
     return nsmap
 
 
+def _add_node_id_attributes(statement, yin_element, builder):
+    if statement.keyword in _common.SCHEMA_NODE_KEYWORDS:
+        schema_path = builder.get_schema_path(statement)
+        if schema_path is not None:
+            node_id = _common.get_node_id(schema_path)
+            yin_element.set(_common.NODE_ID_ATTRIBUTE, str(node_id))
+            yin_element.set(_common.SCHEMA_PATH_ATTRIBUTE, schema_path)
+
+    elif statement.keyword == "type" and _has_leafref_pointer(statement.parent):
+        referenced_leaf, _ = statement.parent.i_leafref_ptr
+        target_path = builder.get_schema_path(referenced_leaf)
+        if target_path is not None:
+            target_id = _common.get_node_id(target_path)
+            yin_element.set(_common.TARGET_ID_ATTRIBUTE, str(target_id))
+
+
 def _add_statement_argument(
-    arg_name, arg_value, namespace, is_element, yin_element, fmt
+    arg_name, arg_value, namespace, is_element, yin_element, builder
 ):
     if arg_name is None:
         return
 
     if is_element:
-        if fmt == "xml":
-            tag = etree.QName(namespace, arg_name)
-            arg_element = etree.SubElement(yin_element, tag)
-            arg_element.text = arg_value
-        else:
-            yin_element[arg_name] = arg_value
+        builder.element_factory.add_argument_element(
+            yin_element, namespace, arg_name, arg_value
+        )
     else:
         yin_element.set(arg_name, arg_value)
 
 
-def _append_children(statement, yin_element, fmt):
-    for sub_statement in _iterate_non_data_sub_statements(statement):
-        _make_yin_element_recursive(sub_statement, yin_element, fmt)
+def _get_child_tasks(statement, yin_element, builder):
+    selection = builder.selection
 
-    _append_inherited_if_feature_elements(statement, yin_element, fmt)
-    _append_inherited_when_elements(statement, yin_element, fmt)
+    tasks = [
+        (_make_yin_element, (sub_statement, yin_element, builder))
+        for sub_statement in _iterate_non_data_sub_statements(statement)
+        if builder.includes(sub_statement)
+    ]
+
+    tasks.append(
+        (_append_inherited_if_feature_elements, (statement, yin_element, builder))
+    )
+    tasks.append((_append_inherited_when_elements, (statement, yin_element, builder)))
 
     if statement.keyword == "type":
-        _append_children_for_type(statement, yin_element, fmt)
+        tasks.extend(_get_child_tasks_for_type(statement, yin_element, builder))
 
     if hasattr(statement, "i_children"):
-        for data_definition in statement.i_children:
-            _make_yin_element_recursive(data_definition, yin_element, fmt)
+        data_definitions = statement.i_children
+        if selection is not None:
+            data_definitions = selection.filter_children(statement, data_definitions)
+
+        tasks.extend(
+            (_make_yin_element, (data_definition, yin_element, builder))
+            for data_definition in data_definitions
+        )
+
+    return tasks
 
 
 def _iterate_non_data_sub_statements(statement):
@@ -252,17 +1086,19 @@ def _iterate_non_data_sub_statements(statement):
             yield sub_statement
 
 
-def _append_inherited_if_feature_elements(statement, yin_element, fmt):
+def _append_inherited_if_feature_elements(statement, yin_element, builder):
     if _is_augmenting(statement) and pyang_version >= "1.7.1":
-        _append_if_feature_elements_from_augment(statement.i_augment, yin_element, fmt)
+        _append_if_feature_elements_from_augment(
+            statement.i_augment, yin_element, builder
+        )
 
     if _is_member_of_grouping(statement):
-        _append_if_feature_elements_from_uses(statement.i_uses, yin_element, fmt)
+        _append_if_feature_elements_from_uses(statement.i_uses, yin_element, builder)
 
 
-def _append_if_feature_elements_from_augment(augment_statement, yin_element, fmt):
+def _append_if_feature_elements_from_augment(augment_statement, yin_element, builder):
     for if_feature_statement in augment_statement.search("if-feature"):
-        _make_builtin_yin_element(if_feature_statement, yin_element, fmt)
+        _make_builtin_yin_element(if_feature_statement, yin_element, builder)
 
 
 def _is_member_of_grouping(statement):
@@ -273,51 +1109,77 @@ def _is_member_of_grouping(statement):
     )
 
 
-def _append_if_feature_elements_from_uses(uses_statements, yin_element, fmt):
+def _append_if_feature_elements_from_uses(uses_statements, yin_element, builder):
     for uses_statement in uses_statements:
         for if_feature_statement in uses_statement.search("if-feature"):
-            _make_builtin_yin_element(if_feature_statement, yin_element, fmt)
+            _make_builtin_yin_element(if_feature_statement, yin_element, builder)
 
 
-def _append_inherited_when_elements(statement, yin_element, fmt):
+def _append_inherited_when_elements(statement, yin_element, builder):
     if _is_augmenting(statement):
-        _append_when_elements_from_augment(statement.i_augment, yin_element, fmt)
+        _append_when_elements_from_augment(statement.i_augment, yin_element, builder)
 
     if _is_member_of_grouping(statement):
-        _append_when_elements_from_uses(statement.i_uses, yin_element, fmt)
+        _append_when_elements_from_uses(statement.i_uses, yin_element, builder)
 
 
-def _append_when_elements_from_augment(augment_statement, yin_element, fmt):
+def _append_when_elements_from_augment(augment_statement, yin_element, builder):
     when_statements = augment_statement.search("when")
-    _append_when_elements_with_parent_context(when_statements, yin_element, fmt)
+    _append_when_elements_with_parent_context(when_statements, yin_element, builder)
 
 
-def _append_when_elements_with_parent_context(when_statements, yin_element, fmt):
+def _append_when_elements_with_parent_context(when_statements, yin_element, builder):
     for when_statement in when_statements:
-        when_element = _make_builtin_yin_element(when_statement, yin_element, fmt)
+        when_element = _make_builtin_yin_element(when_statement, yin_element, builder)
         when_element.set("context-node", "parent")
 
 
-def _append_when_elements_from_uses(uses_statements, yin_element, fmt):
+def _append_when_elements_from_uses(uses_statements, yin_element, builder):
     for uses_statement in uses_statements:
         when_statements = uses_statement.search("when")
-        _append_when_elements_with_parent_context(when_statements, yin_element, fmt)
+        _append_when_elements_with_parent_context(when_statements, yin_element, builder)
+
 
+def _add_typedef_table_attribute(statement, yin_element, typedef_table):
+    if statement.keyword == "typedef":
+        yin_element.set("typedef-id", typedef_table.get_id(statement))
+    elif statement.keyword == "type" and _is_typedef(statement):
+        yin_element.set("typedef-ref", typedef_table.get_id(statement.i_typedef))
 
-def _append_children_for_type(type_statement, yin_element, fmt):
-    if _is_typedef(type_statement):
-        _make_yin_element_recursive(
-            type_statement.i_typedef, parent_elem=yin_element, fmt=fmt
+
+def _get_child_tasks_for_type(type_statement, yin_element, builder):
+    tasks = []
+
+    if _is_typedef(type_statement) and builder.typedef_table is None:
+        typedef_statement = type_statement.i_typedef
+        tasks.extend(
+            _get_timed_tasks(
+                _timed_typedef(builder.profiler, typedef_statement),
+                (_make_yin_element, (typedef_statement, yin_element, builder)),
+            )
         )
 
     data_node = type_statement.parent
     if _has_leafref_pointer(data_node):
         referenced_leaf, _ = data_node.i_leafref_ptr
         referenced_type_statement = referenced_leaf.search_one("type")
-        _make_yin_element_recursive(
-            referenced_type_statement, parent_elem=yin_element, fmt=fmt
+        tasks.extend(
+            _get_timed_tasks(
+                _timed(builder.profiler, "leafref-inlining"),
+                (_make_yin_element, (referenced_type_statement, yin_element, builder)),
+            )
         )
 
+    return tasks
+
+
+def _get_timed_tasks(timer, task):
+    if not timer.is_enabled:
+        return [task]
+
+    # The timer stops once all of the tasks returned by the task have run
+    return [(timer.start, ()), task, (timer.stop, ())]
+
 
 def _is_typedef(type_statement):
     return hasattr(type_statement, "i_typedef") and type_statement.i_typedef is not None
@@ -327,27 +1189,28 @@ def _has_leafref_pointer(data_node):
     return hasattr(data_node, "i_leafref_ptr") and data_node.i_leafref_ptr is not None
 
 
-def _make_yin_element_recursive(statement, parent_elem, fmt):
+def _make_yin_element(statement, parent_elem, builder):
+    """Creates the element of *statement* and returns the tasks to create its children"""
     if hasattr(statement, "i_extension"):
-        _make_extension_element(statement, parent_elem, fmt)
-    else:
-        _make_builtin_yin_element_recursive(statement, parent_elem=parent_elem, fmt=fmt)
+        return _make_extension_element(statement, parent_elem, builder)
+
+    yin_element = _make_builtin_yin_element(statement, parent_elem, builder)
+    return _get_child_tasks(statement, yin_element, builder)
 
 
-def _make_extension_element(statement, parent_elem, fmt):
+def _make_extension_element(statement, parent_elem, builder):
     extension_module = statement.i_extension.i_module
-    namespace = extension_module.search_one("namespace").arg
+    namespace = builder.get_module_namespace(extension_module)
 
     prefix, keyword = statement.raw_keyword
-    tag = etree.QName(namespace, keyword)
     nsmap = {prefix: namespace}
 
-    if fmt == "xml":
-        extension_element = etree.SubElement(parent_elem, tag, nsmap=nsmap)
-    else:
-        extension_element = _JsonElement(
-            keyword=keyword, namespace=namespace, nsmap=nsmap, parent_elem=parent_elem,
-        )
+    if builder.profiler is not None:
+        builder.profiler.count_element(statement)
+
+    extension_element = builder.element_factory.make_element(
+        namespace, keyword, nsmap, parent_elem
+    )
 
     if _is_complex_extension(statement.i_extension):
         argument_name, is_arg_yin_element = _get_exension_argument_details(
@@ -359,11 +1222,12 @@ def _make_extension_element(statement, parent_elem, fmt):
             namespace,
             is_arg_yin_element,
             extension_element,
-            fmt,
+            builder,
         )
-        _append_children(statement, extension_element, fmt)
-    else:
-        extension_element.text = statement.arg
+        return _get_child_tasks(statement, extension_element, builder)
+
+    extension_element.text = statement.arg
+    return None
 
 
 def _is_complex_extension(extension_statement):
@@ -388,7 +1252,381 @@ def _get_exension_argument_details(extension_statement):
     return argument_name, is_arg_yin_element
 
 
-def _add_external_identities(augmenting_modules, module_element, fmt):
+def _add_external_identities(augmenting_modules, module_element, builder):
     for module in augmenting_modules:
         for identity in module.i_identities.values():
-            _make_builtin_yin_element_recursive(identity, module_element, fmt)
+            if builder.includes(identity):
+                _make_builtin_yin_subtree(identity, module_element, builder)
+
+
+def _add_augments(main_module, module_element, builder):
+    for augment in main_module.search("augment"):
+        if augment.i_target_node.i_module.i_modulename == main_module.i_modulename:
+            # The data definitions of the module's own augments are in its tree
+            continue
+
+        augment_element = _make_builtin_yin_element(augment, module_element, builder)
+        _run_tasks(
+            [
+                (_make_yin_element, (data_definition, augment_element, builder))
+                for data_definition in augment.i_children
+            ]
+        )
+
+
+def _add_typedef_table(typedef_table, module_element, builder):
+    # Adding a typedef may queue the typedefs that it refers to in turn
+    typedef_statement = typedef_table.pop_pending()
+    while typedef_statement is not None:
+        _make_builtin_yin_subtree(typedef_statement, module_element, builder)
+        typedef_statement = typedef_table.pop_pending()
+
+
+class _Selection(object):
+
+    """
+    The data nodes selected as *roots*, their *ancestors* and the *identities* that
+    they refer to
+    """
+
+    def __init__(self, roots, ancestors, identities):
+        self._roots = roots
+        self._ancestors = ancestors
+        self._identities = identities
+
+    def includes(self, statement):
+        """Returns whether a statement outside of the data tree is included"""
+        return statement.keyword != "identity" or statement in self._identities
+
+    def filter_children(self, statement, data_definitions):
+        """Returns the included *data_definitions* of *statement*"""
+        if statement in self._roots or statement not in self._ancestors:
+            return data_definitions
+
+        return [
+            data_definition
+            for data_definition in data_definitions
+            if data_definition in self._roots or data_definition in self._ancestors
+        ]
+
+
+def _select_subtrees(modules, paths):
+    main_module = modules[0]
+    parents = _index_parents(main_module)
+
+    pending_roots = [_find_data_node(main_module, path) for path in paths]
+    roots = set()
+    base_identities = set()
+
+    while pending_roots:
+        root = pending_roots.pop()
+        if _has_ancestor_in(root, roots, parents):
+            continue
+        roots.add(root)
+
+        for statement in _iterate_referring_statements(root):
+            if statement.keyword == "type":
+                base_identities.update(_get_base_identities(statement))
+
+            if _has_leafref_pointer(statement):
+                target_node, _ = statement.i_leafref_ptr
+                if target_node in parents:
+                    pending_roots.append(target_node)
+
+    ancestors = set()
+    for root in roots:
+        parent = parents[root]
+        while parent is not None and parent not in ancestors:
+            ancestors.add(parent)
+            parent = parents[parent]
+
+    return _Selection(
+        roots, ancestors, _get_related_identities(modules, base_identities)
+    )
+
+
+def _index_parents(module_statement):
+    # The parent attribute of an augmenting or grouped data node refers to the
+    # augment or uses statement rather than to its parent in the data tree
+    parents = {module_statement: None}
+    stack = [module_statement]
+    while stack:
+        statement = stack.pop()
+        for child in getattr(statement, "i_children", []):
+            parents[child] = statement
+            stack.append(child)
+
+    return parents
+
+
+def _find_data_node(module_statement, path):
+    data_node = module_statement
+    for name in path.split("/"):
+        if not name:
+            continue
+
+        # Prefixes are accepted but ignored
+        data_node = _find_child_data_node(data_node, name.rpartition(":")[2])
+        if data_node is None:
+            raise InvalidRootError(path)
+
+    return data_node
+
+
+def _find_child_data_node(data_node, name):
+    # Choices and cases may be left out of the path, as in a data node path
+    candidates = collections.deque(getattr(data_node, "i_children", []))
+    while candidates:
+        candidate = candidates.popleft()
+        if candidate.arg == name:
+            return candidate
+        if candidate.keyword in ("choice", "case"):
+            candidates.extend(candidate.i_children)
+
+    return None
+
+
+def _has_ancestor_in(data_node, data_nodes, parents):
+    while data_node is not None:
+        if data_node in data_nodes:
+            return True
+        data_node = parents.get(data_node)
+    return False
+
+
+def _iterate_referring_statements(root):
+    stack = [root]
+    while stack:
+        statement = stack.pop()
+        yield statement
+
+        stack.extend(_iterate_non_data_sub_statements(statement))
+        stack.extend(getattr(statement, "i_children", []))
+        if statement.keyword == "type" and _is_typedef(statement):
+            stack.append(statement.i_typedef)
+
+
+def _get_base_identities(statement):
+    return [
+        base_statement.i_identity
+        for base_statement in statement.search("base")
+        if getattr(base_statement, "i_identity", None) is not None
+    ]
+
+
+def _get_related_identities(modules, base_identities):
+    """
+    Returns the identities that are derived from *base_identities* or that they are
+    derived from
+    """
+    derived_identities = collections.defaultdict(list)
+    for module in modules:
+        for identity in module.i_identities.values():
+            for base_identity in _get_base_identities(identity):
+                derived_identities[base_identity].append(identity)
+
+    related_identities = set()
+    for get_next_identities in (
+        lambda identity: derived_identities[identity],
+        _get_base_identities,
+    ):
+        pending_identities = list(base_identities)
+        visited_identities = set()
+        while pending_identities:
+            identity = pending_identities.pop()
+            if identity not in visited_identities:
+                visited_identities.add(identity)
+                pending_identities.extend(get_next_identities(identity))
+        related_identities.update(visited_identities)
+
+    return related_identities
+
+
+class _Profiler(object):
+
+    """Records where the time and elements of one build of the model go"""
+
+    def __init__(self):
+        self.counters = collections.Counter()
+        self.element_count = 0
+
+        self._timings = collections.defaultdict(float)
+        self._active_timers = collections.Counter()
+        self._module_element_counts = collections.Counter()
+        self._typedef_stats = {}
+        self._typedef_depth = 0
+        self._inlined_typedef_elements = 0
+
+    def start(self, name):
+        """Starts timing *name*; nested timers of the same name are not counted"""
+        self._active_timers[name] += 1
+        if self._active_timers[name] == 1:
+            self._timings[name] -= time.time()
+
+    def stop(self, name):
+        """Stops timing *name*"""
+        self._active_timers[name] -= 1
+        if self._active_timers[name] == 0:
+            self._timings[name] += time.time()
+
+    def count_element(self, statement):
+        """Counts the element created for *statement*"""
+        self.element_count += 1
+        self._module_element_counts[_get_module_name(statement)] += 1
+
+    def start_typedef(self):
+        """Starts inlining a copy of a typedef"""
+        self.start("typedef-inlining")
+        self._typedef_depth += 1
+        return self.element_count
+
+    def stop_typedef(self, typedef_statement, start_count):
+        """Finishes inlining a copy of *typedef_statement*"""
+        element_count = self.element_count - start_count
+
+        key = (_get_module_name(typedef_statement), typedef_statement.arg)
+        stats = self._typedef_stats.setdefault(
+            key, {"position": str(typedef_statement.pos), "uses": 0, "elements": 0}
+        )
+        stats["uses"] += 1
+        stats["elements"] += element_count
+
+        self._typedef_depth -= 1
+        if self._typedef_depth == 0:
+            self._inlined_typedef_elements += element_count
+        self.stop("typedef-inlining")
+
+    def get_report(self, fmt):
+        """Returns the report as a JSON-serializable dict"""
+        typedefs = [
+            dict(module=module_name, name=name, **stats)
+            for (module_name, name), stats in self._typedef_stats.items()
+        ]
+        typedefs.sort(key=lambda stats: stats["elements"], reverse=True)
+
+        return {
+            "format": fmt,
+            "yinsolidated-version": __version__,
+            "pyang-version": pyang_version,
+            "timings": dict(self._timings),
+            "statements": {
+                "total": self.element_count,
+                "by-module": dict(self._module_element_counts),
+            },
+            "typedef-inlining": {
+                "elements": self._inlined_typedef_elements,
+                "amplification": (
+                    float(self.element_count)
+                    / (self.element_count - self._inlined_typedef_elements)
+                    if self.element_count > self._inlined_typedef_elements
+                    else None
+                ),
+                "by-typedef": typedefs,
+            },
+            "counters": dict(self.counters),
+            "peak-memory-bytes": _get_peak_memory(),
+        }
+
+
+class _Timer(object):
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    @property
+    def is_enabled(self):
+        """Whether the time is recorded"""
+        return self._profiler is not None
+
+    def start(self):
+        """See _Profiler.start"""
+        if self._profiler is not None:
+            self._profiler.start(self._name)
+
+    def stop(self):
+        """See _Profiler.stop"""
+        if self._profiler is not None:
+            self._profiler.stop(self._name)
+
+    def __enter__(self):
+        self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+
+def _timed(profiler, name):
+    return _Timer(profiler, name)
+
+
+def _count(profiler, name):
+    if profiler is not None:
+        profiler.counters[name] += 1
+
+
+class _TypedefTimer(object):
+    def __init__(self, profiler, typedef_statement):
+        self._profiler = profiler
+        self._typedef_statement = typedef_statement
+        self._start_count = None
+
+    @property
+    def is_enabled(self):
+        """Whether the time is recorded"""
+        return self._profiler is not None
+
+    def start(self):
+        """See _Profiler.start_typedef"""
+        if self._profiler is not None:
+            self._start_count = self._profiler.start_typedef()
+
+    def stop(self):
+        """See _Profiler.stop_typedef"""
+        if self._profiler is not None:
+            self._profiler.stop_typedef(self._typedef_statement, self._start_count)
+
+
+def _timed_typedef(profiler, typedef_statement):
+    return _TypedefTimer(profiler, typedef_statement)
+
+
+class _TimedJsonWriter(object):
+
+    """Records the time spent by a JsonStreamWriter as serialization time"""
+
+    def __init__(self, writer, profiler):
+        self._writer = writer
+        self._profiler = profiler
+
+    def open(self, element, parent=None):
+        """See JsonStreamWriter.open"""
+        with _timed(self._profiler, "serialization"):
+            self._writer.open(element, parent)
+
+    def close(self):
+        """See JsonStreamWriter.close"""
+        with _timed(self._profiler, "serialization"):
+            self._writer.close()
+
+
+def _get_module_name(statement):
+    module = getattr(statement, "i_module", None) or statement.top or statement
+    return getattr(module, "i_modulename", None) or module.arg
+
+
+def _get_peak_memory():
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes whereas macOS reports bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def _write_profile_report(report, outfile):
+    if outfile is None:
+        json.dump(report, sys.stderr, indent=2, sort_keys=True)
+        sys.stderr.write("\n")
+    else:
+        with open(outfile + ".profile.json", "w") as report_file:
+            json.dump(report, report_file, indent=2, sort_keys=True)
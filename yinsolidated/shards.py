@@ -0,0 +1,180 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Splits the JSON YINsolidated model into shards that can be loaded in parallel or
+selectively.
+
+Each top-level data definition, rpc and notification of the module is written to
+its own shard, and the module element with the rest of its children, such as its
+identities and typedefs, is written to the root shard. A manifest lists the shards
+along with the SHA-256 hash of each and the attributes of the module element.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+
+from yinsolidated import _common, _error, _json_writer, json_parser
+
+
+FORMAT_NAME = "yinsolidated-shards"
+
+FORMAT_VERSION = 1
+
+MANIFEST_FILENAME = "manifest.json"
+
+ROOT_SHARD_FILENAME = "root.json"
+
+_SHARDED_KEYWORDS = frozenset(
+    _common.DATA_DEFINITION_KEYWORDS + ["rpc", "notification"]
+)
+
+
+def write_shards(model, directory, indent=2):
+    """
+    Writes the JSON element tree rooted at the module element *model* to shards in
+    *directory*, along with their manifest.
+
+    The shards are indented by *indent* spaces per level, or written without any
+    insignificant whitespace if *indent* is 0.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    module_attributes = dict(
+        (key, value) for key, value in model.items() if key != "children"
+    )
+    root_children = []
+    shards = []
+
+    for position, child in enumerate(model.get("children") or []):
+        if child["keyword"] not in _SHARDED_KEYWORDS or "name" not in child:
+            root_children.append(child)
+            continue
+
+        filename = "{:04d}-{}.json".format(position, child["name"])
+        shard = _write_shard(child, directory, filename, indent)
+        shard.update(name=child["name"], keyword=child["keyword"], position=position)
+        shards.append(shard)
+
+    root_element = dict(module_attributes, children=root_children)
+    root_shard = _write_shard(root_element, directory, ROOT_SHARD_FILENAME, indent)
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "module": module_attributes,
+        "root": root_shard,
+        "shards": shards,
+    }
+    with io.open(
+        os.path.join(directory, MANIFEST_FILENAME), "w", encoding="utf-8"
+    ) as manifest_file:
+        manifest_file.write(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def _write_shard(element, directory, filename, indent):
+    output = io.StringIO()
+    _json_writer.write_tree(element, output, indent=indent)
+    contents = output.getvalue().encode("utf-8")
+
+    with open(os.path.join(directory, filename), "wb") as shard_file:
+        shard_file.write(contents)
+
+    return {"file": filename, "sha256": hashlib.sha256(contents).hexdigest()}
+
+
+def read_manifest(directory):
+    """Returns the manifest of the shards in *directory*"""
+    with io.open(
+        os.path.join(directory, MANIFEST_FILENAME), encoding="utf-8"
+    ) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    if (
+        manifest.get("format") != FORMAT_NAME
+        or manifest.get("version") != FORMAT_VERSION
+    ):
+        raise _error.Error(
+            "unsupported shard manifest format {} version {}".format(
+                manifest.get("format"), manifest.get("version")
+            )
+        )
+
+    return manifest
+
+
+def load_shards(directory, names=None, executor=None, verify=True):
+    """
+    Loads the model from the shards in *directory*, and returns its module element.
+
+    If a list of *names* is given, only the shards of the top-level data
+    definitions, rpcs and notifications with those names are loaded, along with the
+    root shard.
+
+    If an *executor*, such as a ``concurrent.futures.ThreadPoolExecutor`` or
+    ``ProcessPoolExecutor``, is given, the shards are read and decoded in parallel
+    by its workers. The decoded shards are then parsed into a single model under
+    one module element.
+
+    If *verify* is True, each shard is checked against its hash in the manifest.
+    """
+    manifest = read_manifest(directory)
+
+    shards = manifest["shards"]
+    if names is not None:
+        unknown_names = set(names).difference(shard["name"] for shard in shards)
+        if unknown_names:
+            raise _error.Error(
+                "no shards named {}".format(", ".join(sorted(unknown_names)))
+            )
+
+        shards = [shard for shard in shards if shard["name"] in names]
+
+    arguments = [
+        (os.path.join(directory, shard["file"]), shard["sha256"] if verify else None)
+        for shard in [manifest["root"]] + shards
+    ]
+    mapper = map if executor is None else executor.map
+    raw_root, raw_shards = _split_first(mapper(_read_shard, *zip(*arguments)))
+
+    return json_parser.parse(_stitch(manifest, raw_root, shards, raw_shards))
+
+
+def _split_first(iterable):
+    items = list(iterable)
+    return items[0], items[1:]
+
+
+def _read_shard(path, sha256=None):
+    with open(path, "rb") as shard_file:
+        contents = shard_file.read()
+
+    if sha256 is not None and hashlib.sha256(contents).hexdigest() != sha256:
+        raise _error.Error("shard {} does not match its hash".format(path))
+
+    return json.loads(contents.decode("utf-8"))
+
+
+def _stitch(manifest, root, shards, raw_shards):
+    # The root shard holds the children of the module element at the positions that
+    # no other shard in the manifest occupies
+    shard_positions = set(shard["position"] for shard in manifest["shards"])
+
+    positioned_children = [
+        (shard["position"], raw_shard) for shard, raw_shard in zip(shards, raw_shards)
+    ]
+
+    position = 0
+    for child in root.get("children") or []:
+        while position in shard_positions:
+            position += 1
+        positioned_children.append((position, child))
+        position += 1
+
+    positioned_children.sort(key=lambda positioned_child: positioned_child[0])
+    root["children"] = [child for _, child in positioned_children]
+    return root
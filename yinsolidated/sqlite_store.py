@@ -0,0 +1,411 @@
+# Copyright 2020 128 Technology, Inc.
+
+"""
+Stores the YINsolidated model in an SQLite database, from which its elements are
+loaded on demand. The loaded elements are instances of the same classes as the
+elements returned by :func:`yinsolidated.parse_json`, so they provide the same
+methods and properties, but only a bounded number of them are kept in memory.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import os
+import sqlite3
+import sys
+
+try:
+    from urllib.request import pathname2url
+except ImportError:  # Python 2
+    from urllib import pathname2url
+
+from yinsolidated import _common, _error, json_parser
+
+
+FORMAT_NAME = "yinsolidated-sqlite"
+
+FORMAT_VERSION = 1
+
+DEFAULT_CACHE_SIZE = 10000
+
+_SCHEMA = """
+CREATE TABLE metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE nodes (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER REFERENCES nodes (id),
+    keyword TEXT NOT NULL,
+    namespace TEXT,
+    name TEXT,
+    schema_path TEXT
+);
+CREATE TABLE attributes (
+    node INTEGER NOT NULL REFERENCES nodes (id),
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (node, key)
+);
+CREATE TABLE namespaces (
+    node INTEGER NOT NULL REFERENCES nodes (id),
+    prefix TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    PRIMARY KEY (node, prefix)
+);
+CREATE TABLE identities (
+    node INTEGER PRIMARY KEY REFERENCES nodes (id),
+    name TEXT NOT NULL,
+    module_prefix TEXT,
+    base TEXT
+);
+CREATE INDEX nodes_parent ON nodes (parent, id);
+CREATE INDEX nodes_keyword ON nodes (keyword);
+CREATE INDEX nodes_name ON nodes (name);
+CREATE INDEX nodes_schema_path ON nodes (schema_path);
+CREATE INDEX attributes_key_value ON attributes (key, value);
+"""
+
+# Members of the JSON elements that are stored in the nodes table
+_NODE_KEYS = frozenset(["keyword", "namespace", "name", "nsmap", "children"])
+
+_INSERT_BATCH_SIZE = 1000
+
+
+def write_store(model, path):
+    """
+    Writes the model under the module element *model*, as returned by
+    :func:`yinsolidated.parse_json`, to a new SQLite database at *path*. An
+    existing file at *path* is never overwritten.
+
+    Besides the elements themselves, the database records the schema path of each
+    data node, rpc, input, output and notification, and the name, module prefix and
+    base of each identity, so that they can be queried directly.
+    """
+    if os.path.exists(path):
+        raise _error.Error("{} already exists".format(path))
+
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(_SCHEMA)
+        connection.executemany(
+            "INSERT INTO metadata VALUES (?, ?)",
+            [("format", FORMAT_NAME), ("version", str(FORMAT_VERSION))],
+        )
+
+        writer = _TableWriter(connection)
+        for row in _iterate_rows(model):
+            writer.add(*row)
+        writer.flush()
+
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _iterate_rows(model):
+    # Yields the rows of each element in document order, so that the parent of each
+    # element is inserted before it
+    stack = [(model, None, "", None)]
+    row_id = 0
+    while stack:
+        element, parent_id, parent_path, prefix = stack.pop()
+        row_id += 1
+
+        keyword = element["keyword"]
+        name = element.get("name")
+        prefix = element.get("module-prefix", prefix)
+
+        schema_path = None
+        if keyword in _common.SCHEMA_NODE_KEYWORDS and prefix is not None:
+            schema_path = parent_path + "/" + prefix + ":" + (name or keyword)
+
+        node = (row_id, parent_id, keyword, element.get("namespace"), name, schema_path)
+        attributes = [
+            (row_id, key, value)
+            for key, value in element.items()
+            if key not in _NODE_KEYS
+        ]
+        namespaces = [
+            (row_id, ns_prefix, uri)
+            for ns_prefix, uri in sorted((element.get("nsmap") or {}).items())
+        ]
+        identity = None
+        if keyword == "identity" and parent_id == 1:
+            identity = (row_id, name, prefix, _get_base(element))
+
+        yield node, attributes, namespaces, identity
+
+        for child in reversed(element.get("children") or []):
+            stack.append((child, row_id, schema_path or parent_path, prefix))
+
+
+def _get_base(identity_element):
+    for child in identity_element.get("children") or []:
+        if child["keyword"] == "base":
+            return child.get("name")
+    return None
+
+
+class _TableWriter(object):
+
+    """Inserts the rows of the elements into the tables in batches"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._nodes = []
+        self._attributes = []
+        self._namespaces = []
+        self._identities = []
+
+    def add(self, node, attributes, namespaces, identity):
+        """Queues the rows of one element"""
+        self._nodes.append(node)
+        self._attributes.extend(attributes)
+        self._namespaces.extend(namespaces)
+        if identity is not None:
+            self._identities.append(identity)
+
+        if len(self._nodes) >= _INSERT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Inserts all of the queued rows"""
+        for table, parameters, rows in (
+            ("nodes", "?, ?, ?, ?, ?, ?", self._nodes),
+            ("attributes", "?, ?, ?", self._attributes),
+            ("namespaces", "?, ?, ?", self._namespaces),
+            ("identities", "?, ?, ?, ?", self._identities),
+        ):
+            self._connection.executemany(
+                "INSERT INTO {} VALUES ({})".format(table, parameters), rows
+            )
+            del rows[:]
+
+
+class SqliteStore(object):
+
+    """
+    A read-only view of a model written by :func:`write_store` to the SQLite
+    database at *path*.
+
+    Elements are loaded from the database when they are first navigated to. At most
+    *cache_size* of them are kept by the store, the least recently used of which are
+    dropped first, so the memory used grows with the part of the model in use rather
+    than with the size of the model. The module element is always kept.
+
+    The typedefs and leafref targets of the elements are looked up with queries
+    rather than with lookup tables of every typedef and schema node, which would
+    keep all of them in memory.
+    """
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE):
+        try:
+            self._connection = _connect_read_only(path)
+        except sqlite3.Error as error:
+            raise _error.Error("cannot open SQLite store {}: {}".format(path, error))
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+
+        try:
+            self._connection.execute("PRAGMA query_only = ON")
+            metadata = dict(self._connection.execute("SELECT key, value FROM metadata"))
+        except sqlite3.Error as error:
+            self._connection.close()
+            raise _error.Error(
+                "not a yinsolidated SQLite store: {} ({})".format(path, error)
+            )
+        if metadata.get("format") != FORMAT_NAME or metadata.get("version") != str(
+            FORMAT_VERSION
+        ):
+            self._connection.close()
+            raise _error.Error(
+                "unsupported SQLite store format {} version {}".format(
+                    metadata.get("format"), metadata.get("version")
+                )
+            )
+
+        self._root = self._load_node(1)
+        self._root.__dict__["_indexes"] = {
+            "typedef": _StoredLookup(self, self._find_typedef),
+            "node-id": _StoredLookup(self, self._find_node_id),
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Closes the database"""
+        self._connection.close()
+
+    def getroot(self):
+        """Returns the module element"""
+        return self._root
+
+    def execute(self, sql, parameters=()):
+        """Runs a query against the database and returns the list of result rows"""
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def find_by_schema_path(self, schema_path):
+        """Returns the element at *schema_path*, e.g. ``/t:container``, or None"""
+        row = self._connection.execute(
+            "SELECT id FROM nodes WHERE schema_path = ?", (schema_path,)
+        ).fetchone()
+        return None if row is None else self.get_node(row[0])
+
+    def get_node(self, node_id):
+        """Returns the element stored under *node_id* in the nodes table"""
+        if node_id == 1:
+            return self._root
+
+        try:
+            element = self._cache.pop(node_id)
+        except KeyError:
+            element = self._load_node(node_id)
+            if len(self._cache) >= self._cache_size:
+                self._cache.popitem(last=False)
+
+        # Reinsert the element to mark it as the most recently used
+        self._cache[node_id] = element
+        return element
+
+    def get_children(self, node_id):
+        """Returns the child elements of the element stored under *node_id*"""
+        rows = self._connection.execute(
+            "SELECT id FROM nodes WHERE parent = ? ORDER BY id", (node_id,)
+        )
+        return [self.get_node(child_id) for (child_id,) in rows.fetchall()]
+
+    @property
+    def cached_node_count(self):
+        """The number of elements currently kept by the store"""
+        return len(self._cache) + 1
+
+    def _find_typedef(self, typedef_id):
+        # Returns the row id of the top-level typedef with *typedef_id*, or None
+        row = self._connection.execute(
+            "SELECT nodes.id FROM attributes JOIN nodes ON nodes.id = attributes.node "
+            "WHERE attributes.key = 'typedef-id' AND attributes.value = ? "
+            "AND nodes.parent = 1 AND nodes.keyword = 'typedef'",
+            (typedef_id,),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _find_node_id(self, node_id):
+        # Returns the row id of the schema node with *node_id*, or None
+        row = self._connection.execute(
+            "SELECT node FROM attributes WHERE key = ? AND value = ?",
+            (_common.NODE_ID_ATTRIBUTE, str(node_id)),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+        # Without node id attributes, the ids are derived from the schema paths
+        rows = self._connection.execute(
+            "SELECT id, schema_path FROM nodes WHERE schema_path IS NOT NULL"
+        )
+        for row_id, schema_path in rows:
+            if _common.get_node_id(schema_path) == node_id:
+                return row_id
+        return None
+
+    def _load_node(self, node_id):
+        row = self._connection.execute(
+            "SELECT parent, keyword, namespace, name, schema_path FROM nodes "
+            "WHERE id = ?",
+            (node_id,),
+        ).fetchone()
+        if row is None:
+            raise _error.Error("no node with id {} in the SQLite store".format(node_id))
+
+        parent_id, keyword, namespace, name, schema_path = row
+        data = {"keyword": keyword}
+        if namespace is not None:
+            data["namespace"] = namespace
+        if name is not None:
+            data["name"] = name
+
+        data.update(
+            self._connection.execute(
+                "SELECT key, value FROM attributes WHERE node = ?", (node_id,)
+            )
+        )
+        nsmap = dict(
+            self._connection.execute(
+                "SELECT prefix, uri FROM namespaces WHERE node = ?", (node_id,)
+            )
+        )
+        if nsmap:
+            data["nsmap"] = nsmap
+
+        element = _get_stored_element_class(keyword)(data)
+        element.__dict__.update(
+            _store=self, _stored_id=node_id, _stored_parent_id=parent_id
+        )
+        if schema_path is not None:
+            element.__dict__["_schema_path"] = schema_path
+        return element
+
+
+def _connect_read_only(path):
+    # Opening a database that does not exist would otherwise create it
+    if sys.version_info[0] >= 3:
+        uri = "file:{}?mode=ro".format(pathname2url(os.path.abspath(path)))
+        return sqlite3.connect(uri, uri=True)
+
+    if not os.path.isfile(path):
+        raise sqlite3.OperationalError("unable to open database file")
+    return sqlite3.connect(path)
+
+
+class _StoredElement(object):
+
+    """Loads the parent and children of an element from its SqliteStore"""
+
+    @property
+    def parent(self):
+        """The parent element, loaded from the store, or None for the module"""
+        parent_id = self.__dict__["_stored_parent_id"]
+        return None if parent_id is None else self._store.get_node(parent_id)
+
+    @property
+    def children(self):
+        """The child elements, loaded from the store"""
+        return self._store.get_children(self._stored_id)
+
+
+class _StoredLookup(object):
+
+    """
+    Stands in for a lookup table of the JSON parser, finding the row id of an
+    element with *find* and loading the element from *store*
+    """
+
+    def __init__(self, store, find):
+        self._store = store
+        self._find = find
+
+    def __getitem__(self, key):
+        node_id = self._find(key)
+        if node_id is None:
+            raise KeyError(key)
+        return self._store.get_node(node_id)
+
+
+_STORED_ELEMENT_CLASSES = {}
+
+
+def _get_stored_element_class(keyword):
+    # pylint: disable=protected-access
+    element_class = json_parser._get_yin_element_class(keyword)
+    try:
+        return _STORED_ELEMENT_CLASSES[element_class]
+    except KeyError:
+        stored_class = type(
+            str("Stored" + element_class.__name__), (_StoredElement, element_class), {},
+        )
+        _STORED_ELEMENT_CLASSES[element_class] = stored_class
+        return stored_class